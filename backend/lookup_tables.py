@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+On-disk lookup tables for large wordlists
+
+A table is a sorted array of fixed-width (digest, offset) records for one
+algorithm, where offset points at the candidate's line in the wordlist file.
+The server memory-maps tables and wordlists read-only and binary-searches
+them, so lookups touch a handful of pages that the OS shares between workers.
+
+Build tables offline:
+
+    python lookup_tables.py rockyou.txt --algorithms md5 sha1 --output-dir tables/
+
+which writes ``tables/rockyou.txt`` (a copy is not made if the wordlist is
+already there) and one ``tables/rockyou.<algorithm>.tbl`` per algorithm.
+"""
+
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+
+TABLE_MAGIC = b"HASHTBL1"
+HEADER = struct.Struct(">8sII")  # magic, digest size, reserved
+OFFSET = struct.Struct(">Q")  # big-endian so equal digests sort by offset
+CHUNK_LINES = 2_000_000
+
+
+def table_path(directory: Path, name: str, algorithm: str) -> Path:
+    """Path of the table for wordlist ``name`` and a hashlib algorithm name"""
+    return directory / f"{name}.{algorithm}.tbl"
+
+
+def wordlist_path(directory: Path, name: str) -> Path:
+    """Path of the wordlist a table's offsets point into"""
+    return directory / f"{name}.txt"
+
+
+def file_version(stat: os.stat_result) -> str:
+    """Identifies one build of a table; a rebuild renamed into place changes it"""
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class LookupTable:
+    """Read-only, memory-mapped (digest, offset) table and its wordlist"""
+
+    def __init__(self, table_file: Path, wordlist_file: Path):
+        with open(table_file, "rb") as f:
+            self._table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.version = file_version(os.fstat(f.fileno()))
+        with open(wordlist_file, "rb") as f:
+            self._wordlist = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.digest_size, _ = HEADER.unpack_from(self._table, 0)
+        if magic != TABLE_MAGIC:
+            raise ValueError(f"{table_file} is not a lookup table")
+        self.record_size = self.digest_size + OFFSET.size
+        self.count = (len(self._table) - HEADER.size) // self.record_size
+
+    def lookup(self, digest: bytes) -> tuple[Optional[str], int]:
+        """Binary-search for a digest, returning (plaintext or None, records probed)"""
+        table = self._table
+        low, high = 0, self.count
+        probes = 0
+
+        # Leftmost match, so duplicates resolve to the earliest wordlist line
+        while low < high:
+            mid = (low + high) // 2
+            start = HEADER.size + mid * self.record_size
+            probes += 1
+            if table[start:start + self.digest_size] < digest:
+                low = mid + 1
+            else:
+                high = mid
+
+        if low == self.count:
+            return None, probes
+        start = HEADER.size + low * self.record_size
+        if table[start:start + self.digest_size] != digest:
+            return None, probes
+
+        offset, = OFFSET.unpack_from(table, start + self.digest_size)
+        end = self._wordlist.find(b"\n", offset)
+        line = self._wordlist[offset:end if end != -1 else len(self._wordlist)]
+        return line.rstrip(b"\r").decode("utf-8", errors="replace"), probes
+
+    def close(self):
+        self._table.close()
+        self._wordlist.close()
+
+
+def _write_run(records: List[bytes], directory: str) -> str:
+    records.sort()
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".run", delete=False) as run:
+        run.write(b"".join(records))
+    return run.name
+
+
+def _read_records(f: BinaryIO, record_size: int) -> Iterator[bytes]:
+    while True:
+        record = f.read(record_size)
+        if len(record) < record_size:
+            return
+        yield record
+
+
+def build_table(source: Path, algorithm: str, output: Path, chunk_lines: int = CHUNK_LINES) -> int:
+    """Hash every line of ``source`` and write a sorted table to ``output``
+
+    Lines are hashed in chunks that are sorted in memory and spilled to
+    temporary run files, then merged, so memory stays bounded by the chunk
+    size rather than the wordlist size. Returns the number of records.
+    """
+    hasher = getattr(hashlib, algorithm)
+    digest_size = hasher().digest_size
+    record_size = digest_size + OFFSET.size
+    runs = []
+    count = 0
+
+    with tempfile.TemporaryDirectory(dir=output.parent) as scratch:
+        with open(source, "rb") as f:
+            chunk = []
+            offset = 0
+            for line in f:
+                word = line.rstrip(b"\r\n")
+                if word:
+                    chunk.append(hasher(word).digest() + OFFSET.pack(offset))
+                offset += len(line)
+                if len(chunk) >= chunk_lines:
+                    runs.append(_write_run(chunk, scratch))
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                runs.append(_write_run(chunk, scratch))
+                count += len(chunk)
+
+        run_files = [open(run, "rb") for run in runs]
+        try:
+            with open(output, "wb") as out:
+                out.write(HEADER.pack(TABLE_MAGIC, digest_size, 0))
+                for record in heapq.merge(*(_read_records(f, record_size) for f in run_files)):
+                    out.write(record)
+        finally:
+            for f in run_files:
+                f.close()
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped lookup tables for a wordlist")
+    parser.add_argument("wordlist", type=Path, help="Wordlist file, one candidate per line")
+    parser.add_argument("--algorithms", nargs="+", default=["md5", "sha1", "sha256", "sha512"],
+                        help="hashlib algorithm names to build tables for")
+    parser.add_argument("--output-dir", type=Path, default=Path(os.environ.get("LOOKUP_TABLE_DIR", ".")),
+                        help="Directory the server reads tables from (LOOKUP_TABLE_DIR)")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES,
+                        help="Lines sorted in memory per run before spilling to disk")
+    args = parser.parse_args()
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    name = args.wordlist.stem
+    target = wordlist_path(args.output_dir, name)
+    if args.wordlist.resolve() != target.resolve():
+        shutil.copyfile(args.wordlist, target)
+
+    for algorithm in args.algorithms:
+        start_time = time.time()
+        count = build_table(target, algorithm, table_path(args.output_dir, name, algorithm), args.chunk_lines)
+        print(f"{name}.{algorithm}.tbl: {count} records in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
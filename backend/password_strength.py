@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Password strength: breached-password membership and pattern-aware entropy
+
+Breach corpora are compiled offline into a Bloom filter file, a fixed-size
+bit array the server memory-maps read-only, so every worker shares one copy
+through the page cache and a membership test costs a handful of bit probes
+whatever the corpus size. Build one with:
+
+    python password_strength.py rockyou.txt --output tables/breached.bloom
+
+Entropy is estimated by splitting a password into the cheapest sequence of
+patterns an attacker would guess (dictionary words, leet variants, years,
+repeats, alphabetic and keyboard runs) instead of assuming every character
+was drawn uniformly at random.
+"""
+
+import argparse
+import hashlib
+import math
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Collection, Iterator
+
+FILTER_MAGIC = b"PWBLOOM1"
+HEADER = struct.Struct(">8sQI")  # magic, bit count, probe count
+
+KEYBOARD_ROWS = ("qwertyuiop", "asdfghjkl", "zxcvbnm", "1234567890")
+LEET_REVERSE = str.maketrans("4@3106$5!7", "aaeiogssit")
+YEAR_BITS = math.log2(200)  # 1900-2099
+MIN_WORD = 4
+
+# Every character pair that can continue a run, so most positions are rejected with one lookup
+RUN_PAIRS = frozenset(
+    {a + a for a in map(chr, range(32, 127))}
+    | {chr(c) + chr(c + step) for c in range(32, 127) for step in (1, -1)}
+    | {row[i:i + 2] for row in KEYBOARD_ROWS for i in range(len(row) - 1)}
+    | {row[i + 1] + row[i] for row in KEYBOARD_ROWS for i in range(len(row) - 1)}
+)
+
+
+def _probes(password: bytes, bit_count: int, probe_count: int) -> Iterator[int]:
+    # Kirsch-Mitzenmacher double hashing over one 128-bit digest
+    digest = hashlib.blake2b(password, digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    second = int.from_bytes(digest[8:], "big") | 1
+    for i in range(probe_count):
+        yield (first + i * second) % bit_count
+
+
+class BloomFilter:
+    """Read-only, memory-mapped Bloom filter of breached passwords"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.bit_count, self.probe_count = HEADER.unpack_from(self._bits, 0)
+        if magic != FILTER_MAGIC:
+            raise ValueError(f"{path} is not a breached-password filter")
+
+    def __len__(self) -> int:
+        # Entries the filter was sized for, recovered from its optimal probe count
+        return round(self.bit_count * math.log(2) / self.probe_count)
+
+    def __contains__(self, password: str) -> bool:
+        bits = self._bits
+        for position in _probes(password.encode(), self.bit_count, self.probe_count):
+            if not bits[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def close(self):
+        self._bits.close()
+
+
+def build_filter(source: Path, output: Path, fp_rate: float = 0.001) -> int:
+    """Compile a wordlist into a Bloom filter sized for ``fp_rate``; returns the entry count"""
+    with open(source, "rb") as f:
+        count = sum(1 for line in f if line.strip(b"\r\n"))
+    count = max(count, 1)
+    bit_count = math.ceil(-count * math.log(fp_rate) / math.log(2) ** 2)
+    probe_count = max(1, round(bit_count / count * math.log(2)))
+
+    bits = bytearray((bit_count + 7) // 8)
+    with open(source, "rb") as f:
+        for line in f:
+            word = line.rstrip(b"\r\n")
+            if word:
+                for position in _probes(word, bit_count, probe_count):
+                    bits[position >> 3] |= 1 << (position & 7)
+
+    with open(output, "wb") as out:
+        out.write(HEADER.pack(FILTER_MAGIC, bit_count, probe_count))
+        out.write(bits)
+    return count
+
+
+def charset_size(password: str) -> int:
+    """Size of the smallest character pool the password draws from"""
+    size = 0
+    if any(c.islower() for c in password):
+        size += 26
+    if any(c.isupper() for c in password):
+        size += 26
+    if any(c.isdigit() for c in password):
+        size += 10
+    if any(not c.isalnum() and c.isascii() for c in password):
+        size += 33
+    if any(not c.isascii() for c in password):
+        size += 100
+    return max(size, 1)
+
+
+def _run_length(lowered: str, start: int) -> int:
+    """Length of the repeat, alphabetic/numeric sequence or keyboard run at ``start``"""
+    best = 1
+    end = start + 1
+    while end < len(lowered) and lowered[end] == lowered[start]:
+        end += 1
+    best = max(best, end - start)
+
+    for step in (1, -1):
+        end = start + 1
+        while end < len(lowered) and ord(lowered[end]) - ord(lowered[end - 1]) == step:
+            end += 1
+        best = max(best, end - start)
+
+    for row in KEYBOARD_ROWS:
+        for sequence in (row, row[::-1]):
+            index = sequence.find(lowered[start])
+            if index == -1:
+                continue
+            end = start + 1
+            while (end < len(lowered) and index + end - start < len(sequence)
+                   and lowered[end] == sequence[index + end - start]):
+                end += 1
+            best = max(best, end - start)
+    return best
+
+
+def estimate_entropy(password: str, dictionary: Collection[str]) -> float:
+    """Bits of guessing work for ``password`` under a simple pattern model
+
+    Scans left to right, taking the longest dictionary word (after undoing
+    leet substitutions) or 19xx/20xx year at each position, else a run of
+    three or more repeated, sequential or keyboard-adjacent characters, else
+    a single character drawn from the password's character pool.
+    """
+    pool_bits = math.log2(charset_size(password))
+    dictionary_bits = math.log2(max(len(dictionary), 2))
+    lowered = password.lower()
+    plain = lowered.translate(LEET_REVERSE)
+    bits = 0.0
+    position = 0
+
+    while position < len(password):
+        word = 0
+        for end in range(len(plain), position + MIN_WORD - 1, -1):
+            if plain[position:end] in dictionary:
+                word = end - position
+                break
+        if word:
+            chunk = password[position:position + word]
+            bits += dictionary_bits
+            if chunk != chunk.lower():
+                bits += 1 if chunk[0].isupper() and chunk[1:].islower() else word
+            if lowered[position:position + word] != plain[position:position + word]:
+                bits += 1
+            position += word
+            continue
+
+        year = password[position:position + 4]
+        if len(year) == 4 and year.isdigit() and year[:2] in ("19", "20"):
+            bits += YEAR_BITS
+            position += 4
+            continue
+
+        run = _run_length(lowered, position) if lowered[position:position + 2] in RUN_PAIRS else 1
+        if run >= 3:
+            bits += pool_bits + math.log2(run)
+            position += run
+            continue
+
+        bits += pool_bits
+        position += 1
+
+    return bits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a breached-password Bloom filter for strength scoring")
+    parser.add_argument("wordlist", type=Path, help="Breach corpus, one password per line")
+    parser.add_argument("--output", type=Path, required=True, help="Filter file the server reads (BREACHED_FILTER)")
+    parser.add_argument("--fp-rate", type=float, default=0.001, help="Target false-positive rate")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    count = build_filter(args.wordlist, args.output, args.fp_rate)
+    size = args.output.stat().st_size
+    print(f"{args.output.name}: {count} passwords, {size / 1e6:.1f} MB in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Probabilistic password grammar (PCFG) trained on cracked passwords
+
+A password is split into runs of letters (L), digits (D) and other symbols
+(S); its structure is the sequence of run kinds and lengths, e.g. ``L6D2``
+for "monkey12". Training counts structures and, for each run kind and
+length, the strings that filled it. A guess's probability is that of its
+structure times that of each of its runs' strings.
+
+``Grammar.guesses()`` enumerates every guess the grammar can produce in
+descending probability with Weir's priority-queue ("next") algorithm: a
+guess is a structure plus one index per run into that run's strings sorted
+most likely first, and popping the most likely guess pushes its successors
+(one index advanced, only at or after the index advanced last, so each
+guess is queued once). Guesses are produced lazily; the queue holds about
+one entry per guess produced.
+
+Train offline from corpora and, optionally, the server's potfile:
+
+    python pcfg.py rockyou.txt --potfile --output tables/pcfg.json
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAX_PASSWORD_LENGTH = 64
+
+
+def segment(password: str) -> List[Tuple[str, str]]:
+    """Split a password into (run key, run string) pairs, e.g. [("L6", "monkey"), ("D2", "12")]"""
+    runs = []
+    for kind, chars in itertools.groupby(password, key=_kind):
+        text = "".join(chars)
+        runs.append((f"{kind}{len(text)}", text))
+    return runs
+
+
+def _kind(char: str) -> str:
+    if char.isalpha():
+        return "L"
+    if char.isdigit():
+        return "D"
+    return "S"
+
+
+class Grammar:
+    """Structure and run-string counts, and descending-probability guess enumeration"""
+
+    def __init__(self, structures: Optional[Counter] = None, terminals: Optional[Dict[str, Counter]] = None):
+        self.structures = structures or Counter()
+        self.terminals = terminals or {}
+        self._compiled = None
+        self._digest = None
+
+    @classmethod
+    def train(cls, passwords: Iterable[str]) -> "Grammar":
+        grammar = cls()
+        grammar.update(passwords)
+        return grammar
+
+    def update(self, passwords: Iterable[str]) -> int:
+        """Count more training passwords; returns how many were used"""
+        used = 0
+        for password in passwords:
+            password = password.strip("\r\n")
+            if not password or len(password) > MAX_PASSWORD_LENGTH:
+                continue
+            runs = segment(password)
+            self.structures["".join(key for key, _ in runs)] += 1
+            for key, text in runs:
+                self.terminals.setdefault(key, Counter())[text] += 1
+            used += 1
+        self._compiled = None
+        self._digest = None
+        return used
+
+    def _compile(self) -> List[Tuple[float, List[List[str]], List[List[float]]]]:
+        """Per structure: probability, and per run its strings and probabilities, most likely first"""
+        if self._compiled is None:
+            runs = {}
+            for key, counts in self.terminals.items():
+                total = sum(counts.values())
+                ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+                runs[key] = ([text for text, _ in ordered], [count / total for _, count in ordered])
+            total = sum(self.structures.values())
+            compiled = []
+            for structure, count in sorted(self.structures.items(), key=lambda item: (-item[1], item[0])):
+                keys = _structure_keys(structure)
+                compiled.append((count / total, [runs[key][0] for key in keys], [runs[key][1] for key in keys]))
+            self._compiled = compiled
+        return self._compiled
+
+    def __len__(self) -> int:
+        """Distinct guesses the grammar produces"""
+        return sum(math.prod(len(strings) for strings in run_strings) for _, run_strings, _ in self._compile())
+
+    def guesses(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """Guesses ``start``..``end - 1`` in descending probability"""
+        return itertools.islice(self._guesses(), start, end)
+
+    def _guesses(self) -> Iterator[str]:
+        order = itertools.count()
+        queue = []
+        compiled = self._compile()
+        for number, (probability, _, run_probabilities) in enumerate(compiled):
+            indices = (0,) * len(run_probabilities)
+            for run in run_probabilities:
+                probability *= run[0]
+            queue.append((-probability, next(order), number, indices, 0))
+        heapq.heapify(queue)
+
+        while queue:
+            negative, _, number, indices, pivot = heapq.heappop(queue)
+            _, run_strings, run_probabilities = compiled[number]
+            yield "".join(strings[index] for strings, index in zip(run_strings, indices))
+
+            for position in range(pivot, len(indices)):
+                index = indices[position] + 1
+                probabilities = run_probabilities[position]
+                if index == len(probabilities):
+                    continue
+                child = indices[:position] + (index,) + indices[position + 1:]
+                ratio = probabilities[index] / probabilities[index - 1]
+                heapq.heappush(queue, (negative * ratio, next(order), number, child, position))
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "structures": dict(self.structures),
+            "terminals": {key: dict(counts) for key, counts in self.terminals.items()},
+        }
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the counts, identifying the guesses the grammar produces"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+        return self._digest
+
+    def save(self, path: Path):
+        """Write the counts as JSON, renamed into place when complete"""
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+            json.dump(self.to_dict(), f)
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Grammar":
+        data = json.loads(path.read_text())
+        return cls(
+            Counter(data["structures"]),
+            {key: Counter(counts) for key, counts in data["terminals"].items()}
+        )
+
+
+def _structure_keys(structure: str) -> List[str]:
+    """Run keys of a structure string: "L6D2" -> ["L6", "D2"]"""
+    keys = []
+    for char in structure:
+        if char.isalpha():
+            keys.append(char)
+        else:
+            keys[-1] += char
+    return keys
+
+
+def read_corpus(path: Path) -> Iterator[str]:
+    with open(path, "rb") as f:
+        for line in f:
+            yield line.rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def potfile_plaintexts() -> Iterator[str]:
+    """Cracked plaintexts from the server's db.potfile (MONGO_URL and DB_NAME as for the server)"""
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = MongoClient(os.environ["MONGO_URL"])
+    try:
+        for doc in client[os.environ["DB_NAME"]].potfile.find({}, {"plaintext": 1}):
+            if doc.get("plaintext"):
+                yield doc["plaintext"]
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a password grammar for probability-ordered candidates")
+    parser.add_argument("corpora", type=Path, nargs="*", help="Password corpora, one password per line")
+    parser.add_argument("--potfile", action="store_true", help="Also train on every plaintext cracked so far")
+    parser.add_argument("--output", type=Path, required=True, help="Grammar file the server reads (PCFG_MODEL)")
+    parser.add_argument("--sample", type=int, default=0, help="Print the first N guesses after training")
+    args = parser.parse_args()
+    if not args.corpora and not args.potfile:
+        parser.error("give at least one corpus or --potfile")
+
+    start_time = time.time()
+    grammar = Grammar()
+    for corpus in args.corpora:
+        print(f"{corpus.name}: {grammar.update(read_corpus(corpus))} passwords")
+    if args.potfile:
+        print(f"potfile: {grammar.update(potfile_plaintexts())} passwords")
+    grammar.save(args.output)
+    print(f"{args.output.name}: {len(grammar.structures)} structures, {len(grammar)} guesses "
+          f"in {time.time() - start_time:.1f}s")
+    for guess in grammar.guesses(0, args.sample):
+        print(guess)
+
+
+if __name__ == "__main__":
+    main()
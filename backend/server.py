@@ -1,27 +1,110 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
+from bson import Binary
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Iterable, Iterator, AsyncIterator, NamedTuple, Sequence
 import uuid
-from datetime import datetime
+import socket
+from datetime import datetime, timedelta
 import hashlib
 import bcrypt
 import re
+import math
+import string
 import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from lookup_tables import LookupTable, file_version, table_path, wordlist_path
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+from password_strength import BloomFilter, estimate_entropy
+from pcfg import Grammar
+from unix_crypt import CryptSetting, crypt_hash, parse_crypt, supported as crypt_supported
+from wordlists import PackedWordlist
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics served at /metrics in the Prometheus text format (see metrics.py)
+metrics = Registry()
+REQUEST_SECONDS = metrics.register(Histogram(
+    "http_request_duration_seconds", "Latency of /api requests", ["method", "route", "status"]
+))
+STREAM_SECONDS = metrics.register(Histogram(
+    "http_stream_duration_seconds", "Duration of /api event streams, until their last event", ["route"]
+))
+STAGE_SECONDS = metrics.register(Histogram(
+    "hash_analysis_stage_seconds", "Time spent in each analysis stage", ["stage"]
+))
+MONGO_SECONDS = metrics.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["command", "outcome"]
+))
+CANDIDATES_TRIED = metrics.register(Counter(
+    "hash_candidates_tried_total", "Candidates hashed or verified by attacks", ["algorithm"]
+))
+ATTACK_SECONDS = metrics.register(Counter(
+    "hash_attack_seconds_total", "Wall time spent in attack units", ["algorithm"]
+))
+HASH_RATE = metrics.register(Gauge(
+    "hash_rate_candidates_per_second", "Candidate rate of the most recent attack unit", ["algorithm"]
+))
+HASHES_ANALYZED = metrics.register(Counter(
+    "hashes_analyzed_total", "Hashes analyzed, by outcome", ["algorithm", "outcome"]
+))
+HASHES_COALESCED = metrics.register(Counter(
+    "hashes_coalesced_total", "Hashes answered by an identical attack already in flight", ["algorithm"]
+))
+EXECUTOR_QUEUED = metrics.register(Gauge(
+    "executor_queued_tasks", "Work items waiting for a pool worker", ["pool"]
+))
+EXECUTOR_BUSY = metrics.register(Gauge(
+    "executor_busy_workers", "Pool workers currently running a work item", ["pool"]
+))
+EXECUTOR_SATURATION = metrics.register(Gauge(
+    "executor_saturation", "Busy plus queued work items per pool worker", ["pool"]
+))
+ADMISSION_REJECTED = metrics.register(Counter(
+    "admission_rejected_total", "Analyses turned away with 429, by the limit they hit", ["reason"]
+))
+ADMISSION_QUEUED = metrics.register(Gauge(
+    "admission_queued_analyses", "Large analyses waiting for an admission slot"
+))
+ADMISSION_COST = metrics.register(Gauge(
+    "admission_outstanding_cost", "Estimated cost of admitted and queued analyses, in unsalted digests"
+))
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Feed every MongoDB command's latency into MONGO_SECONDS"""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+    
+    def failed(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandTimer()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -30,8 +113,173 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+class TrackedExecutor(Executor):
+    """A thread or process pool that counts its own queued and running work items
+
+    Thread pool work is seen starting. Process pool work starts in another
+    process, so unfinished items up to the worker count are taken to be
+    running.
+    """
+    
+    def __init__(self, executor_class: type, max_workers: int, **options):
+        self.executor = executor_class(max_workers=max_workers, **options)
+        self.workers = max_workers
+        self.threaded = executor_class is ThreadPoolExecutor
+        self.unfinished = 0
+        self.running = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            self.unfinished += 1
+        try:
+            if self.threaded:
+                future = self.executor.submit(self._run, fn, *args, **kwargs)
+            else:
+                future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._finished(None)
+            raise
+        future.add_done_callback(self._finished)
+        return future
+    
+    def _run(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+    
+    def _finished(self, future: Optional[Future]):
+        with self._lock:
+            self.unfinished -= 1
+    
+    def load(self) -> tuple[int, int]:
+        """Work items (queued, running)"""
+        with self._lock:
+            unfinished, running = self.unfinished, self.running
+        if not self.threaded:
+            running = min(unfinished, self.workers)
+        return max(0, unfinished - running), running
+    
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
 # Thread pool for CPU-intensive hash operations
-thread_pool = ThreadPoolExecutor(max_workers=4)
+thread_pool = TrackedExecutor(ThreadPoolExecutor, max_workers=4)
+
+# Analyses admitted as small (see AdmissionController) hash on their own pool,
+# so interactive requests never queue behind audits and jobs on thread_pool
+INTERACTIVE_WORKERS = int(os.environ.get('INTERACTIVE_WORKERS', 2))
+interactive_pool = TrackedExecutor(ThreadPoolExecutor, max_workers=INTERACTIVE_WORKERS)
+
+# Separate pool for bcrypt, so slow key derivations never queue behind cheap
+# hashes; BCRYPT_TIME_BUDGET caps the seconds spent on any one salt group
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', 2))
+BCRYPT_TIME_BUDGET = float(os.environ.get('BCRYPT_TIME_BUDGET', 120))
+bcrypt_pool = TrackedExecutor(ThreadPoolExecutor, max_workers=BCRYPT_WORKERS)
+
+# Optional process pool: HASH_EXECUTOR=process shards wordlists across cores
+HASH_EXECUTOR = os.environ.get('HASH_EXECUTOR', 'thread')
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 4))
+SHARD_SIZE = int(os.environ.get('HASH_SHARD_SIZE', 50000))
+SHARD_SYNC_INTERVAL = 4096
+# Unix crypt candidates cost milliseconds each, so they are sharded finer
+CRYPT_SHARD_SIZE = int(os.environ.get('CRYPT_SHARD_SIZE', 512))
+SHARD_CANCELLED = "__cancelled__"
+
+# Maximum number of work units a single request runs at the same time
+HASH_CONCURRENCY = int(os.environ.get('HASH_CONCURRENCY', 8))
+process_context = multiprocessing.get_context("spawn")
+process_pool = TrackedExecutor(ProcessPoolExecutor, max_workers=HASH_WORKERS, mp_context=process_context) if HASH_EXECUTOR == "process" else None
+# Unix crypt derivation is CPU-bound and holds the GIL (pure Python, or the
+# stdlib crypt module), so crypt groups always shard across processes
+crypt_pool = process_pool or TrackedExecutor(ProcessPoolExecutor, max_workers=HASH_WORKERS, mp_context=process_context)
+shard_manager = None
+
+def update_executor_gauges():
+    """Sample queue depth and busy workers of each pool"""
+    pools = {"thread": thread_pool, "interactive": interactive_pool, "bcrypt": bcrypt_pool, "process": process_pool, "crypt": crypt_pool if process_pool is None else None}
+    for name, pool in pools.items():
+        if pool is None:
+            continue
+        queued, busy = pool.load()
+        EXECUTOR_QUEUED.set(queued, pool=name)
+        EXECUTOR_BUSY.set(busy, pool=name)
+        EXECUTOR_SATURATION.set((busy + queued) / pool.workers, pool=name)
+
+# Background jobs: work units running at once across all jobs, and how many
+# finished jobs stay in memory
+JOB_SLOTS = int(os.environ.get('JOB_SLOTS', 4))
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 1000))
+PROGRESS_INTERVAL = 256
+
+# Distributed jobs: chunks in db.work_chunks leased by any backend or
+# worker.py process. WORK_QUEUE_SLOTS chunks run at once per process (0 turns
+# the worker off); a lease not renewed for WORK_LEASE_SECONDS is taken over.
+# A chunk leased WORK_CHUNK_ATTEMPTS times without finishing fails its job
+WORK_QUEUE_SLOTS = int(os.environ.get('WORK_QUEUE_SLOTS', 1))
+WORK_CHUNK_SIZE = int(os.environ.get('WORK_CHUNK_SIZE', 250_000))
+WORK_LEASE_SECONDS = float(os.environ.get('WORK_LEASE_SECONDS', 60))
+WORK_CHUNK_ATTEMPTS = int(os.environ.get('WORK_CHUNK_ATTEMPTS', 3))
+WORK_POLL_INTERVAL = float(os.environ.get('WORK_POLL_INTERVAL', 2.0))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Jobs save each attack unit's progress to db.job_checkpoints every
+# CHECKPOINT_INTERVAL seconds. Jobs interrupted by a shutdown, or whose
+# process has not checkpointed for JOB_RESUME_AFTER seconds, are resumed
+CHECKPOINT_INTERVAL = float(os.environ.get('CHECKPOINT_INTERVAL', 30))
+JOB_RESUME_AFTER = float(os.environ.get('JOB_RESUME_AFTER', 120))
+
+# Seconds between throughput frames on /api/analyze-hashes/stream
+STREAM_THROUGHPUT_INTERVAL = float(os.environ.get('STREAM_THROUGHPUT_INTERVAL', 1.0))
+
+# Admission control for interactive analyses, costed in unsalted digests (see
+# estimate_cost). Analyses up to ADMISSION_SMALL_COST hold one of
+# ADMISSION_SMALL_SLOTS; larger ones hold one of ADMISSION_SLOTS, waiting in
+# a queue of at most ADMISSION_QUEUE_SIZE. Both wait in fair order between
+# clients. Admitted and queued cost is capped per client and in
+# total; a request over a cap gets 429 with a Retry-After of at most
+# ADMISSION_MAX_RETRY_AFTER seconds. Clients are told apart by peer address;
+# set ADMISSION_CLIENT_HEADER only behind a trusted proxy that sets that
+# header itself (e.g. X-Forwarded-For or an authenticated user id), since
+# callers could otherwise pick a fresh identity per request
+ADMISSION_SMALL_COST = float(os.environ.get('ADMISSION_SMALL_COST', 1_000_000))
+ADMISSION_SLOTS = int(os.environ.get('ADMISSION_SLOTS', 2))
+ADMISSION_SMALL_SLOTS = int(os.environ.get('ADMISSION_SMALL_SLOTS', 4 * INTERACTIVE_WORKERS))
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 16))
+ADMISSION_CLIENT_COST = float(os.environ.get('ADMISSION_CLIENT_COST', 2e9))
+ADMISSION_MAX_COST = float(os.environ.get('ADMISSION_MAX_COST', 2e10))
+ADMISSION_MAX_RETRY_AFTER = int(os.environ.get('ADMISSION_MAX_RETRY_AFTER', 60))
+ADMISSION_CLIENT_HEADER = os.environ.get('ADMISSION_CLIENT_HEADER', '')
+
+# Largest keyspace a single brute-force request may enumerate
+BRUTE_FORCE_MAX_KEYSPACE = int(os.environ.get('BRUTE_FORCE_MAX_KEYSPACE', 100_000_000))
+
+# In-process LRU sizes in front of the potfile (cracked hashes) and the
+# negative cache (hashes a given attack is known not to crack)
+POTFILE_CACHE_SIZE = int(os.environ.get('POTFILE_CACHE_SIZE', 100_000))
+MISS_CACHE_SIZE = int(os.environ.get('MISS_CACHE_SIZE', 100_000))
+
+# Per-hash results are written to db.hash_results in insert_many batches
+RESULT_BATCH_SIZE = int(os.environ.get('RESULT_BATCH_SIZE', 1000))
+
+# Directory of prebuilt memory-mapped lookup tables (see lookup_tables.py)
+LOOKUP_TABLE_DIR = Path(os.environ.get('LOOKUP_TABLE_DIR', ROOT_DIR / 'tables'))
+
+# Uploaded wordlists (see wordlists.py), and how many stay loaded per process
+WORDLIST_DIR = Path(os.environ.get('WORDLIST_DIR', ROOT_DIR / 'wordlists'))
+WORDLIST_CACHE_SIZE = int(os.environ.get('WORDLIST_CACHE_SIZE', 16))
+
+# Breached-password Bloom filter used in strength scoring (see password_strength.py)
+BREACHED_FILTER = Path(os.environ.get('BREACHED_FILTER', LOOKUP_TABLE_DIR / 'breached.bloom'))
+
+# Password grammar behind the pcfg attack (see pcfg.py), and the guesses it
+# tries when a request gives no keyspace_limit
+PCFG_MODEL = Path(os.environ.get('PCFG_MODEL', LOOKUP_TABLE_DIR / 'pcfg.json'))
+PCFG_MAX_CANDIDATES = int(os.environ.get('PCFG_MAX_CANDIDATES', 10_000_000))
 
 # Common wordlists for dictionary attacks
 COMMON_PASSWORDS = [
@@ -45,30 +293,224 @@ COMMON_PASSWORDS = [
     "florida", "sarah", "pepsi", "nicholas", "1qaz2wsx", "zxcvbnm", "asdfgh"
 ]
 
+# Mangling rules: "none", "upper", "lower", "capitalize", "reverse", "leet",
+# "append:<suffix>", "prepend:<prefix>" and "years:<start>-<end>"; chain
+# several with "+", e.g. "capitalize+years:2015-2025"
+LEET_TABLE = str.maketrans("aeiost", "4310$7")
+DEFAULT_RULES = [
+    "none", "upper", "capitalize", "append:1", "append:123", "append:!", "append:@",
+    "prepend:1", "prepend:123", "append:2024", "append:2023", "append:2025"
+]
+
+def parse_rule(spec: str) -> Callable[[str], Iterable[str]]:
+    """Turn a rule spec into a function yielding a word's variants"""
+    if "+" in spec:
+        first, _, rest = spec.partition("+")
+        head, tail = parse_rule(first), parse_rule(rest)
+        return lambda word: (variant for step in head(word) for variant in tail(step))
+    
+    name, _, arg = spec.partition(":")
+    if name == "none":
+        return lambda word: (word,)
+    elif name == "upper":
+        return lambda word: (word.upper(),)
+    elif name == "lower":
+        return lambda word: (word.lower(),)
+    elif name == "capitalize":
+        return lambda word: (word.capitalize(),)
+    elif name == "reverse":
+        return lambda word: (word[::-1],)
+    elif name == "leet":
+        return lambda word: (word.translate(LEET_TABLE),)
+    elif name == "append" and arg:
+        return lambda word: (word + arg,)
+    elif name == "prepend" and arg:
+        return lambda word: (arg + word,)
+    elif name == "years" and re.match(r'^\d{1,4}-\d{1,4}$', arg):
+        first, last = (int(year) for year in arg.split("-"))
+        years = [str(year) for year in range(first, last + 1)]
+        return lambda word: (word + year for year in years)
+    raise ValueError(f"Unknown rule: {spec}")
+
+class RuleEngine:
+    """Lazily applies mangling rules to a stream of words
+
+    Variants of the same word are deduplicated with a per-word set, so memory
+    does not grow with the wordlist. ``stats`` counts candidates produced and
+    cracks credited per rule.
+    """
+    
+    def __init__(self, rules: List[str]):
+        self.rules = [(spec, parse_rule(spec)) for spec in rules]
+        self.stats = {spec: {"candidates": 0, "hits": 0} for spec in rules}
+        self.last_rule = None
+        self.last_candidate = None
+    
+    def apply(self, words: Iterable[str]) -> Iterator[str]:
+        for word in words:
+            seen = set()
+            for spec, transform in self.rules:
+                for candidate in transform(word):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    self.stats[spec]["candidates"] += 1
+                    self.last_rule = spec
+                    self.last_candidate = candidate
+                    yield candidate
+    
+    def record_hit(self, candidate: str):
+        """Credit a crack to the rule that produced the most recent candidate"""
+        if candidate == self.last_candidate:
+            self.stats[self.last_rule]["hits"] += 1
+
+# Cumulative per-rule statistics across requests, served by /api/rule-stats
+RULE_STATS: Dict[str, Dict[str, int]] = {}
+
+def record_rule_stats(engines: Iterable[RuleEngine]):
+    """Add the per-rule counts of an analysis' engines to RULE_STATS"""
+    for engine in engines:
+        for spec, counts in engine.stats.items():
+            totals = RULE_STATS.setdefault(spec, {"candidates": 0, "hits": 0})
+            totals["candidates"] += counts["candidates"]
+            totals["hits"] += counts["hits"]
+
 # Extended wordlist with common variations
-EXTENDED_WORDLIST = []
-for password in COMMON_PASSWORDS:
-    EXTENDED_WORDLIST.extend([
-        password,
-        password.upper(),
-        password.capitalize(),
-        password + "1",
-        password + "123",
-        password + "!",
-        password + "@",
-        "1" + password,
-        "123" + password,
-        password + "2024",
-        password + "2023",
-        password + "2025"
-    ])
+EXTENDED_WORDLIST = list(RuleEngine(DEFAULT_RULES).apply(COMMON_PASSWORDS))
+
+# Brute-force mask tokens: ?l ?u ?d ?s ?a, ?1 for the request's custom charset
+CHARSETS = {
+    "l": string.ascii_lowercase,
+    "u": string.ascii_uppercase,
+    "d": string.digits,
+    "s": string.punctuation + " ",
+    "a": string.ascii_letters + string.digits + string.punctuation + " ",
+}
+
+def parse_mask(mask: str, custom_charset: str = "") -> List[bytes]:
+    """Turn a mask like "?u?l?l?d?d" into one charset per position"""
+    positions = []
+    i = 0
+    while i < len(mask):
+        if mask[i] == "?" and i + 1 < len(mask):
+            token = mask[i + 1]
+            i += 2
+            if token == "?":
+                positions.append(b"?")
+            elif token == "1" and custom_charset:
+                positions.append(expand_charset(custom_charset))
+            elif token in CHARSETS:
+                positions.append(CHARSETS[token].encode())
+            else:
+                raise ValueError(f"Unknown mask token: ?{token}")
+        else:
+            literal = mask[i].encode()
+            if len(literal) != 1:
+                raise ValueError("Masks and charsets must be ASCII")
+            positions.append(literal)
+            i += 1
+    return positions
+
+def expand_charset(charset: str) -> bytes:
+    """Expand "?l?d"-style tokens in a charset, dropping repeated characters"""
+    return bytes(dict.fromkeys(b"".join(parse_mask(charset))))
+
+class Keyspace:
+    """Index-addressable brute-force keyspace made of one or more masks
+
+    Candidate ``i`` is a mixed-radix number over its mask's per-position
+    charsets, so any range of indices can be handed to a worker or resumed
+    from an offset.
+    """
+    
+    def __init__(self, masks: List[List[bytes]]):
+        self.masks = masks
+        self.sizes = [math.prod(len(charset) for charset in mask) for mask in masks]
+        self.size = sum(self.sizes)
+    
+    @classmethod
+    def from_request(cls, mask: Optional[str], charset: Optional[str], max_length: int) -> "Keyspace":
+        """A single mask, or every length up to max_length over a charset (default ?l?d)"""
+        if mask:
+            return cls([parse_mask(mask, charset or "")])
+        chars = expand_charset(charset or "?l?d")
+        if not chars or max_length < 1:
+            raise ValueError("Brute force needs a non-empty charset and max_length >= 1")
+        return cls([[chars] * length for length in range(1, max_length + 1)])
+    
+    def _digits(self, mask: List[bytes], index: int) -> List[int]:
+        digits = [0] * len(mask)
+        for position in range(len(mask) - 1, -1, -1):
+            index, digits[position] = divmod(index, len(mask[position]))
+        return digits
+    
+    def candidate(self, index: int) -> bytes:
+        for mask, size in zip(self.masks, self.sizes):
+            if index < size:
+                return bytes(mask[p][d] for p, d in enumerate(self._digits(mask, index)))
+            index -= size
+        raise IndexError("Keyspace index out of range")
+    
+    def iter_range(self, start: int, end: int) -> Iterator[bytearray]:
+        """Yield candidates start..end-1 as one reused, mutated bytearray
+
+        Consumers must copy (or decode) a candidate they want to keep.
+        """
+        for mask, size in zip(self.masks, self.sizes):
+            if start >= size:
+                start -= size
+                end -= size
+                continue
+            if end <= 0:
+                return
+            
+            digits = self._digits(mask, start)
+            buffer = bytearray(mask[p][d] for p, d in enumerate(digits))
+            last_charset = mask[-1]
+            remaining = min(end, size) - start
+            
+            while remaining > 0:
+                # Sweep the last position, then carry into the ones before it
+                first = digits[-1]
+                stop = min(len(last_charset), first + remaining)
+                for char in last_charset[first:stop]:
+                    buffer[-1] = char
+                    yield buffer
+                remaining -= stop - first
+                
+                digits[-1] = 0
+                position = len(mask) - 2
+                while position >= 0:
+                    digits[position] += 1
+                    if digits[position] < len(mask[position]):
+                        buffer[position] = mask[position][digits[position]]
+                        break
+                    digits[position] = 0
+                    buffer[position] = mask[position][0]
+                    position -= 1
+            
+            start = 0
+            end -= size
 
 # Define Models
 class HashAnalysisRequest(BaseModel):
     hashes: List[str] = Field(..., description="List of hashes to analyze")
-    attack_type: str = Field(default="dictionary", description="Type of attack: dictionary, brute_force")
+    attack_type: str = Field(default="dictionary", description="Type of attack: dictionary, brute_force, pcfg")
     custom_wordlist: Optional[List[str]] = Field(None, description="Custom wordlist for dictionary attack")
+    wordlist_id: Optional[str] = Field(None, description="Id of a wordlist uploaded to /api/wordlists, instead of custom_wordlist")
     max_length: Optional[int] = Field(8, description="Maximum length for brute force attack")
+    lookup_table: Optional[str] = Field(None, description="Name of a prebuilt on-disk lookup table for dictionary attack")
+    rules: Optional[List[str]] = Field(None, description="Mangling rules applied lazily to the wordlist")
+    mask: Optional[str] = Field(None, description="Brute force mask, e.g. ?u?l?l?l?d?d")
+    charset: Optional[str] = Field(None, description="Brute force charset (?1 in masks); default ?l?d")
+    keyspace_offset: int = Field(0, ge=0, description="Keyspace index (or pcfg guess) to start or resume brute force from")
+    keyspace_limit: Optional[int] = Field(None, gt=0, description="Number of keyspace candidates (or pcfg guesses) to try from the offset")
+    time_budget: Optional[float] = Field(None, gt=0, description="Seconds allowed for bcrypt work in this analysis")
+    include_timings: bool = Field(False, description="Attach a per-stage timing breakdown to each result")
+
+class JobRequest(HashAnalysisRequest):
+    priority: int = Field(0, description="Higher priorities are scheduled first")
+    distributed: bool = Field(False, description="Split the job into work-queue chunks that any worker node can lease")
 
 class HashResult(BaseModel):
     hash_value: str
@@ -78,6 +520,9 @@ class HashResult(BaseModel):
     strength_score: int
     time_taken: float
     attempts: int
+    timed_out: bool = False
+    cached: bool = False
+    timings: Optional[Dict[str, float]] = None
 
 class HashAnalysisResponse(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -90,37 +535,71 @@ class HashAnalysisResponse(BaseModel):
 class HashAnalysisHistory(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    results: List[HashResult]
+    results: List[HashResult] = []
+    total_hashes: int = 0
     total_cracked: int
     total_time: float
     summary: str
 
+class ImportedHashResult(HashResult):
+    users: List[Optional[str]] = Field(..., description="Every account that used this hash (None for bare hash lines)")
+
+class HashImportResponse(BaseModel):
+    analysis_id: Optional[str] = None
+    total_lines: int
+    skipped_lines: int
+    total_accounts: int
+    unique_hashes: int
+    cracked_accounts: int
+    formats: Dict[str, int]
+    results: List[ImportedHashResult]
+
+# Hash identification dispatch: hex digests by length, crypt formats by prefix
+HEX_HASH_TYPES = {32: "MD5", 40: "SHA-1", 64: "SHA-256", 128: "SHA-512"}
+PREFIX_HASH_TYPES = {
+    "$2b$": "bcrypt", "$2a$": "bcrypt", "$2y$": "bcrypt",
+    "$6$": "SHA-512 (Unix)", "$5$": "SHA-256 (Unix)", "$1$": "MD5 (Unix)",
+}
+HEX_PATTERN = re.compile(r'[a-fA-F0-9]+')
+DES_PATTERN = re.compile(r'[a-zA-Z0-9./]{13}')
+
 def identify_hash_type(hash_value: str) -> str:
     """Identify the type of hash based on its characteristics"""
     hash_value = hash_value.strip()
     
     # Check for common hash patterns
-    if len(hash_value) == 32 and re.match(r'^[a-f0-9]+$', hash_value, re.IGNORECASE):
-        return "MD5"
-    elif len(hash_value) == 40 and re.match(r'^[a-f0-9]+$', hash_value, re.IGNORECASE):
-        return "SHA-1"
-    elif len(hash_value) == 64 and re.match(r'^[a-f0-9]+$', hash_value, re.IGNORECASE):
-        return "SHA-256"
-    elif len(hash_value) == 128 and re.match(r'^[a-f0-9]+$', hash_value, re.IGNORECASE):
-        return "SHA-512"
-    elif hash_value.startswith('$2b$') or hash_value.startswith('$2a$') or hash_value.startswith('$2y$'):
-        return "bcrypt"
-    elif hash_value.startswith('$6$'):
-        return "SHA-512 (Unix)"
-    elif hash_value.startswith('$5$'):
-        return "SHA-256 (Unix)"
-    elif hash_value.startswith('$1$'):
-        return "MD5 (Unix)"
-    elif len(hash_value) == 13 and re.match(r'^[a-zA-Z0-9./]+$', hash_value):
+    hex_type = HEX_HASH_TYPES.get(len(hash_value))
+    if hex_type and HEX_PATTERN.fullmatch(hash_value):
+        return hex_type
+    elif hash_value[:1] == "$":
+        return PREFIX_HASH_TYPES.get(hash_value[:4]) or PREFIX_HASH_TYPES.get(hash_value[:3], "Unknown")
+    elif DES_PATTERN.fullmatch(hash_value):
         return "DES (Unix)"
     else:
         return "Unknown"
 
+class BreachedPasswords(NamedTuple):
+    """Built-in words for pattern matching, plus the optional on-disk breach filter"""
+    words: frozenset
+    bloom: Optional[BloomFilter]
+
+@functools.lru_cache(maxsize=None)
+def get_breached_passwords() -> BreachedPasswords:
+    """Open (once per process) the breach filter; its pages are shared between workers"""
+    bloom = BloomFilter(BREACHED_FILTER) if BREACHED_FILTER.exists() else None
+    return BreachedPasswords(frozenset(word.lower() for word in EXTENDED_WORDLIST), bloom)
+
+@functools.lru_cache(maxsize=65536)
+def plaintext_strength(plaintext: str) -> tuple[float, bool]:
+    """Pattern-aware entropy in bits, and whether the password appears in a breach corpus"""
+    breached = get_breached_passwords()
+    # The filter answers whole-password membership only; probing it for every
+    # substring would cost a digest per slice for little extra signal
+    lowered = plaintext.lower()
+    found = lowered in breached.words or (breached.bloom is not None
+                                          and (plaintext in breached.bloom or lowered in breached.bloom))
+    return estimate_entropy(plaintext, breached.words), found
+
 def calculate_strength_score(hash_type: str, plaintext: Optional[str] = None) -> int:
     """Calculate strength score based on hash type and plaintext complexity"""
     base_scores = {
@@ -140,76 +619,811 @@ def calculate_strength_score(hash_type: str, plaintext: Optional[str] = None) ->
     
     if plaintext:
         # Reduce score based on plaintext weakness
-        if len(plaintext) < 6:
+        entropy, breached = plaintext_strength(plaintext)
+        if breached or entropy < 28:
             score = max(1, score - 3)
-        elif len(plaintext) < 8:
-            score = max(1, score - 2)
-        elif plaintext.lower() in [p.lower() for p in COMMON_PASSWORDS]:
+        elif entropy < 36:
             score = max(1, score - 2)
-        elif not any(c.isupper() for c in plaintext):
-            score = max(1, score - 1)
-        elif not any(c.isdigit() for c in plaintext):
+        elif entropy < 60:
             score = max(1, score - 1)
     
     return min(10, max(1, score))
 
+# Unsalted algorithms: a candidate's digest is the same for every target of the type
+HASH_ALGORITHMS = {
+    "MD5": hashlib.md5,
+    "SHA-1": hashlib.sha1,
+    "SHA-256": hashlib.sha256,
+    "SHA-512": hashlib.sha512,
+}
+
+# Salted Unix crypt(3) formats, attacked one salt group at a time
+CRYPT_TYPES = ("MD5 (Unix)", "SHA-256 (Unix)", "SHA-512 (Unix)", "DES (Unix)")
+
+def candidate_hasher(hash_type: str, setting: Optional[CryptSetting] = None) -> Callable[[bytes], str]:
+    """Map an encoded candidate to the target it produces: a hex digest, or a crypt string under ``setting``"""
+    if setting is not None:
+        return lambda candidate: crypt_hash(candidate.decode("utf-8", errors="replace"), setting)
+    algorithm = HASH_ALGORITHMS[hash_type]
+    return lambda candidate: algorithm(candidate).hexdigest()
+
 def hash_password(password: str, hash_type: str) -> str:
     """Hash a password using the specified algorithm"""
-    if hash_type == "MD5":
-        return hashlib.md5(password.encode()).hexdigest()
-    elif hash_type == "SHA-1":
-        return hashlib.sha1(password.encode()).hexdigest()
-    elif hash_type == "SHA-256":
-        return hashlib.sha256(password.encode()).hexdigest()
-    elif hash_type == "SHA-512":
-        return hashlib.sha512(password.encode()).hexdigest()
-    return ""
-
-def crack_hash_dictionary(hash_value: str, hash_type: str, wordlist: List[str]) -> tuple[bool, Optional[str], int]:
+    algorithm = HASH_ALGORITHMS.get(hash_type)
+    if algorithm is None:
+        return ""
+    return algorithm(password.encode()).hexdigest()
+
+def normalize_target(hash_value: str, hash_type: str) -> str:
+    """Key a target by its hash value: hex digests are case-insensitive, crypt strings are not"""
+    if hash_type in HASH_ALGORITHMS:
+        return hash_value.strip().lower()
+    return hash_value.strip()
+
+# "$2b$12$" + 22-character salt + 31-character checksum; the first 29
+# characters are the setting bcrypt.hashpw takes as its salt
+BCRYPT_PATTERN = re.compile(r'^\$2[abxy]\$(\d{2})\$[./A-Za-z0-9]{53}$')
+
+def bcrypt_setting(hash_value: str) -> Optional[str]:
+    """Cost-and-salt prefix shared by bcrypt hashes with the same salt, or None if malformed"""
+    hash_value = hash_value.strip()
+    if not BCRYPT_PATTERN.match(hash_value):
+        return None
+    return hash_value[:29]
+
+def bcrypt_cost(setting: str) -> int:
+    return int(setting[4:6])
+
+def crack_bcrypt_group(hash_values: List[str], setting: str, wordlist: Iterable[str], deadline: Optional[float] = None, on_crack: Optional[Callable[[str, tuple], None]] = None) -> tuple[Dict[str, tuple[bool, Optional[str], int, float]], bool]:
+    """Attack bcrypt hashes sharing one cost and salt, deriving each candidate once
+
+    Stops at the earlier of ``deadline`` and BCRYPT_TIME_BUDGET seconds from
+    now. Returns results keyed like crack_hash_batch (with partial attempts
+    for uncracked targets) and whether the time budget ran out.
+    """
+    start_time = time.time()
+    budget_end = start_time + BCRYPT_TIME_BUDGET
+    deadline = min(deadline, budget_end) if deadline else budget_end
+    encoded_setting = setting.encode()
+    remaining = {hash_value.strip() for hash_value in hash_values}
+    results = {}
+    attempts = 0
+    timed_out = False
+    
+    for password in wordlist:
+        if not remaining:
+            break
+        if time.time() >= deadline:
+            timed_out = True
+            break
+        attempts += 1
+        
+        hashed = bcrypt.hashpw(password.encode(), encoded_setting).decode()
+        if hashed in remaining:
+            remaining.discard(hashed)
+            results[hashed] = (True, password, attempts, time.time() - start_time)
+            if on_crack:
+                on_crack(hashed, results[hashed])
+    
+    elapsed = time.time() - start_time
+    for target in remaining:
+        results[target] = (False, None, attempts, elapsed)
+    
+    return results, timed_out
+
+class AttackCancelled(Exception):
+    """Raised inside attack loops once their job has been cancelled"""
+
+class UnitProgress:
+    """Resumable position of one attack unit: candidates fully checked and targets cracked
+
+    ``offset`` counts candidates from the start of the unit's stream that
+    every target has been checked against. Streams advance it as they are
+    consumed; sharded engines finish ranges out of order, so ``complete``
+    holds a range back until all ranges before it are done. Cracks are noted
+    (from the scanning thread) before the offset moves past them.
+    """
+    
+    def __init__(self, offset: int = 0, cracked: Optional[Dict[str, tuple[str, int]]] = None, done: bool = False, tried: int = 0):
+        self.offset = offset
+        self.cracked = cracked or {}
+        self.done = done
+        self.tried = tried
+        self.pending: Dict[int, int] = {}
+        self.saved: Optional[Dict[str, Any]] = None
+    
+    def complete(self, start: int, end: int):
+        self.pending[start] = end
+        while self.offset in self.pending:
+            self.offset = self.pending.pop(self.offset)
+    
+    def document(self) -> Dict[str, Any]:
+        # Offset first: any crack before it is already in ``cracked``
+        offset = self.offset
+        cracked = list(self.cracked.items())
+        return {
+            "offset": offset,
+            "cracked": [[target, plaintext, position] for target, (plaintext, position) in cracked],
+            "done": self.done,
+            "tried": self.tried
+        }
+    
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "UnitProgress":
+        cracked = {target: (plaintext, position) for target, plaintext, position in doc.get("cracked", [])}
+        progress = cls(doc.get("offset", 0), cracked, doc.get("done", False), doc.get("tried", 0))
+        progress.saved = progress.document()
+        return progress
+
+class JobCheckpoint:
+    """Progress of a job's attack units, keyed by hash type and salt setting"""
+    
+    def __init__(self, units: Optional[Dict[str, UnitProgress]] = None):
+        self.units = units or {}
+    
+    def unit(self, key: str) -> UnitProgress:
+        return self.units.setdefault(key, UnitProgress())
+    
+    def changes(self) -> List[tuple[str, Dict[str, Any]]]:
+        """Units whose document differs from the last one saved"""
+        changed = []
+        for key, progress in list(self.units.items()):
+            doc = progress.document()
+            if doc != progress.saved:
+                changed.append((key, doc))
+        return changed
+    
+    def mark_saved(self, changed: List[tuple[str, Dict[str, Any]]]):
+        for key, doc in changed:
+            self.units[key].saved = doc
+
+class AttackControl:
+    """Progress counters and cancellation flag shared by one analysis' attacks
+
+    Set through the ``attack_control`` context variable; the async attack
+    functions hand it to executor work by wrapping candidate streams with
+    ``track`` and by registering shared shard mappings. Background jobs and
+    large interactive analyses (``scheduled``) wait for job_scheduler slots,
+    shared fairly between ``client``s, and hash on thread_pool.
+    """
+    
+    def __init__(self, priority: int = 0, scheduled: bool = False, client: Optional[str] = None, background: bool = False):
+        self.priority = priority
+        self.scheduled = scheduled
+        self.client = client
+        self.background = background
+        self.tried = 0
+        self.tried_by_type: Dict[str, int] = {}
+        self.cancelled = False
+        self.interrupted = False
+        self.shared: List[Any] = []
+        self.checkpoint: Optional[JobCheckpoint] = None
+        # job_scheduler slot time: seconds of released slots, start times of held ones
+        self.slot_seconds = 0.0
+        self.slot_started: List[float] = []
+    
+    def add(self, hash_type: str, count: int, progress: Optional[UnitProgress] = None):
+        self.tried += count
+        self.tried_by_type[hash_type] = self.tried_by_type.get(hash_type, 0) + count
+        if progress is not None:
+            progress.offset += count
+    
+    def cancel(self, interrupted: bool = False):
+        """Stop the attacks; ``interrupted`` (server shutdown) leaves the job to be resumed"""
+        self.cancelled = True
+        self.interrupted = interrupted
+        for cracked in list(self.shared):
+            try:
+                cracked[SHARD_CANCELLED] = True
+            except Exception:
+                pass
+    
+    def check(self):
+        if self.cancelled:
+            raise AttackCancelled()
+    
+    def track(self, candidates: Iterable, hash_type: str, progress: Optional[UnitProgress] = None) -> Iterator:
+        """Count candidates as they are consumed (into ``progress`` too), stopping once cancelled"""
+        count = 0
+        try:
+            for candidate in candidates:
+                if self.cancelled:
+                    raise AttackCancelled()
+                yield candidate
+                count += 1
+                if count == PROGRESS_INTERVAL:
+                    self.add(hash_type, count, progress)
+                    count = 0
+        finally:
+            self.add(hash_type, count, progress)
+
+attack_control: contextvars.ContextVar[Optional[AttackControl]] = contextvars.ContextVar("attack_control", default=None)
+
+def record_attack(hash_type: str, tried: int, elapsed: float):
+    """Account one attack unit's candidates and wall time in the hash-rate metrics"""
+    CANDIDATES_TRIED.inc(tried, algorithm=hash_type)
+    ATTACK_SECONDS.inc(elapsed, algorithm=hash_type)
+    if elapsed > 0:
+        HASH_RATE.set(tried / elapsed, algorithm=hash_type)
+    STAGE_SECONDS.observe(elapsed, stage="attack")
+
+def tracked(candidates: Iterable, hash_type: str, progress: Optional[UnitProgress] = None) -> Iterable:
+    """Wrap a candidate stream with the current AttackControl, if any"""
+    control = attack_control.get()
+    return control.track(candidates, hash_type, progress) if control else candidates
+
+def hash_pool() -> TrackedExecutor:
+    """thread_pool for scheduled work, interactive_pool for analyses admitted as small"""
+    control = attack_control.get()
+    return thread_pool if control is not None and control.scheduled else interactive_pool
+
+def crack_hash_dictionary(hash_value: str, hash_type: str, wordlist: Iterable[str], on_crack: Optional[Callable[[str], None]] = None) -> tuple[bool, Optional[str], int]:
     """Attempt to crack a hash using dictionary attack"""
     attempts = 0
+    crypt_setting = None
+    if hash_type in CRYPT_TYPES:
+        crypt_setting = parse_crypt(hash_value)
+        if crypt_setting is None or not crypt_supported(crypt_setting):
+            return False, None, attempts
     
     for password in wordlist:
         attempts += 1
         
-        if hash_type == "bcrypt":
+        if crypt_setting is not None:
+            if crypt_hash(password, crypt_setting) == hash_value.strip():
+                if on_crack:
+                    on_crack(password)
+                return True, password, attempts
+        elif hash_type == "bcrypt":
             try:
                 if bcrypt.checkpw(password.encode(), hash_value.encode()):
+                    if on_crack:
+                        on_crack(password)
                     return True, password, attempts
             except:
                 continue
         else:
             hashed = hash_password(password, hash_type)
             if hashed.lower() == hash_value.lower():
+                if on_crack:
+                    on_crack(password)
                 return True, password, attempts
     
     return False, None, attempts
 
-async def analyze_single_hash(hash_value: str, attack_type: str, custom_wordlist: Optional[List[str]]) -> HashResult:
+def crack_hash_batch(hash_values: List[str], hash_type: str, wordlist: Iterable, on_crack: Optional[Callable[[str, tuple], None]] = None, setting: Optional[CryptSetting] = None, encoded: bool = False) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Attempt to crack many unsalted hashes of one type in a single wordlist pass
+
+    Each candidate is hashed once and looked up in the set of still-uncracked
+    targets. Results are keyed by normalized hash value (see normalize_target)
+    and carry the attempt count and elapsed time at which each target fell.
+    ``on_crack(target, outcome)`` is called from the scanning thread per crack.
+    With a crypt ``setting``, the targets are the Unix crypt hashes sharing it.
+    ``encoded`` candidates are UTF-8 bytes (see PackedWordlist.encoded).
+    """
+    start_time = time.time()
+    hasher = candidate_hasher(hash_type, setting)
+    remaining = {normalize_target(hash_value, hash_type) for hash_value in hash_values}
+    results = {}
+    attempts = 0
+    
+    for password in wordlist:
+        if not remaining:
+            break
+        attempts += 1
+        
+        hashed = hasher(password if encoded else password.encode())
+        if hashed in remaining:
+            remaining.discard(hashed)
+            plaintext = password.decode("utf-8", errors="replace") if encoded else password
+            results[hashed] = (True, plaintext, attempts, time.time() - start_time)
+            if on_crack:
+                on_crack(hashed, results[hashed])
+    
+    elapsed = time.time() - start_time
+    for target in remaining:
+        results[target] = (False, None, attempts, elapsed)
+    
+    return results
+
+@functools.lru_cache(maxsize=None)
+def get_digest_index(hash_type: str) -> Dict[str, tuple[str, int]]:
+    """Build (once, lazily) a digest -> (plaintext, position) index of EXTENDED_WORDLIST"""
+    algorithm = HASH_ALGORITHMS[hash_type]
+    index = {}
+    for position, password in enumerate(EXTENDED_WORDLIST, start=1):
+        index.setdefault(algorithm(password.encode()).hexdigest(), (password, position))
+    return index
+
+def crack_hash_indexed(hash_values: List[str], hash_type: str) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Resolve unsalted hashes against the built-in wordlist with one lookup each
+
+    Returns the same mapping as crack_hash_batch; ``attempts`` is the
+    candidate's wordlist position, or the wordlist size when not found.
+    """
+    start_time = time.time()
+    index = get_digest_index(hash_type)
+    results = {}
+    
+    for hash_value in hash_values:
+        target = hash_value.strip().lower()
+        match = index.get(target)
+        if match:
+            results[target] = (True, match[0], match[1], time.time() - start_time)
+        else:
+            results[target] = (False, None, len(EXTENDED_WORDLIST), time.time() - start_time)
+    
+    return results
+
+@functools.lru_cache(maxsize=None)
+def get_pcfg_model() -> Optional[Grammar]:
+    """Load (once per process) the password grammar, or None if none was trained"""
+    if not PCFG_MODEL.exists():
+        return None
+    return Grammar.load(PCFG_MODEL)
+
+# Open lookup tables by (name, algorithm). Only tables that exist are kept, so
+# one built later is picked up without a restart, and a table rebuilt in
+# place is reopened
+open_lookup_tables: Dict[tuple[str, str], LookupTable] = {}
+
+def get_lookup_table(name: str, hash_type: str) -> Optional[LookupTable]:
+    """The memory-mapped table for a wordlist and hash type, or None if it is not built"""
+    algorithm = HASH_ALGORITHMS[hash_type]().name
+    table_file = table_path(LOOKUP_TABLE_DIR, name, algorithm)
+    try:
+        stat = table_file.stat()
+    except FileNotFoundError:
+        open_lookup_tables.pop((name, algorithm), None)
+        return None
+    table = open_lookup_tables.get((name, algorithm))
+    if table is None or table.version != file_version(stat):
+        table = open_lookup_tables[(name, algorithm)] = LookupTable(table_file, wordlist_path(LOOKUP_TABLE_DIR, name))
+    return table
+
+def lookup_table_exists(name: str) -> bool:
+    """Whether a table of this name is built for at least one algorithm"""
+    if not wordlist_path(LOOKUP_TABLE_DIR, name).exists():
+        return False
+    return any(table_path(LOOKUP_TABLE_DIR, name, algorithm().name).exists() for algorithm in HASH_ALGORITHMS.values())
+
+def crack_hash_table(hash_values: List[str], hash_type: str, table: LookupTable) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Resolve unsalted hashes by binary search in an on-disk lookup table
+
+    Returns the same mapping as crack_hash_batch; ``attempts`` is the number
+    of table records probed.
+    """
+    start_time = time.time()
+    results = {}
+    
+    for hash_value in hash_values:
+        target = hash_value.strip().lower()
+        try:
+            plaintext, probes = table.lookup(bytes.fromhex(target))
+        except ValueError:
+            plaintext, probes = None, 0
+        results[target] = (plaintext is not None, plaintext, probes, time.time() - start_time)
+    
+    return results
+
+def crack_shard(targets: List[str], hash_type: str, shard: Sequence[str], offset: int, cracked: Any, start_time: float, setting: Optional[CryptSetting] = None) -> tuple[Dict[str, tuple[str, int, float]], int]:
+    """Worker-process half of crack_hash_sharded: scan one wordlist shard
+
+    Finds are published to the shared ``cracked`` mapping and targets cracked
+    by other shards are dropped every SHARD_SYNC_INTERVAL candidates, so a
+    shard stops as soon as the whole group is cracked (or the job cancelled).
+    Returns the shard's finds (plaintext, wordlist position, elapsed) and
+    candidates tried. A PackedWordlist shard travels as one bytes buffer and
+    is hashed without re-encoding.
+    """
+    hasher = candidate_hasher(hash_type, setting)
+    remaining = set(targets).difference(cracked.keys())
+    found = {}
+    unpublished = {}
+    tried = 0
+    encoded = isinstance(shard, PackedWordlist)
+    
+    for password in (shard.encoded() if encoded else shard):
+        if tried % SHARD_SYNC_INTERVAL == 0 and tried:
+            if unpublished:
+                cracked.update(unpublished)
+                unpublished = {}
+            published = cracked.keys()
+            if SHARD_CANCELLED in published:
+                break
+            remaining.difference_update(published)
+        if not remaining:
+            break
+        tried += 1
+        
+        hashed = hasher(password if encoded else password.encode())
+        if hashed in remaining:
+            remaining.discard(hashed)
+            plaintext = password.decode("utf-8", errors="replace") if encoded else password
+            found[hashed] = (plaintext, offset + tried, time.time() - start_time)
+            unpublished[hashed] = True
+    
+    if unpublished:
+        cracked.update(unpublished)
+    
+    return found, tried
+
+def get_shard_manager():
+    global shard_manager
+    if shard_manager is None:
+        shard_manager = process_context.Manager()
+    return shard_manager
+
+def report_shard(found: Dict[str, tuple[str, int, float]], tried: int, hash_type: str, on_crack: Optional[Callable[[str, tuple], None]]):
+    """Pass a finished shard's progress and finds on as they arrive"""
+    control = attack_control.get()
+    if control:
+        control.add(hash_type, tried)
+    if on_crack:
+        for target, (password, position, elapsed) in found.items():
+            on_crack(target, (True, password, position, elapsed))
+
+async def run_shards(shard_calls: List[tuple], cracked: Any, hash_type: str, on_crack: Optional[Callable[[str, tuple], None]] = None, on_shard: Optional[Callable[[int], None]] = None, pool: Optional[TrackedExecutor] = None) -> List[tuple[Dict[str, tuple[str, int, float]], int]]:
+    """Run shard calls on ``pool`` (the process pool by default), reporting each shard (and its index to ``on_shard``) as it finishes"""
+    control = attack_control.get()
+    loop = asyncio.get_event_loop()
+    
+    async def run_shard(index: int, call: tuple):
+        found, tried = await loop.run_in_executor(pool or process_pool, *call)
+        report_shard(found, tried, hash_type, on_crack)
+        if on_shard:
+            on_shard(index)
+        return found, tried
+    
+    if control:
+        control.shared.append(cracked)
+    try:
+        shard_results = await asyncio.gather(*[run_shard(index, call) for index, call in enumerate(shard_calls)])
+    finally:
+        if control:
+            control.shared.remove(cracked)
+    
+    if control:
+        control.check()
+    return shard_results
+
+def merge_shard_results(targets: List[str], shard_results: List[tuple[Dict[str, tuple[str, int, float]], int]], start_time: float) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Merge shard finds, keeping the earliest position for each target"""
+    results = {}
+    total_tried = 0
+    for found, tried in shard_results:
+        total_tried += tried
+        for target, (password, position, elapsed) in found.items():
+            if target not in results or position < results[target][2]:
+                results[target] = (True, password, position, elapsed)
+    
+    elapsed = time.time() - start_time
+    for target in targets:
+        if target not in results:
+            results[target] = (False, None, total_tried, elapsed)
+    
+    return results
+
+async def crack_hash_sharded(hash_values: List[str], hash_type: str, wordlist: Sequence[str], on_crack: Optional[Callable[[str, tuple], None]] = None, setting: Optional[CryptSetting] = None, on_range: Optional[Callable[[int, int], None]] = None) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Process-pool counterpart of crack_hash_batch, one task per wordlist shard
+
+    Crypt settings run on crypt_pool, so they use every core in thread mode too.
+    Cracked targets report their wordlist position as ``attempts``, matching
+    the sequential engine; uncracked targets report the candidates actually
+    tried across all shards. ``on_range(start, end)`` follows finished shards.
+    """
+    start_time = time.time()
+    targets = list({normalize_target(hash_value, hash_type) for hash_value in hash_values})
+    shard_size = SHARD_SIZE if setting is None else CRYPT_SHARD_SIZE
+    cracked = get_shard_manager().dict()
+    offsets = range(0, len(wordlist), shard_size)
+    
+    def on_shard(index: int):
+        if on_range:
+            on_range(offsets[index], min(offsets[index] + shard_size, len(wordlist)))
+    
+    try:
+        shard_results = await run_shards([
+            (crack_shard, targets, hash_type, wordlist[offset:offset + shard_size], offset, cracked, start_time, setting)
+            for offset in offsets
+        ], cracked, hash_type, on_crack, on_shard, crypt_pool if setting else None)
+    finally:
+        del cracked
+    
+    return merge_shard_results(targets, shard_results, start_time)
+
+def crack_keyspace_range(targets: List[str], hash_type: str, keyspace: Keyspace, start: int, end: int, cracked: Any, start_time: float, setting: Optional[CryptSetting] = None) -> tuple[Dict[str, tuple[str, int, float]], int]:
+    """Brute-force keyspace indices [start, end) against unsalted targets
+
+    Follows the crack_shard protocol, so it runs on a worker process with a
+    shared ``cracked`` mapping or on a thread with a plain dict. Positions
+    are 1-based keyspace indices.
+    """
+    hasher = candidate_hasher(hash_type, setting)
+    remaining = set(targets).difference(cracked.keys())
+    found = {}
+    unpublished = {}
+    tried = 0
+    
+    for candidate in keyspace.iter_range(start, end):
+        if tried % SHARD_SYNC_INTERVAL == 0 and tried:
+            if unpublished:
+                cracked.update(unpublished)
+                unpublished = {}
+            published = cracked.keys()
+            if SHARD_CANCELLED in published:
+                break
+            remaining.difference_update(published)
+        if not remaining:
+            break
+        tried += 1
+        
+        hashed = hasher(candidate)
+        if hashed in remaining:
+            remaining.discard(hashed)
+            found[hashed] = (candidate.decode("utf-8", errors="replace"), start + tried, time.time() - start_time)
+            unpublished[hashed] = True
+    
+    if unpublished:
+        cracked.update(unpublished)
+    
+    return found, tried
+
+async def crack_hash_keyspace(hash_values: List[str], hash_type: str, keyspace: Keyspace, offset: int, end: int, on_crack: Optional[Callable[[str, tuple], None]] = None, setting: Optional[CryptSetting] = None, on_range: Optional[Callable[[int, int], None]] = None) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Brute-force unsalted hashes of one type, or crypt hashes of one setting, over keyspace indices [offset, end)
+
+    The range is split into index chunks: in parallel tasks on the process
+    pool (crypt_pool for crypt settings), or one after another on the thread
+    pool, stopping early once every target is cracked or the job is cancelled. ``on_range(start, end)``
+    follows finished chunks.
+    """
+    start_time = time.time()
+    targets = list({normalize_target(hash_value, hash_type) for hash_value in hash_values})
+    shard_size = SHARD_SIZE if setting is None else CRYPT_SHARD_SIZE
+    
+    if process_pool is None and setting is None:
+        control = attack_control.get()
+        loop = asyncio.get_event_loop()
+        cracked = {}
+        shard_results = []
+        for start in range(offset, end, shard_size):
+            found, tried = await loop.run_in_executor(
+                hash_pool(), crack_keyspace_range, targets, hash_type, keyspace,
+                start, min(start + shard_size, end), cracked, start_time, setting
+            )
+            shard_results.append((found, tried))
+            cracked.update(dict.fromkeys(found, True))
+            report_shard(found, tried, hash_type, on_crack)
+            if on_range:
+                on_range(start, min(start + shard_size, end))
+            if control:
+                control.check()
+            if len(cracked) == len(targets):
+                break
+        return merge_shard_results(targets, shard_results, start_time)
+    
+    chunk = max(shard_size, (end - offset) // (HASH_WORKERS * 8) + 1)
+    starts = range(offset, end, chunk)
+    cracked = get_shard_manager().dict()
+    
+    def on_shard(index: int):
+        if on_range:
+            on_range(starts[index], min(starts[index] + chunk, end))
+    
+    try:
+        shard_results = await run_shards([
+            (crack_keyspace_range, targets, hash_type, keyspace, start, min(start + chunk, end), cracked, start_time, setting)
+            for start in starts
+        ], cracked, hash_type, on_crack, on_shard, crypt_pool if setting else None)
+    finally:
+        del cracked
+    
+    return merge_shard_results(targets, shard_results, start_time)
+
+# Potfile: every hash ever cracked, keyed by normalized value in db.potfile,
+# plus db.hash_misses of (hash, attack fingerprint) pairs that came up empty
+class LRUCache:
+    """Bounded mapping that evicts its least recently used entry"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: OrderedDict = OrderedDict()
+    
+    def get(self, key: Any) -> Any:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+    
+    def put(self, key: Any, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+    
+    def discard(self, key: Any):
+        self._entries.pop(key, None)
+
+potfile_cache = LRUCache(POTFILE_CACHE_SIZE)
+miss_cache = LRUCache(MISS_CACHE_SIZE)
+
+# Single flight: attacks running in this process by (normalized target, attack
+# fingerprint). Each future resolves to the owner's final HashResult, or to
+# None when the owner stopped or timed out and waiters must attack themselves
+in_flight: Dict[tuple[str, str], asyncio.Future] = {}
+
+@functools.lru_cache(maxsize=None)
+def builtin_wordlist_fingerprint() -> str:
+    return hashlib.sha256("\n".join(EXTENDED_WORDLIST).encode()).hexdigest()
+
+def attack_fingerprint(attack_type: str, custom_wordlist: Optional[Sequence[str]], lookup_table: Optional[str], rules: Optional[List[str]], keyspace: Optional[Keyspace], keyspace_range: Optional[tuple[int, int]], tables: Optional[Dict[str, LookupTable]] = None) -> Optional[str]:
+    """Digest of the candidates an attack tries, or None if its misses should not be cached
+
+    ``tables`` are the lookup tables, by hash type, that the attack actually
+    uses; they enter the digest by build, so misses recorded against one
+    build of a table are not served once it is rebuilt, and hash types
+    without a table are keyed like the dictionary attack that runs instead.
+    """
+    fingerprint = hashlib.sha256(attack_type.encode())
+    if attack_type == "brute_force":
+        for mask in keyspace.masks:
+            fingerprint.update(b"\0".join(mask) + b"\1")
+        fingerprint.update(f"{keyspace_range[0]}-{keyspace_range[1]}".encode())
+    elif attack_type == "dictionary":
+        if isinstance(custom_wordlist, PackedWordlist):
+            fingerprint.update(f"wordlist:{custom_wordlist.digest}".encode())
+        elif custom_wordlist:
+            fingerprint.update("\n".join(custom_wordlist).encode())
+        else:
+            fingerprint.update(builtin_wordlist_fingerprint().encode())
+        used = ",".join(f"{hash_type}={lookup_table}@{table.version}" for hash_type, table in sorted((tables or {}).items()))
+        fingerprint.update(f"\0rules:{'+'.join(rules or [])}\0table:{used}".encode())
+    elif attack_type == "pcfg":
+        fingerprint.update(f"{get_pcfg_model().digest}:{keyspace_range[0]}-{keyspace_range[1]}".encode())
+    else:
+        return None
+    return fingerprint.hexdigest()
+
+async def lookup_potfile(targets: Iterable[str], fingerprint: Optional[str] = None) -> Dict[str, tuple[bool, Optional[str], int]]:
+    """Known outcomes for normalized targets: cracked, or exhausted by this fingerprint"""
+    known = {}
+    unknown = []
+    for target in set(targets):
+        plaintext = potfile_cache.get(target)
+        attempts = miss_cache.get((target, fingerprint)) if fingerprint else None
+        if plaintext is not None:
+            known[target] = (True, plaintext, 0)
+        elif attempts is not None:
+            known[target] = (False, None, attempts)
+        else:
+            unknown.append(target)
+    if not unknown:
+        return known
+    
+    for doc in await db.potfile.find({"hash": {"$in": unknown}}).to_list(None):
+        potfile_cache.put(doc["hash"], doc["plaintext"])
+        known[doc["hash"]] = (True, doc["plaintext"], 0)
+    
+    unknown = [target for target in unknown if target not in known]
+    if fingerprint and unknown:
+        for doc in await db.hash_misses.find({"fingerprint": fingerprint, "hash": {"$in": unknown}}).to_list(None):
+            miss_cache.put((doc["hash"], fingerprint), doc["attempts"])
+            known[doc["hash"]] = (False, None, doc["attempts"])
+    
+    return known
+
+async def record_potfile(results: List[HashResult], fingerprint: Optional[str] = None):
+    """Store new cracks in the potfile and, under ``fingerprint``, completed misses"""
+    cracks = {}
+    misses = {}
+    for result in results:
+        if result.cached:
+            continue
+        target = normalize_target(result.hash_value, result.hash_type)
+        if result.cracked:
+            cracks[target] = result
+        elif fingerprint and not result.timed_out:
+            misses[target] = result
+    
+    try:
+        if cracks:
+            await db.potfile.bulk_write([
+                UpdateOne({"hash": target}, {"$setOnInsert": {
+                    "hash": target,
+                    "hash_type": result.hash_type,
+                    "plaintext": result.plaintext,
+                    "cracked_at": datetime.utcnow()
+                }}, upsert=True)
+                for target, result in cracks.items()
+            ], ordered=False)
+        if misses:
+            await db.hash_misses.bulk_write([
+                UpdateOne({"hash": target, "fingerprint": fingerprint}, {"$set": {
+                    "attempts": result.attempts,
+                    "checked_at": datetime.utcnow()
+                }}, upsert=True)
+                for target, result in misses.items()
+            ], ordered=False)
+    except Exception as e:
+        logging.error(f"Error updating potfile: {str(e)}")
+    
+    for target, result in cracks.items():
+        potfile_cache.put(target, result.plaintext)
+    for target, result in misses.items():
+        miss_cache.put((target, fingerprint), result.attempts)
+
+def cached_result(hash_value: str, hash_type: str, outcome: tuple[bool, Optional[str], int]) -> HashResult:
+    cracked, plaintext, attempts = outcome
+    return HashResult(
+        hash_value=hash_value,
+        hash_type=hash_type,
+        cracked=cracked,
+        plaintext=plaintext,
+        strength_score=calculate_strength_score(hash_type, plaintext),
+        time_taken=0.0,
+        attempts=attempts,
+        cached=True
+    )
+
+async def analyze_single_hash(hash_value: str, attack_type: str, custom_wordlist: Optional[Sequence[str]], rule_engine: Optional[RuleEngine] = None, keyspace: Optional[Keyspace] = None, keyspace_range: Optional[tuple[int, int]] = None, include_timings: bool = False) -> HashResult:
     """Analyze a single hash"""
     start_time = time.time()
+    timings = {}
     
     # Identify hash type
+    stage_start = time.perf_counter()
     hash_type = identify_hash_type(hash_value)
+    timings["identify"] = time.perf_counter() - stage_start
+    STAGE_SECONDS.observe(timings["identify"], stage="identify")
     
     # Choose wordlist
     wordlist = custom_wordlist if custom_wordlist else EXTENDED_WORDLIST
+    on_crack = None
+    if rule_engine:
+        wordlist = rule_engine.apply(custom_wordlist or COMMON_PASSWORDS)
+        on_crack = rule_engine.record_hit
     
     # Attempt to crack
     cracked = False
     plaintext = None
     attempts = 0
+    stage_start = time.perf_counter()
     
-    if attack_type == "dictionary":
+    if attack_type == "dictionary" and not custom_wordlist and not rule_engine and hash_type in HASH_ALGORITHMS:
+        # Built-in wordlist: answer from the precomputed digest index
+        cracked, plaintext, attempts, _ = crack_hash_indexed([hash_value], hash_type)[hash_value.strip().lower()]
+    elif attack_type == "dictionary":
         # Run dictionary attack in thread pool
         loop = asyncio.get_event_loop()
         cracked, plaintext, attempts = await loop.run_in_executor(
-            thread_pool, crack_hash_dictionary, hash_value, hash_type, wordlist
+            hash_pool(), crack_hash_dictionary, hash_value, hash_type, tracked(wordlist, hash_type), on_crack
+        )
+        record_attack(hash_type, attempts, time.perf_counter() - stage_start)
+    elif attack_type == "pcfg":
+        loop = asyncio.get_event_loop()
+        cracked, plaintext, attempts = await loop.run_in_executor(
+            hash_pool(), crack_hash_dictionary, hash_value, hash_type, tracked(get_pcfg_model().guesses(*keyspace_range), hash_type)
+        )
+        record_attack(hash_type, attempts, time.perf_counter() - stage_start)
+    elif attack_type == "brute_force" and keyspace is not None:
+        # Salted types: verify keyspace candidates one by one in the thread pool
+        offset, end = keyspace_range
+        candidates = (candidate.decode("utf-8", errors="replace") for candidate in keyspace.iter_range(offset, end))
+        loop = asyncio.get_event_loop()
+        cracked, plaintext, attempts = await loop.run_in_executor(
+            hash_pool(), crack_hash_dictionary, hash_value, hash_type, tracked(candidates, hash_type)
         )
+        record_attack(hash_type, attempts, time.perf_counter() - stage_start)
+        if cracked:
+            attempts += offset
+    timings["attack"] = time.perf_counter() - stage_start
     
     # Calculate metrics
     time_taken = time.time() - start_time
+    stage_start = time.perf_counter()
     strength_score = calculate_strength_score(hash_type, plaintext)
+    timings["strength"] = time.perf_counter() - stage_start
+    STAGE_SECONDS.observe(timings["strength"], stage="strength")
     
     return HashResult(
         hash_value=hash_value,
@@ -218,103 +1432,2270 @@ async def analyze_single_hash(hash_value: str, attack_type: str, custom_wordlist
         plaintext=plaintext,
         strength_score=strength_score,
         time_taken=time_taken,
-        attempts=attempts
+        attempts=attempts,
+        timings=timings if include_timings else None
     )
 
-# API Routes
-@api_router.post("/analyze-hashes", response_model=HashAnalysisResponse)
-async def analyze_hashes(request: HashAnalysisRequest):
-    """Analyze multiple password hashes"""
-    try:
-        start_time = time.time()
+async def analyze_hash_batch(hash_values: List[str], attack_type: str, custom_wordlist: Optional[Sequence[str]], lookup_table: Optional[str] = None, rules: Optional[List[str]] = None, keyspace: Optional[Keyspace] = None, keyspace_range: Optional[tuple[int, int]] = None, on_result: Optional[Callable[[int, HashResult], None]] = None, time_budget: Optional[float] = None, include_timings: bool = False) -> List[HashResult]:
+    """Analyze a batch of hashes, sharing one wordlist pass per unsalted hash type
+
+    Work units (one per unsalted type group, one per remaining hash) run
+    concurrently, at most HASH_CONCURRENCY at a time, and inside a background
+    job each unit also waits for a job_scheduler slot. Results keep input order.
+    With ``rules``, each unit streams its own lazily mangled candidates;
+    brute force enumerates ``keyspace`` over ``keyspace_range``.
+    ``on_result(index, result)`` fires on the event loop as soon as each
+    hash is final, mid-group for cracks where the engine reports them.
+    bcrypt targets are grouped by cost and salt, run cheapest cost first on
+    bcrypt_pool and stop when ``time_budget`` seconds have passed.
+    Hashes already in the potfile, or already exhausted by the same attack,
+    are answered from it without running anything; hashes another analysis
+    is attacking the same way right now wait for its result (see in_flight).
+    With ``include_timings`` each result carries a breakdown in seconds:
+    ``identify`` and ``potfile_lookup`` for the whole batch, then ``queue``
+    (waiting for a slot), ``attack`` (until the hash was settled) and
+    ``strength`` for its own unit.
+    """
+    results: List[Optional[HashResult]] = [None] * len(hash_values)
+    stage_start = time.perf_counter()
+    hash_types = [identify_hash_type(hash_value) for hash_value in hash_values]
+    targets = [normalize_target(hash_value, hash_type) for hash_value, hash_type in zip(hash_values, hash_types)]
+    batch_timings = {"identify": time.perf_counter() - stage_start}
+    STAGE_SECONDS.observe(batch_timings["identify"], stage="identify")
+    
+    # Tables are opened once per batch, so the fingerprint names exactly the ones that run
+    tables = {}
+    for hash_type in set(hash_types) if lookup_table else ():
+        table = get_lookup_table(lookup_table, hash_type) if hash_type in HASH_ALGORITHMS else None
+        if table is not None:
+            tables[hash_type] = table
+    loop = asyncio.get_event_loop()
+    fingerprint_args = (attack_type, custom_wordlist, lookup_table, rules, keyspace, keyspace_range, tables)
+    if custom_wordlist and not isinstance(custom_wordlist, PackedWordlist):
+        # An inline wordlist is hashed whole, so keep that off the event loop
+        fingerprint = await loop.run_in_executor(hash_pool(), attack_fingerprint, *fingerprint_args)
+    else:
+        fingerprint = attack_fingerprint(*fingerprint_args)
+    stage_start = time.perf_counter()
+    known = await lookup_potfile(targets, fingerprint)
+    batch_timings["potfile_lookup"] = time.perf_counter() - stage_start
+    STAGE_SECONDS.observe(batch_timings["potfile_lookup"], stage="potfile_lookup")
+    
+    control = attack_control.get()
+    claimed: Dict[str, asyncio.Future] = {}
+    borrowed: Dict[int, asyncio.Future] = {}
+    # Background jobs may wait long for scheduler slots, so only requests served directly are waited on
+    shares = fingerprint is not None and (control is None or not control.background)
+    
+    def publish(index: int):
+        """Report a final result, sharing it with analyses waiting on the same attack"""
+        flight = claimed.pop(targets[index], None)
+        if flight is not None:
+            del in_flight[(targets[index], fingerprint)]
+            flight.set_result(None if results[index].timed_out else results[index])
+        if on_result:
+            on_result(index, results[index])
+    
+    # Group targets by identified type, remembering input positions
+    groups: Dict[str, List[int]] = {}
+    for index, hash_value in enumerate(hash_values):
+        target = targets[index]
+        if target in known:
+            results[index] = cached_result(hash_value, hash_types[index], known[target])
+            if include_timings:
+                results[index].timings = dict(batch_timings)
+            if on_result:
+                on_result(index, results[index])
+        elif fingerprint and target not in claimed and (target, fingerprint) in in_flight:
+            borrowed[index] = in_flight[(target, fingerprint)]
+        else:
+            if shares and target not in claimed:
+                claimed[target] = in_flight[(target, fingerprint)] = loop.create_future()
+            groups.setdefault(hash_types[index], []).append(index)
+    
+    wordlist = custom_wordlist if custom_wordlist else EXTENDED_WORDLIST
+    deadline = time.time() + time_budget if time_budget else None
+    semaphore = asyncio.Semaphore(HASH_CONCURRENCY)
+    engines: List[RuleEngine] = []
+    
+    @contextlib.asynccontextmanager
+    async def unit_slot():
+        async with semaphore:
+            if control is None or not control.scheduled:
+                yield
+                return
+            await job_scheduler.acquire(control)
+            try:
+                yield
+            finally:
+                job_scheduler.release(control)
+    
+    def new_rule_engine() -> Optional[RuleEngine]:
+        if not rules:
+            return None
+        engine = RuleEngine(rules)
+        engines.append(engine)
+        return engine
+    
+    async def run_single(index: int):
+        # Timing starts inside analyze_single_hash, after the slot is acquired
+        queued_at = time.perf_counter()
+        async with unit_slot():
+            queue_time = time.perf_counter() - queued_at
+            results[index] = await analyze_single_hash(
+                hash_values[index], attack_type, custom_wordlist, new_rule_engine(), keyspace, keyspace_range, include_timings
+            )
+        if include_timings:
+            results[index].timings = {**batch_timings, "queue": queue_time, **results[index].timings}
+        publish(index)
+    
+    def candidate_stream(hash_type: str, progress: Optional[UnitProgress] = None) -> Iterable[str]:
+        """Fresh one-shot candidate stream for a unit that verifies candidates itself, from its checkpoint"""
+        skip = progress.offset if progress else 0
+        if attack_type == "brute_force":
+            candidates = (
+                candidate.decode("utf-8", errors="replace")
+                for candidate in keyspace.iter_range(keyspace_range[0] + skip, keyspace_range[1])
+            )
+        elif attack_type == "pcfg":
+            candidates = get_pcfg_model().guesses(keyspace_range[0] + skip, keyspace_range[1])
+        elif rules:
+            candidates = itertools.islice(new_rule_engine().apply(custom_wordlist or COMMON_PASSWORDS), skip, None)
+        else:
+            candidates = wordlist[skip:] if skip else wordlist
+        return tracked(candidates, hash_type, progress)
+    
+    async def run_group(hash_type: str, indices: List[int], setting: Any = None):
+        members = [hash_values[index] for index in indices]
+        by_target: Dict[str, List[int]] = {}
+        for index in indices:
+            by_target.setdefault(normalize_target(hash_values[index], hash_type), []).append(index)
+        timed_out = False
+        queued_at = time.perf_counter()
+        queue_time = 0.0
+        attack_start = queued_at
+        strength_time = 0.0
         
-        # Validate input
-        if not request.hashes:
-            raise HTTPException(status_code=400, detail="No hashes provided")
+        # In a job, resume from the unit's checkpoint: candidates before
+        # ``skip`` were already checked against every target
+        unit = f"{hash_type}:{setting.setting if isinstance(setting, CryptSetting) else setting or ''}"
+        progress = control.checkpoint.unit(unit) if control and control.checkpoint else None
+        skip = progress.offset if progress else 0
+        # crack_hash_keyspace reports cracks at absolute keyspace indices
+        absolute = attack_type == "brute_force" and hash_type != "bcrypt"
         
-        # Analyze each hash
-        results = []
-        for hash_value in request.hashes:
-            result = await analyze_single_hash(hash_value, request.attack_type, request.custom_wordlist)
-            results.append(result)
-        
-        # Calculate summary statistics
-        total_time = time.time() - start_time
-        total_cracked = sum(1 for r in results if r.cracked)
-        crack_rate = (total_cracked / len(results)) * 100 if results else 0
-        
-        # Generate summary
-        summary = f"Analyzed {len(results)} hashes in {total_time:.2f}s. "
-        summary += f"Cracked {total_cracked} ({crack_rate:.1f}%). "
-        summary += f"Average strength score: {sum(r.strength_score for r in results) / len(results):.1f}/10"
-        
-        # Create response
-        response = HashAnalysisResponse(
-            results=results,
-            total_cracked=total_cracked,
-            total_time=total_time,
-            summary=summary
-        )
+        def finish(target: str, outcome: tuple):
+            nonlocal strength_time
+            for index in by_target.pop(target, []):
+                cracked, plaintext, attempts, time_taken = outcome
+                score_start = time.perf_counter()
+                strength_score = calculate_strength_score(hash_type, plaintext)
+                scored = time.perf_counter()
+                strength_time += scored - score_start
+                results[index] = HashResult(
+                    hash_value=hash_values[index],
+                    hash_type=hash_type,
+                    cracked=cracked,
+                    plaintext=plaintext,
+                    strength_score=strength_score,
+                    time_taken=time_taken,
+                    attempts=attempts,
+                    timed_out=timed_out and not cracked,
+                    timings={
+                        **batch_timings, "queue": queue_time,
+                        "attack": score_start - attack_start, "strength": scored - score_start
+                    } if include_timings else None
+                )
+                publish(index)
         
-        # Save to database
-        await db.hash_analysis.insert_one(response.dict())
+        def record(target: str, outcome: tuple) -> tuple:
+            """Count attempts from the unit's start and note cracks in its checkpoint, from any thread"""
+            cracked, plaintext, attempts, time_taken = outcome
+            if skip and not (cracked and absolute):
+                attempts += skip
+            if progress and cracked:
+                progress.cracked[target] = (plaintext, attempts)
+            return cracked, plaintext, attempts, time_taken
         
-        return response
+        def settle(target: str, outcome: tuple):
+            finish(target, record(target, outcome))
         
-    except Exception as e:
-        logging.error(f"Error analyzing hashes: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-
-@api_router.get("/analysis-history", response_model=List[HashAnalysisHistory])
-async def get_analysis_history(limit: int = 10):
-    """Get hash analysis history"""
-    try:
-        history = await db.hash_analysis.find().sort("timestamp", -1).limit(limit).to_list(limit)
-        return [HashAnalysisHistory(**item) for item in history]
-    except Exception as e:
-        logging.error(f"Error fetching history: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to fetch history")
-
-@api_router.get("/hash-stats")
-async def get_hash_stats():
-    """Get overall hash analysis statistics"""
-    try:
-        total_analyses = await db.hash_analysis.count_documents({})
+        # Cracks reported from executor threads are finished on the event loop
+        def on_crack(target: str, outcome: tuple):
+            loop.call_soon_threadsafe(finish, target, record(target, outcome))
         
-        # Get recent analyses for stats
-        recent_analyses = await db.hash_analysis.find().sort("timestamp", -1).limit(100).to_list(100)
+        def completed(base: int) -> Optional[Callable[[int, int], None]]:
+            """Checkpoint callback for engine ranges whose index ``base`` is the unit's start"""
+            if progress is None:
+                return None
+            return lambda start, end: progress.complete(start - base, end - base)
         
-        if not recent_analyses:
-            return {
-                "total_analyses": 0,
-                "total_hashes_analyzed": 0,
+        if progress:
+            for target, (plaintext, position) in list(progress.cracked.items()):
+                finish(target, (True, plaintext, position, 0.0))
+            if progress.done:
+                for target in list(by_target):
+                    finish(target, (False, None, progress.tried, 0.0))
+            members = [hash_values[positions[0]] for positions in by_target.values()]
+            if not members:
+                return
+        remaining_words = wordlist[skip:] if skip else wordlist
+        
+        async with unit_slot():
+            attack_start = time.perf_counter()
+            queue_time = attack_start - queued_at
+            table = tables.get(hash_type)
+            crypt_setting = setting if hash_type in CRYPT_TYPES else None
+            indexed = False
+            if hash_type == "bcrypt":
+                outcomes, timed_out = await loop.run_in_executor(
+                    bcrypt_pool, crack_bcrypt_group, members, setting, candidate_stream(hash_type, progress), deadline, on_crack
+                )
+            elif attack_type == "brute_force":
+                outcomes = await crack_hash_keyspace(
+                    members, hash_type, keyspace, keyspace_range[0] + skip, keyspace_range[1],
+                    on_crack=settle, setting=crypt_setting, on_range=completed(keyspace_range[0])
+                )
+            elif table is not None:
+                # validate_analysis_request rejects rules and custom wordlists with a table
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_table, members, hash_type, table
+                )
+            elif attack_type == "pcfg":
+                # Guesses come most likely first, so a single lazy pass stops as early as it can
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_batch, members, hash_type, candidate_stream(hash_type, progress), on_crack, crypt_setting
+                )
+            elif rules:
+                engine = new_rule_engine()
+                
+                def on_rule_crack(target: str, outcome: tuple):
+                    engine.record_hit(outcome[1])
+                    on_crack(target, outcome)
+                
+                candidates = itertools.islice(engine.apply(custom_wordlist or COMMON_PASSWORDS), skip, None)
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_batch, members, hash_type,
+                    tracked(candidates, hash_type, progress), on_rule_crack, crypt_setting
+                )
+            elif not custom_wordlist and crypt_setting is None:
+                outcomes = crack_hash_indexed(members, hash_type)
+                indexed = True
+            elif process_pool is not None or crypt_setting is not None:
+                outcomes = await crack_hash_sharded(
+                    members, hash_type, remaining_words, on_crack=settle, setting=crypt_setting, on_range=completed(-skip)
+                )
+            elif isinstance(remaining_words, PackedWordlist):
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_batch, members, hash_type,
+                    tracked(remaining_words.encoded(), hash_type, progress), on_crack, crypt_setting, True
+                )
+            else:
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_batch, members, hash_type,
+                    tracked(remaining_words, hash_type, progress), on_crack, crypt_setting
+                )
+        
+        # Lookups hash nothing; every other engine reports candidates tried as attempts
+        if table is None and not indexed:
+            offset = keyspace_range[0] + skip if attack_type == "brute_force" else 0
+            tried = max((attempts - offset if cracked else attempts for cracked, _, attempts, _ in outcomes.values()), default=0)
+            record_attack(hash_type, tried, time.perf_counter() - attack_start)
+        
+        # Let pending thread callbacks run before finishing the rest
+        await asyncio.sleep(0)
+        settled = {target: record(target, outcome) for target, outcome in outcomes.items()}
+        for target, outcome in settled.items():
+            finish(target, outcome)
+        if progress and not timed_out:
+            progress.tried = max((attempts for cracked, _, attempts, _ in settled.values() if not cracked), default=0)
+            progress.done = True
+        STAGE_SECONDS.observe(strength_time, stage="strength")
+    
+    tasks = []
+    bcrypt_groups: Dict[str, List[int]] = {}
+    crypt_groups: Dict[tuple[str, str], List[int]] = {}
+    crypt_settings: Dict[tuple[str, str], CryptSetting] = {}
+    for hash_type, indices in groups.items():
+        if attack_type not in ("dictionary", "brute_force", "pcfg"):
+            tasks.extend(run_single(index) for index in indices)
+        elif hash_type in CRYPT_TYPES:
+            # Parse salt and rounds once per target; one unit per distinct setting
+            for index in indices:
+                crypt_setting = parse_crypt(hash_values[index])
+                if crypt_setting and crypt_supported(crypt_setting):
+                    key = (hash_type, crypt_setting.setting)
+                    crypt_groups.setdefault(key, []).append(index)
+                    crypt_settings[key] = crypt_setting
+                else:
+                    tasks.append(run_single(index))
+        elif hash_type == "bcrypt":
+            for index in indices:
+                setting = bcrypt_setting(hash_values[index])
+                if setting:
+                    bcrypt_groups.setdefault(setting, []).append(index)
+                else:
+                    tasks.append(run_single(index))
+        elif hash_type not in HASH_ALGORITHMS:
+            # Other salted or unsupported types are still attacked one target at a time
+            tasks.extend(run_single(index) for index in indices)
+        else:
+            tasks.append(run_group(hash_type, indices))
+    
+    for key, indices in crypt_groups.items():
+        tasks.append(run_group(key[0], indices, crypt_settings[key]))
+    
+    # Cheapest bcrypt costs first: units start in creation order
+    for setting in sorted(bcrypt_groups, key=bcrypt_cost):
+        tasks.append(run_group("bcrypt", bcrypt_groups[setting], setting))
+    
+    fallback: List[int] = []
+    
+    async def await_borrowed(index: int, flight: asyncio.Future):
+        # Shielded: a waiter going away must not cancel the owner's future
+        waited_at = time.perf_counter()
+        shared = await asyncio.shield(flight)
+        if shared is None:
+            fallback.append(index)
+            return
+        results[index] = shared.copy(update={
+            "hash_value": hash_values[index],
+            "timings": {**batch_timings, "attack": time.perf_counter() - waited_at} if include_timings else None
+        })
+        HASHES_COALESCED.inc(algorithm=hash_types[index])
+        if on_result:
+            on_result(index, results[index])
+    
+    try:
+        await asyncio.gather(*tasks, *(await_borrowed(index, flight) for index, flight in borrowed.items()))
+    finally:
+        while claimed:
+            target, flight = claimed.popitem()
+            del in_flight[(target, fingerprint)]
+            flight.set_result(None)
+    
+    # Attacks this batch waited on that ended without a shareable result
+    if fallback:
+        def relay(position: int, result: HashResult):
+            on_result(fallback[position], result)
+        
+        retried = await analyze_hash_batch(
+            [hash_values[index] for index in fallback], attack_type, custom_wordlist, lookup_table, rules,
+            keyspace, keyspace_range, relay if on_result else None, time_budget, include_timings
+        )
+        for index, result in zip(fallback, retried):
+            results[index] = result
+    
+    record_rule_stats(engines)
+    
+    await record_potfile(results, fingerprint)
+    return results
+
+def crack_hash_stream(hash_values: List[str], candidates: Iterable[str]) -> Dict[str, tuple[bool, Optional[str], int, float]]:
+    """Attack every hash type in a single pass over a one-shot candidate stream
+
+    Used when the wordlist can only be read once (e.g. an upload still in
+    flight): each candidate is hashed once per unsalted type, and derived
+    once per bcrypt or Unix crypt salt group, still holding targets. Results
+    are keyed by normalized hash value, as in crack_hash_batch.
+    """
+    start_time = time.time()
+    digest_groups: Dict[str, set] = {}
+    bcrypt_groups: Dict[bytes, set] = {}
+    crypt_groups: Dict[CryptSetting, set] = {}
+    results = {}
+    
+    for hash_value in hash_values:
+        hash_type = identify_hash_type(hash_value)
+        if hash_type in HASH_ALGORITHMS:
+            digest_groups.setdefault(hash_type, set()).add(normalize_target(hash_value, hash_type))
+        elif hash_type == "bcrypt" and bcrypt_setting(hash_value):
+            bcrypt_groups.setdefault(bcrypt_setting(hash_value).encode(), set()).add(hash_value.strip())
+        elif hash_type in CRYPT_TYPES:
+            crypt_setting = parse_crypt(hash_value)
+            if crypt_setting and crypt_supported(crypt_setting):
+                crypt_groups.setdefault(crypt_setting, set()).add(hash_value.strip())
+    
+    attempts = 0
+    for password in candidates:
+        if not any(bcrypt_groups.values()) and not any(digest_groups.values()) and not any(crypt_groups.values()):
+            break
+        attempts += 1
+        encoded = password.encode()
+        
+        for hash_type, remaining in digest_groups.items():
+            if remaining:
+                hashed = HASH_ALGORITHMS[hash_type](encoded).hexdigest()
+                if hashed in remaining:
+                    remaining.discard(hashed)
+                    results[hashed] = (True, password, attempts, time.time() - start_time)
+        
+        for setting, remaining in bcrypt_groups.items():
+            if remaining:
+                hashed = bcrypt.hashpw(encoded, setting).decode()
+                if hashed in remaining:
+                    remaining.discard(hashed)
+                    results[hashed] = (True, password, attempts, time.time() - start_time)
+        
+        for crypt_setting, remaining in crypt_groups.items():
+            if remaining:
+                hashed = crypt_hash(password, crypt_setting)
+                if hashed in remaining:
+                    remaining.discard(hashed)
+                    results[hashed] = (True, password, attempts, time.time() - start_time)
+    
+    elapsed = time.time() - start_time
+    for hash_value in hash_values:
+        target = normalize_target(hash_value, identify_hash_type(hash_value))
+        if target not in results:
+            results[target] = (False, None, attempts, elapsed)
+    
+    return results
+
+def iter_stream_blocks(stream: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop) -> Iterator[bytes]:
+    """Yield an async byte stream from a worker thread as blocks of whole lines
+
+    Chunks are pulled from the event loop one at a time, only as fast as the
+    consumer asks for them, so memory stays flat regardless of size. Every
+    block ends with b"\\n", the last one included.
+    """
+    async def next_chunk() -> Optional[bytes]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+    
+    pending = b""
+    while True:
+        chunk = asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+        if chunk is None:
+            break
+        pending += chunk
+        end = pending.rfind(b"\n") + 1
+        if end:
+            yield pending[:end]
+            pending = pending[end:]
+    
+    if pending:
+        yield pending + b"\n"
+
+def iter_stream_lines(stream: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop) -> Iterator[str]:
+    """Yield the non-empty lines of an async byte stream from a worker thread"""
+    for block in iter_stream_blocks(stream, loop):
+        for line in block.split(b"\n"):
+            line = line.rstrip(b"\r")
+            if line:
+                yield line.decode("utf-8", errors="replace")
+
+# Hash dump import: user:hash lists, /etc/shadow and pwdump files, mixed
+# freely and auto-detected line by line from the number of ':' fields
+SHADOW_DISABLED = {"", "*", "!", "!!", "x"}
+# Every byte but ':' and '\n'; deleting them leaves a block's field skeleton
+DUMP_TEXT_BYTES = bytes(byte for byte in range(256) if byte not in b":\n")
+
+class HashDump:
+    """A parsed dump: accounts as parallel user/hash columns, plus each distinct hash's target and type
+
+    Columns of plain strings rather than per-account tuples or lists keep a
+    million-account dump out of the cyclic garbage collector's way. targets
+    only holds the hash strings that normalization changes; every other
+    hash string is its own target.
+    """
+    
+    def __init__(self):
+        self.users: List[Optional[str]] = []
+        self.hash_values: List[str] = []
+        self.targets: Dict[str, str] = {}
+        self.hash_types: Dict[str, str] = {}
+        self.formats: Dict[str, int] = {}
+        self.total_lines = 0
+        self.skipped = 0
+
+def classify_hashes(hash_values: List[str], hash_type: Optional[str] = None) -> tuple[Dict[str, str], Dict[str, str]]:
+    """Normalize and identify hash strings in bulk, deduplicating them
+
+    Same-length strings are checked as one joined string: a length in
+    HEX_HASH_TYPES whose whole group is hex is typed with a single regex
+    match, and lower-cased with a single lower() only if it has upper case.
+    Anything else falls back to identify_hash_type once per distinct string.
+    A hash_type, for columns whose type the dump format already tells, skips
+    identification and only lower-cases. Returns hash -> normalized target
+    for the hashes normalization changes, and normalized target -> hash type.
+    """
+    targets: Dict[str, str] = {}
+    hash_types: Dict[str, str] = {}
+    if len(set(map(len, hash_values))) == 1:
+        groups = [(len(hash_values[0]), hash_values)]
+    else:
+        groups = itertools.groupby(sorted(hash_values, key=len), key=len)
+    for length, group in groups:
+        group = list(group)
+        hex_type = hash_type or HEX_HASH_TYPES.get(length)
+        if hex_type:
+            joined = "".join(group)
+            if hash_type or HEX_PATTERN.fullmatch(joined):
+                lowered = joined.lower()
+                if lowered != joined:
+                    normalized = [lowered[offset:offset + length] for offset in range(0, len(lowered), length)]
+                    targets.update(pair for pair in zip(group, normalized) if pair[0] != pair[1])
+                    group = normalized
+                hash_types.update(dict.fromkeys(group, hex_type))
+                continue
+        for hash_value in dict.fromkeys(group):
+            identified = identify_hash_type(hash_value)
+            target = normalize_target(hash_value, identified)
+            if target != hash_value:
+                targets[hash_value] = target
+            hash_types[target] = identified
+    return targets, hash_types
+
+def parse_dump_line(line: str) -> tuple[Optional[str], str, str]:
+    """Split one dump line into user, hash and format; the hash is empty for disabled accounts"""
+    fields = line.split(":")
+    field_count = len(fields)
+    if field_count == 1:
+        return None, fields[0].strip(), "plain"
+    elif field_count == 2:
+        return fields[0], fields[1], "user_hash"
+    elif field_count == 9:
+        # shadow: user:hash:lastchg:min:max:warn:inactive:expire:reserved;
+        # locked accounts keep their hash behind "!"
+        hash_value = fields[1].lstrip("!")
+        return fields[0], "" if hash_value in SHADOW_DISABLED else hash_value, "shadow"
+    elif field_count >= 6 and fields[1].isdigit() and len(fields[3]) == 32:
+        # pwdump: user:rid:lm:nt:::
+        return fields[0], fields[3], "pwdump"
+    else:
+        return fields[0], fields[1], "user_hash"
+
+def split_dump_block(text: str, skeleton: bytes, line_count: int) -> Optional[tuple[list, List[str], str]]:
+    """Split a block whose lines all share one field layout into user and hash columns
+
+    The layout is read off the block's skeleton of ':' and newline bytes,
+    and the columns are cut with whole-block str operations. Returns None
+    for blocks that mix layouts, which go through parse_dump_line instead.
+    """
+    if b":" not in skeleton:
+        return [None] * line_count, [line.strip() for line in text.split("\n")], "plain"
+    elif skeleton == b":\n" * line_count:
+        fields = text.replace(":", "\n").split("\n")
+        return fields[0::2], fields[1::2], "user_hash"
+    elif skeleton == b"::::::\n" * line_count:
+        fields = text.replace(":", "\n").split("\n")
+        rids, nt_hashes = fields[1::7], fields[3::7]
+        if all(rids) and "".join(rids).isdigit() and set(map(len, nt_hashes)) == {32}:
+            return fields[0::7], nt_hashes, "pwdump"
+    elif skeleton == b"::::::::\n" * line_count:
+        fields = text.replace(":", "\n").split("\n")
+        hash_values = fields[1::9]
+        if "!" in text or not SHADOW_DISABLED.isdisjoint(hash_values):
+            hash_values = [hash_value.lstrip("!") for hash_value in hash_values]
+            hash_values = ["" if hash_value in SHADOW_DISABLED else hash_value for hash_value in hash_values]
+        return fields[0::9], hash_values, "shadow"
+    return None
+
+def parse_hash_dump(blocks: Iterable[bytes]) -> HashDump:
+    """Parse and classify a dump given as blocks of whole lines, deduplicating targets
+
+    Blocks whose lines share one layout, as in nearly every real dump, are
+    split into columns in bulk; only mixed blocks are parsed line by line.
+    Classification then runs over the whole hash column at once.
+    """
+    dump = HashDump()
+    add_user, add_hash = dump.users.append, dump.hash_values.append
+    # Hashes to classify, kept apart from pwdump's NT hashes, which would
+    # otherwise pass for MD5
+    hash_values: List[str] = []
+    nt_hashes: List[str] = []
+    counts = {"plain": 0, "user_hash": 0, "shadow": 0, "pwdump": 0}
+    
+    for block in blocks:
+        # Drop carriage returns and blank lines, which never count as lines
+        while b"\r\n" in block:
+            block = block.replace(b"\r\n", b"\n")
+        while b"\n\n" in block:
+            block = block.replace(b"\n\n", b"\n")
+        block = block.lstrip(b"\n")
+        line_count = block.count(b"\n")
+        if not line_count:
+            continue
+        dump.total_lines += line_count
+        
+        text = block[:-1].decode("utf-8", errors="replace")
+        columns = split_dump_block(text, block.translate(None, DUMP_TEXT_BYTES), line_count)
+        if columns is None:
+            for line in text.split("\n"):
+                user, hash_value, dump_format = parse_dump_line(line)
+                if not hash_value:
+                    dump.skipped += 1
+                    continue
+                (nt_hashes if dump_format == "pwdump" else hash_values).append(hash_value)
+                counts[dump_format] += 1
+                add_user(user)
+                add_hash(hash_value)
+            continue
+        
+        users, block_hashes, dump_format = columns
+        if "" in block_hashes:
+            enabled = list(map(bool, block_hashes))
+            users, block_hashes = list(itertools.compress(users, enabled)), list(itertools.compress(block_hashes, enabled))
+            dump.skipped += len(enabled) - len(block_hashes)
+        counts[dump_format] += len(block_hashes)
+        dump.users += users
+        dump.hash_values += block_hashes
+        if dump_format == "pwdump":
+            nt_hashes += block_hashes
+        else:
+            hash_values += block_hashes
+    
+    dump.targets, dump.hash_types = classify_hashes(hash_values)
+    nt_targets, nt_types = classify_hashes(nt_hashes, "NTLM")
+    dump.targets.update(nt_targets)
+    dump.hash_types.update(nt_types)
+    
+    dump.formats = {dump_format: count for dump_format, count in counts.items() if count}
+    return dump
+
+async def save_analysis(results: List[HashResult], total_time: float) -> HashAnalysisResponse:
+    """Summarize analysis results and store them"""
+    # Calculate summary statistics
+    total_cracked = sum(1 for r in results if r.cracked)
+    crack_rate = (total_cracked / len(results)) * 100 if results else 0
+    
+    # Generate summary
+    summary = f"Analyzed {len(results)} hashes in {total_time:.2f}s. "
+    summary += f"Cracked {total_cracked} ({crack_rate:.1f}%). "
+    summary += f"Average strength score: {sum(r.strength_score for r in results) / len(results):.1f}/10"
+    
+    # Create response
+    response = HashAnalysisResponse(
+        results=results,
+        total_cracked=total_cracked,
+        total_time=total_time,
+        summary=summary
+    )
+    
+    outcomes: Dict[tuple[str, str], int] = {}
+    for r in results:
+        outcome = "cached" if r.cached else "cracked" if r.cracked else "timed_out" if r.timed_out else "exhausted"
+        outcomes[(r.hash_type, outcome)] = outcomes.get((r.hash_type, outcome), 0) + 1
+    for (hash_type, outcome), count in outcomes.items():
+        HASHES_ANALYZED.inc(count, algorithm=hash_type, outcome=outcome)
+    
+    # Save the summary now; per-hash results follow in the background
+    summary_doc = response.dict(exclude={"results"})
+    summary_doc["total_hashes"] = len(results)
+    summary_doc["stats_counted"] = True
+    with STAGE_SECONDS.time(stage="mongo_write"):
+        await db.hash_analysis.insert_one(summary_doc)
+        await update_hash_stats(results)
+    
+    task = asyncio.create_task(save_results(response))
+    pending_writes.add(task)
+    task.add_done_callback(pending_writes.discard)
+    
+    return response
+
+# Result writes still in flight, awaited on shutdown
+pending_writes: set = set()
+
+# This process' work-queue worker loop, if WORK_QUEUE_SLOTS > 0
+work_queue_task: Optional[asyncio.Task] = None
+
+# Loop taking over interrupted jobs from db.hash_jobs
+job_resume_task: Optional[asyncio.Task] = None
+
+async def save_results(response: HashAnalysisResponse):
+    """Write one document per result to db.hash_results, RESULT_BATCH_SIZE at a time"""
+    try:
+        with STAGE_SECONDS.time(stage="mongo_write"):
+            for start in range(0, len(response.results), RESULT_BATCH_SIZE):
+                await db.hash_results.insert_many([
+                    {"analysis_id": response.id, "index": index, "timestamp": response.timestamp, "stats_counted": True, **result.dict()}
+                    for index, result in enumerate(response.results[start:start + RESULT_BATCH_SIZE], start=start)
+                ], ordered=False)
+    except Exception as e:
+        logging.error(f"Error saving results of analysis {response.id}: {str(e)}")
+
+# Running totals behind /hash-stats: one db.hash_stats counter document and
+# a db.weak_passwords count per cracked plaintext, updated on every save.
+# Analyses and results counted that way are flagged ``stats_counted``, and
+# a counter document created that way is marked STATS_FLAGGED_ONLY; the
+# rest of the history is folded in once, by whichever process first inserts
+# the STATS_BACKFILL_ID marker
+STATS_ID = "totals"
+STATS_BACKFILL_ID = "backfill"
+STATS_FLAGGED_ONLY = "flagged_only"
+
+async def update_hash_stats(results: List[HashResult]):
+    """Fold one saved analysis into the running statistics"""
+    increments = {
+        "total_analyses": 1,
+        "total_hashes": len(results),
+        "total_cracked": sum(1 for r in results if r.cracked)
+    }
+    weak_passwords: Dict[str, int] = {}
+    for result in results:
+        key = f"hash_types.{result.hash_type}"
+        increments[key] = increments.get(key, 0) + 1
+        if result.cracked and result.plaintext:
+            weak_passwords[result.plaintext] = weak_passwords.get(result.plaintext, 0) + 1
+    
+    try:
+        await db.hash_stats.update_one(
+            {"_id": STATS_ID}, {"$inc": increments, "$setOnInsert": {STATS_FLAGGED_ONLY: True}}, upsert=True
+        )
+        if weak_passwords:
+            await db.weak_passwords.bulk_write([
+                UpdateOne({"plaintext": plaintext}, {"$inc": {"count": count}}, upsert=True)
+                for plaintext, count in weak_passwords.items()
+            ], ordered=False)
+    except Exception as e:
+        logging.error(f"Error updating hash stats: {str(e)}")
+
+async def backfill_hash_stats():
+    """Fold history saved before incremental statistics into them, once, with server-side aggregation
+
+    Only one process wins the insert of the marker document, and only
+    analyses and results not flagged ``stats_counted`` are aggregated, so
+    concurrent starts and analyses saved meanwhile are never counted twice.
+    Totals without the STATS_FLAGGED_ONLY mark were kept by a server that
+    counted every analysis without flagging it, so there is nothing to add.
+    """
+    try:
+        await db.hash_stats.insert_one({"_id": STATS_BACKFILL_ID, "worker": WORKER_ID, "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return
+    existing = await db.hash_stats.find_one({"_id": STATS_ID})
+    if existing is not None and not existing.get(STATS_FLAGGED_ONLY):
+        return
+    
+    uncounted = {"$match": {"stats_counted": {"$ne": True}}}
+    totals = await db.hash_analysis.aggregate([
+        uncounted,
+        {"$group": {
+            "_id": None,
+            "total_analyses": {"$sum": 1},
+            "total_hashes": {"$sum": {"$ifNull": ["$total_hashes", {"$size": {"$ifNull": ["$results", []]}}]}},
+            "total_cracked": {"$sum": "$total_cracked"}
+        }}
+    ]).to_list(1)
+    if not totals:
+        return
+    
+    # Older analyses embed their results; newer ones keep them in db.hash_results
+    hash_types: Dict[str, int] = {}
+    weak_passwords: Dict[str, int] = {}
+    for collection, prefix, stages in ((db.hash_analysis, "results.", [uncounted, {"$unwind": "$results"}]), (db.hash_results, "", [uncounted])):
+        for doc in await collection.aggregate(stages + [
+            {"$group": {"_id": f"${prefix}hash_type", "count": {"$sum": 1}}}
+        ]).to_list(None):
+            hash_types[doc["_id"] or "Unknown"] = hash_types.get(doc["_id"] or "Unknown", 0) + doc["count"]
+        for doc in await collection.aggregate(stages + [
+            {"$match": {f"{prefix}cracked": True, f"{prefix}plaintext": {"$nin": [None, ""]}}},
+            {"$group": {"_id": f"${prefix}plaintext", "count": {"$sum": 1}}}
+        ]).to_list(None):
+            weak_passwords[doc["_id"]] = weak_passwords.get(doc["_id"], 0) + doc["count"]
+    
+    increments = {key: totals[0][key] for key in ("total_analyses", "total_hashes", "total_cracked")}
+    for hash_type, count in hash_types.items():
+        increments[f"hash_types.{hash_type}"] = count
+    await db.hash_stats.update_one(
+        {"_id": STATS_ID}, {"$inc": increments, "$setOnInsert": {STATS_FLAGGED_ONLY: True}}, upsert=True
+    )
+    if weak_passwords:
+        await db.weak_passwords.bulk_write([
+            UpdateOne({"plaintext": plaintext}, {"$inc": {"count": count}}, upsert=True)
+            for plaintext, count in weak_passwords.items()
+        ], ordered=False)
+
+def validate_analysis_request(request: HashAnalysisRequest) -> tuple[Optional[Keyspace], Optional[tuple[int, int]]]:
+    """Reject invalid analysis requests with a 400; returns the brute-force keyspace and range"""
+    if not request.hashes:
+        raise HTTPException(status_code=400, detail="No hashes provided")
+    
+    if request.lookup_table and Path(request.lookup_table).name != request.lookup_table:
+        raise HTTPException(status_code=400, detail="Invalid lookup table name")
+    if request.lookup_table and not lookup_table_exists(request.lookup_table):
+        raise HTTPException(status_code=400, detail=f"Unknown lookup table: {request.lookup_table}")
+    if request.lookup_table:
+        if request.attack_type != "dictionary":
+            raise HTTPException(status_code=400, detail="lookup_table only applies to dictionary attacks")
+        if request.rules or request.custom_wordlist or request.wordlist_id:
+            raise HTTPException(status_code=400, detail="lookup_table attacks take neither rules nor a custom wordlist")
+        unsupported = {
+            hash_type for hash_type in map(identify_hash_type, request.hashes)
+            if hash_type not in HASH_ALGORITHMS or get_lookup_table(request.lookup_table, hash_type) is None
+        }
+        if unsupported:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Lookup table {request.lookup_table} has no table for: {', '.join(sorted(unsupported))}"
+            )
+    
+    if request.wordlist_id and request.custom_wordlist:
+        raise HTTPException(status_code=400, detail="Pass either custom_wordlist or wordlist_id, not both")
+    
+    try:
+        for spec in request.rules or []:
+            parse_rule(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if request.attack_type == "pcfg":
+        model = get_pcfg_model()
+        if model is None:
+            raise HTTPException(status_code=400, detail="No password grammar has been trained; see pcfg.py")
+        if request.rules or request.lookup_table:
+            raise HTTPException(status_code=400, detail="pcfg attacks take neither rules nor a lookup table")
+        end = request.keyspace_offset + (request.keyspace_limit or PCFG_MAX_CANDIDATES)
+        return None, (request.keyspace_offset, end)
+    
+    if request.attack_type != "brute_force":
+        return None, None
+    
+    try:
+        keyspace = Keyspace.from_request(request.mask, request.charset, request.max_length or 8)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.keyspace_offset >= keyspace.size:
+        raise HTTPException(status_code=400, detail=f"keyspace_offset is past the end of the {keyspace.size}-candidate keyspace")
+    end = min(keyspace.size, request.keyspace_offset + (request.keyspace_limit or keyspace.size))
+    if end - request.keyspace_offset > BRUTE_FORCE_MAX_KEYSPACE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Keyspace of {keyspace.size} candidates exceeds the limit of {BRUTE_FORCE_MAX_KEYSPACE}; "
+                   f"narrow the mask or charset, or use keyspace_offset/keyspace_limit"
+        )
+    return keyspace, (request.keyspace_offset, end)
+
+# Wordlist registry: packed wordlists stored once under WORDLIST_DIR and
+# described in db.wordlists, referenced by id from analysis requests
+WORDLIST_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+wordlist_cache = LRUCache(WORDLIST_CACHE_SIZE)
+
+async def get_wordlist(wordlist_id: str) -> PackedWordlist:
+    """Load an uploaded wordlist (kept in a per-process LRU), or raise a 404"""
+    wordlist = wordlist_cache.get(wordlist_id)
+    if wordlist is None:
+        if not WORDLIST_ID_PATTERN.match(wordlist_id) or not (WORDLIST_DIR / f"{wordlist_id}.words").exists():
+            raise HTTPException(status_code=404, detail=f"Wordlist {wordlist_id} not found")
+        loop = asyncio.get_event_loop()
+        wordlist = await loop.run_in_executor(thread_pool, PackedWordlist.load, WORDLIST_DIR, wordlist_id)
+        wordlist_cache.put(wordlist_id, wordlist)
+    return wordlist
+
+def store_wordlist(lines: Iterable[str]) -> PackedWordlist:
+    """Pack uploaded lines and write them under WORDLIST_DIR, unless that content is already stored"""
+    wordlist = PackedWordlist.from_words(lines)
+    if wordlist and not (WORDLIST_DIR / f"{wordlist.digest}.words").exists():
+        WORDLIST_DIR.mkdir(parents=True, exist_ok=True)
+        wordlist.save(WORDLIST_DIR)
+    return wordlist
+
+async def register_wordlist(wordlist: PackedWordlist, name: Optional[str] = None) -> Dict[str, Any]:
+    """Describe a stored wordlist in db.wordlists, renaming it if ``name`` is given"""
+    wordlist_cache.put(wordlist.digest, wordlist)
+    info = {
+        "id": wordlist.digest,
+        "words": len(wordlist),
+        "size_bytes": len(wordlist.data),
+        "created_at": datetime.utcnow()
+    }
+    if name is None:
+        update = {"$setOnInsert": {**info, "name": "custom_wordlist of a job"}}
+    else:
+        update = {"$set": {"name": name}, "$setOnInsert": info}
+    await db.wordlists.update_one({"id": wordlist.digest}, update, upsert=True)
+    return info
+
+async def request_wordlist(request: HashAnalysisRequest) -> Optional[Sequence[str]]:
+    """The request's inline custom_wordlist, or the uploaded wordlist it references"""
+    if request.wordlist_id:
+        return await get_wordlist(request.wordlist_id)
+    return request.custom_wordlist
+
+def candidates_per_pass(request: HashAnalysisRequest, keyspace_range: Optional[tuple[int, int]], wordlist: Optional[Sequence[str]] = None) -> int:
+    """Candidates one attack unit of an analysis tries at most"""
+    if keyspace_range:
+        return keyspace_range[1] - keyspace_range[0]
+    if request.rules:
+        return len(wordlist or COMMON_PASSWORDS) * len(request.rules)
+    return len(wordlist or EXTENDED_WORDLIST)
+
+def indexed_analysis(request: HashAnalysisRequest, wordlist: Optional[Sequence[str]] = None) -> bool:
+    """Whether unsalted targets resolve through the digest index without scanning"""
+    return request.attack_type == "dictionary" and not wordlist and not request.rules
+
+def estimate_candidates(request: HashAnalysisRequest, keyspace_range: Optional[tuple[int, int]], wordlist: Optional[Sequence[str]] = None) -> int:
+    """Upper bound on candidates an analysis will try, for progress and ETA"""
+    per_pass = candidates_per_pass(request, keyspace_range, wordlist)
+    types = [identify_hash_type(hash_value) for hash_value in request.hashes]
+    unsalted = set(hash_type for hash_type in types if hash_type in HASH_ALGORITHMS)
+    salted = sum(1 for hash_type in types if hash_type not in HASH_ALGORITHMS)
+    if indexed_analysis(request, wordlist):
+        unsalted = set()
+    return per_pass * (len(unsalted) + salted)
+
+# Cost of testing one candidate, in unsalted digests, measured against
+# hashlib MD5: crypt formats at their default rounds, bcrypt at cost 4
+# (doubling with each cost step)
+CANDIDATE_COST = {"MD5 (Unix)": 150, "SHA-256 (Unix)": 2000, "SHA-512 (Unix)": 2000, "DES (Unix)": 6}
+BCRYPT_CANDIDATE_COST = 1000
+SHA_CRYPT_DEFAULT_ROUNDS = 5000
+
+def candidate_cost(hash_value: str, hash_type: str) -> float:
+    """Cost of testing one candidate against a hash, in unsalted digests"""
+    if hash_type == "bcrypt":
+        setting = bcrypt_setting(hash_value)
+        return BCRYPT_CANDIDATE_COST * 2.0 ** ((bcrypt_cost(setting) if setting else 12) - 4)
+    if hash_type in ("SHA-256 (Unix)", "SHA-512 (Unix)"):
+        setting = parse_crypt(hash_value)
+        if setting is not None and setting.rounds:
+            return CANDIDATE_COST[hash_type] * setting.rounds / SHA_CRYPT_DEFAULT_ROUNDS
+    return CANDIDATE_COST.get(hash_type, 1)
+
+def estimate_cost(hash_values: Sequence[str], per_pass: int, indexed: bool = False) -> float:
+    """Estimated work of an analysis in unsalted digests, for admission control
+
+    As the attacks group them: one pass per unsalted type (none when
+    ``indexed``), one per salt shared by salted hashes, each weighted by
+    candidate_cost, plus one digest per hash for identification and lookups.
+    """
+    units: Dict[str, float] = {}
+    for hash_value in hash_values:
+        hash_type = identify_hash_type(hash_value)
+        if hash_type in HASH_ALGORITHMS:
+            if not indexed:
+                units[hash_type] = 1
+        elif hash_type == "bcrypt":
+            units[bcrypt_setting(hash_value) or hash_value] = candidate_cost(hash_value, hash_type)
+        else:
+            setting = parse_crypt(hash_value) if hash_type in CRYPT_TYPES else None
+            units[setting.setting if setting else hash_value] = candidate_cost(hash_value, hash_type)
+    return per_pass * sum(units.values()) + len(hash_values)
+
+def request_cost(request: HashAnalysisRequest, keyspace_range: Optional[tuple[int, int]], wordlist: Optional[Sequence[str]] = None) -> float:
+    indexed = indexed_analysis(request, wordlist) or bool(request.lookup_table)
+    return estimate_cost(request.hashes, candidates_per_pass(request, keyspace_range, wordlist), indexed)
+
+class JobScheduler:
+    """Grants work-unit slots across background jobs and large analyses
+
+    Waiting units are served by priority (higher first); among equal
+    priorities the client with the fewest running units goes next, so a
+    client with many units, or many jobs, cannot starve the others. Within
+    a client, the control that has held slots for the least time goes next,
+    so one client's jobs take turns instead of running in submission order.
+    Controls without a client count as a client of their own.
+    """
+    
+    def __init__(self, slots: int, clock: Callable[[], float] = time.monotonic):
+        self.slots = slots
+        self.clock = clock
+        self.running: Dict[Any, int] = {}
+        self.waiters: List[tuple[int, int, AttackControl, asyncio.Future]] = []
+        self.sequence = 0
+    
+    @staticmethod
+    def client(control: AttackControl) -> Any:
+        return control.client or id(control)
+    
+    async def acquire(self, control: AttackControl):
+        future = asyncio.get_event_loop().create_future()
+        self.sequence += 1
+        self.waiters.append((-control.priority, self.sequence, control, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(control)
+            else:
+                self.waiters = [waiter for waiter in self.waiters if waiter[3] is not future]
+            raise
+    
+    def release(self, control: AttackControl):
+        client = self.client(control)
+        self.running[client] -= 1
+        if not self.running[client]:
+            del self.running[client]
+        control.slot_seconds += self.clock() - control.slot_started.pop(0)
+        self._dispatch()
+    
+    def slot_time(self, control: AttackControl, now: float) -> float:
+        """Seconds the control has held slots, counting the ones it holds now"""
+        return control.slot_seconds + sum(now - started for started in control.slot_started)
+    
+    def _dispatch(self):
+        now = self.clock()
+        while self.waiters and sum(self.running.values()) < self.slots:
+            waiter = min(self.waiters, key=lambda w: (
+                w[0], self.running.get(self.client(w[2]), 0), self.slot_time(w[2], now), w[1]
+            ))
+            self.waiters.remove(waiter)
+            control, future = waiter[2], waiter[3]
+            if future.cancelled():
+                continue
+            client = self.client(control)
+            self.running[client] = self.running.get(client, 0) + 1
+            control.slot_started.append(now)
+            future.set_result(None)
+
+job_scheduler = JobScheduler(JOB_SLOTS)
+
+class Admission:
+    """An admitted analysis, returned by AdmissionController.acquire
+
+    ``charge`` is the cost held against the budgets: the estimate, capped
+    at one client's budget so a single oversized analysis cannot use up
+    the global one.
+    """
+    
+    def __init__(self, client: str, cost: float, charge: float, large: bool):
+        self.client = client
+        self.cost = cost
+        self.charge = charge
+        self.large = large
+        self.started = time.time()
+        self.released = False
+
+class FairQueue:
+    """Slots handed out between clients in weighted fair queueing order
+
+    Each waiter is tagged with its client's cumulative charge, so the client
+    queueing the most work waits longest and one client cannot hold back
+    everyone else.
+    """
+    
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.running = 0
+        # Virtual time and each client's last finish tag
+        self.virtual_time = 0.0
+        self.finish_tags: Dict[str, float] = {}
+        self.waiters: List[tuple[float, int, float, asyncio.Future]] = []
+        self.sequence = 0
+    
+    async def acquire(self, client: str, charge: float):
+        start_tag = max(self.virtual_time, self.finish_tags.get(client, 0.0))
+        self.finish_tags[client] = start_tag + charge
+        future = asyncio.get_event_loop().create_future()
+        self.sequence += 1
+        self.waiters.append((start_tag + charge, self.sequence, start_tag, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self.waiters = [waiter for waiter in self.waiters if waiter[3] is not future]
+            raise
+    
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+    
+    def forget(self, client: str):
+        """An idle client starts over at the current virtual time"""
+        self.finish_tags.pop(client, None)
+    
+    def _dispatch(self):
+        while self.waiters and self.running < self.slots:
+            waiter = min(self.waiters)
+            self.waiters.remove(waiter)
+            future = waiter[3]
+            if future.cancelled():
+                continue
+            self.virtual_time = max(self.virtual_time, waiter[2])
+            self.running += 1
+            future.set_result(None)
+
+class AdmissionController:
+    """Admits interactive analyses by estimated cost, fairly between clients
+
+    A request is turned away at once, with 429 and a Retry-After, when it
+    would take its client past ``client_cost`` or everyone past ``max_cost``
+    of admitted and queued work, or when it needs a large slot and
+    ``queue_size`` large analyses are already waiting. Each request is
+    charged at most ``client_cost``, so a client with nothing outstanding
+    can always run one oversized analysis, and that analysis leaves the rest
+    of the global budget to other clients.
+
+    Analyses costing at most ``small_cost`` hold one of ``small_slots`` and
+    hash on interactive_pool; larger ones hold one of ``slots``. Each kind
+    waits for its slots in its own FairQueue, so a client flooding either
+    kind only delays its own requests.
+
+    Retry-After is the work ahead of the request over the completion rate
+    (cost per second) of recent large analyses.
+    """
+    
+    def __init__(self, slots: int, small_slots: int, queue_size: int, small_cost: float, client_cost: float, max_cost: float):
+        self.large = FairQueue(slots)
+        self.small = FairQueue(small_slots)
+        self.queue_size = queue_size
+        self.small_cost = small_cost
+        self.client_cost = client_cost
+        self.max_cost = max_cost
+        self.outstanding = 0.0
+        self.outstanding_by_client: Dict[str, float] = {}
+        # Digests per second, refined as large analyses complete
+        self.rate = 5_000_000.0
+    
+    def reject(self, reason: str, work_ahead: float):
+        ADMISSION_REJECTED.inc(reason=reason)
+        retry_after = min(ADMISSION_MAX_RETRY_AFTER, max(1, math.ceil(work_ahead / self.rate)))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy ({reason.replace('_', ' ')}); retry in {retry_after}s or submit a background job",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    async def acquire(self, client: str, cost: float) -> Admission:
+        charge = min(cost, self.client_cost, self.max_cost)
+        client_outstanding = self.outstanding_by_client.get(client, 0.0)
+        if client_outstanding + charge > self.client_cost:
+            self.reject("client_budget", client_outstanding + charge - self.client_cost)
+        if self.outstanding + charge > self.max_cost:
+            self.reject("global_budget", self.outstanding + charge - self.max_cost)
+        large = cost > self.small_cost
+        if large and self.large.running >= self.large.slots and len(self.large.waiters) >= self.queue_size:
+            self.reject("queue_full", self.outstanding)
+        
+        self.outstanding += charge
+        self.outstanding_by_client[client] = client_outstanding + charge
+        ADMISSION_COST.set(self.outstanding)
+        try:
+            await (self.large if large else self.small).acquire(client, charge)
+        except asyncio.CancelledError:
+            self._forget(client, charge)
+            raise
+        finally:
+            self._update_queued()
+        return Admission(client, cost, charge, large)
+    
+    def release(self, admission: Admission):
+        """Return an admission's slot and charge; releasing it again does nothing"""
+        if admission.released:
+            return
+        admission.released = True
+        if admission.large:
+            elapsed = time.time() - admission.started
+            if elapsed > 0:
+                self.rate = 0.8 * self.rate + 0.2 * (admission.cost / elapsed)
+            self.large.release()
+        else:
+            self.small.release()
+        self._forget(admission.client, admission.charge)
+        self._update_queued()
+    
+    def _forget(self, client: str, cost: float):
+        self.outstanding = max(0.0, self.outstanding - cost)
+        remaining = self.outstanding_by_client.get(client, 0.0) - cost
+        if remaining > 0:
+            self.outstanding_by_client[client] = remaining
+        else:
+            self.outstanding_by_client.pop(client, None)
+            self.large.forget(client)
+            self.small.forget(client)
+        ADMISSION_COST.set(self.outstanding)
+    
+    def _update_queued(self):
+        ADMISSION_QUEUED.set(len(self.large.waiters) + len(self.small.waiters))
+
+admission_controller = AdmissionController(
+    ADMISSION_SLOTS, ADMISSION_SMALL_SLOTS, ADMISSION_QUEUE_SIZE, ADMISSION_SMALL_COST, ADMISSION_CLIENT_COST, ADMISSION_MAX_COST
+)
+
+def client_id(request: Request) -> str:
+    """Who an analysis is charged to: the trusted ADMISSION_CLIENT_HEADER value if set, else the peer address"""
+    if ADMISSION_CLIENT_HEADER:
+        forwarded = request.headers.get(ADMISSION_CLIENT_HEADER)
+        if forwarded:
+            # A proxy appending to X-Forwarded-For puts the address it saw last
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+@contextlib.asynccontextmanager
+async def admitted(client: str, cost: float) -> AsyncIterator[Admission]:
+    """Hold an admission for the block; large analyses run as scheduled work on thread_pool"""
+    admission = await admission_controller.acquire(client, cost)
+    try:
+        if admission.large:
+            attack_control.set(AttackControl(scheduled=True, client=client))
+        yield admission
+    finally:
+        admission_controller.release(admission)
+
+class Job:
+    """A background analysis, its progress and its outcome"""
+    
+    def __init__(self, request: HashAnalysisRequest, priority: int, keyspace: Optional[Keyspace], keyspace_range: Optional[tuple[int, int]], wordlist: Optional[Sequence[str]] = None, distributed: bool = False, client: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.request = request
+        self.keyspace = keyspace
+        self.keyspace_range = keyspace_range
+        self.wordlist = wordlist
+        self.distributed = distributed
+        self.client = client
+        self.control = AttackControl(priority, scheduled=True, client=client, background=True)
+        if not distributed:
+            self.control.checkpoint = JobCheckpoint()
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.estimated_candidates = estimate_candidates(request, keyspace_range, wordlist)
+        self.analysis_id: Optional[str] = None
+        self.total_cracked: Optional[int] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        # Set once another process has resumed the job; it owns the job's documents from then on
+        self.taken_over = False
+    
+    def status_doc(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        tried = self.control.tried
+        rate = tried / elapsed if elapsed > 0 else 0
+        eta = None
+        if self.status == "running" and rate > 0:
+            eta = round(max(0, self.estimated_candidates - tried) / rate, 1)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.control.priority,
+            "distributed": self.distributed,
+            "created_at": self.created_at,
+            "total_hashes": len(self.request.hashes),
+            "candidates_tried": tried,
+            "estimated_candidates": self.estimated_candidates,
+            "hashes_per_second": round(rate, 1),
+            "elapsed": round(elapsed, 3),
+            "eta_seconds": eta,
+            "analysis_id": self.analysis_id,
+            "total_cracked": self.total_cracked,
+            "error": self.error,
+        }
+
+JOBS: Dict[str, Job] = {}
+
+async def run_job(job: Job):
+    """Run a job's analysis under its AttackControl and record the outcome"""
+    attack_control.set(job.control)
+    job.status = "running"
+    job.started_at = time.time()
+    checkpointer = asyncio.create_task(checkpoint_job(job))
+    try:
+        request = job.request
+        results = await analyze_hash_batch(
+            request.hashes, request.attack_type, job.wordlist, request.lookup_table,
+            request.rules, job.keyspace, job.keyspace_range, time_budget=request.time_budget,
+            include_timings=request.include_timings
+        )
+        response = await save_analysis(results, time.time() - job.started_at)
+        job.analysis_id = response.id
+        job.total_cracked = response.total_cracked
+        job.status = "completed"
+    except (AttackCancelled, asyncio.CancelledError):
+        job.status = "interrupted" if job.control.interrupted else "cancelled"
+    except Exception as e:
+        logging.error(f"Error running job {job.id}: {str(e)}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        checkpointer.cancel()
+        job.finished_at = time.time()
+        job.task = None
+        if job.taken_over:
+            JOBS.pop(job.id, None)
+            return
+        try:
+            if job.status == "interrupted":
+                await save_checkpoint(job)
+            else:
+                await db.job_checkpoints.delete_many({"job_id": job.id})
+        except Exception as e:
+            logging.error(f"Error updating checkpoint of job {job.id}: {str(e)}")
+        await save_job_status(job)
+        prune_jobs()
+
+async def save_checkpoint(job: Job):
+    """Renew this process' ownership of the job and write its changed unit progress
+
+    If another process has resumed the job in the meantime, this one leaves
+    the checkpoints alone and cancels its own run.
+    """
+    owned = await db.hash_jobs.update_one({"id": job.id, "owner": WORKER_ID}, {"$set": {
+        "checkpointed_at": datetime.utcnow(),
+        "candidates_tried": job.control.tried
+    }})
+    if owned.matched_count == 0:
+        logging.warning(f"Job {job.id} was resumed by another process; stopping it here")
+        job.taken_over = True
+        job.control.cancel()
+        if job.task:
+            job.task.cancel()
+        return
+    checkpoint = job.control.checkpoint
+    changed = checkpoint.changes()
+    if changed:
+        await db.job_checkpoints.bulk_write([
+            UpdateOne({"job_id": job.id, "unit": unit}, {"$set": {**doc, "updated_at": datetime.utcnow()}}, upsert=True)
+            for unit, doc in changed
+        ], ordered=False)
+        checkpoint.mark_saved(changed)
+
+async def checkpoint_job(job: Job):
+    """Checkpoint a running job every CHECKPOINT_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+        try:
+            await save_checkpoint(job)
+        except Exception as e:
+            logging.error(f"Error checkpointing job {job.id}: {str(e)}")
+
+async def resume_job(doc: Dict[str, Any]):
+    """Rebuild a job from its stored request and checkpoints and run it again"""
+    request = HashAnalysisRequest(**doc["request"])
+    keyspace, keyspace_range = validate_analysis_request(request)
+    wordlist = await request_wordlist(request)
+    job = Job(request, doc.get("priority", 0), keyspace, keyspace_range, wordlist, client=doc.get("client"))
+    job.id = doc["id"]
+    job.created_at = doc["created_at"]
+    units = await db.job_checkpoints.find({"job_id": job.id}).to_list(None)
+    job.control.checkpoint = JobCheckpoint({unit["unit"]: UnitProgress.from_document(unit) for unit in units})
+    job.control.tried = sum(progress.offset for progress in job.control.checkpoint.units.values())
+    JOBS[job.id] = job
+    await save_job_status(job)
+    job.task = asyncio.create_task(run_job(job))
+    logging.info(f"Resumed job {job.id} from {len(units)} checkpointed unit(s)")
+
+async def resume_interrupted_jobs():
+    """Take over jobs interrupted by a shutdown, or whose process stopped checkpointing them"""
+    while True:
+        try:
+            while True:
+                now = datetime.utcnow()
+                doc = await db.hash_jobs.find_one_and_update(
+                    {"request": {"$exists": True}, "distributed": {"$ne": True}, "$or": [
+                        {"status": "interrupted"},
+                        {"status": {"$in": ["queued", "running"]}, "checkpointed_at": {"$lt": now - timedelta(seconds=JOB_RESUME_AFTER)}}
+                    ]},
+                    {"$set": {"status": "queued", "owner": WORKER_ID, "checkpointed_at": now}},
+                    sort=[("priority", -1), ("created_at", 1)]
+                )
+                if doc is None:
+                    break
+                try:
+                    await resume_job(doc)
+                except HTTPException as e:
+                    # The request no longer validates, e.g. its wordlist was deleted
+                    await db.hash_jobs.update_one({"id": doc["id"]}, {"$set": {"status": "failed", "error": str(e.detail)}})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error resuming jobs: {str(e)}")
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+
+# Distributed jobs. The coordinator (the node that accepted the job) splits
+# each group of targets sharing a type and salt into candidate ranges, one
+# db.work_chunks document each, then follows them until all are done. The
+# groups' targets are stored once, in db.work_targets, and each word range
+# once, in db.work_words, however many salt groups attack it; chunks refer
+# to both. Workers lease chunks with find-and-modify, renew the lease while
+# they run and publish cracks to db.work_found, which later chunks of the
+# job skip.
+WORK_TARGETS_PER_DOC = 10_000
+WORK_TARGET_GROUPS_CACHED = 8
+WORK_WORD_RANGES_CACHED = 8
+
+# Target lists and word ranges this process ran chunks with most recently
+work_targets_cache: Dict[tuple[str, int], List[str]] = {}
+work_words_cache: Dict[str, bytes] = {}
+
+def work_chunk_size(hash_type: str, setting: Optional[str]) -> int:
+    """Candidates per chunk: seconds of work per chunk for every hash type"""
+    if hash_type == "bcrypt":
+        # Each cost step doubles the work; keep chunks well inside BCRYPT_TIME_BUDGET
+        return max(1, CRYPT_SHARD_SIZE >> max(0, bcrypt_cost(setting) - 8))
+    if hash_type in CRYPT_TYPES:
+        return CRYPT_SHARD_SIZE
+    return WORK_CHUNK_SIZE
+
+def build_work_targets(job: Job, groups: Dict[tuple[str, Optional[str]], List[str]]) -> List[Dict[str, Any]]:
+    """db.work_targets documents holding each target group of a distributed job, in parts"""
+    docs = []
+    for group, targets in enumerate(groups.values()):
+        for part, start in enumerate(range(0, len(targets), WORK_TARGETS_PER_DOC)):
+            docs.append({
+                "_id": f"{job.id}:{group}:{part}",
+                "job_id": job.id,
+                "group": group,
+                "part": part,
+                "targets": targets[start:start + WORK_TARGETS_PER_DOC]
+            })
+    return docs
+
+def build_work_chunks(job: Job, groups: Dict[tuple[str, Optional[str]], List[str]]) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """One chunk document per (target group, candidate range) of a distributed job
+
+    Ranges are in wordlist words or keyspace indices. Also returns one
+    db.work_words document per distinct word range, which every group's
+    chunk over that range refers to by ``words_id``. bcrypt chunks carry the
+    job's time budget as a deadline, so chunks still queued when it runs out
+    return at once.
+    """
+    request = job.request
+    chunks = []
+    word_ranges: Dict[str, Dict[str, Any]] = {}
+    packed = None
+    if request.attack_type == "brute_force":
+        total = job.keyspace_range[1] - job.keyspace_range[0]
+    else:
+        words = job.wordlist or (COMMON_PASSWORDS if request.rules else EXTENDED_WORDLIST)
+        packed = words if isinstance(words, PackedWordlist) else PackedWordlist.from_words(words)
+        total = len(packed)
+    
+    for group, (hash_type, setting) in enumerate(groups):
+        size = work_chunk_size(hash_type, setting)
+        for start in range(0, total, size):
+            end = min(start + size, total)
+            chunk = {
+                "_id": f"{job.id}:{len(chunks)}",
+                "job_id": job.id,
+                "index": len(chunks),
+                "status": "pending",
+                "priority": job.control.priority,
+                "created_at": job.created_at,
+                "hash_type": hash_type,
+                "setting": setting,
+                "group": group,
+                "attack_type": request.attack_type,
+                "start": start,
+                "end": end,
+                "tried": 0,
+                "leases": 0
+            }
+            if hash_type == "bcrypt" and request.time_budget:
+                chunk["deadline"] = job.started_at + request.time_budget
+            if packed is not None:
+                words_id = f"{job.id}:{start}:{end}"
+                if words_id not in word_ranges:
+                    word_ranges[words_id] = {
+                        "_id": words_id, "job_id": job.id, "start": start, "end": end,
+                        "words": Binary(packed[start:end].data)
+                    }
+                chunk["words_id"] = words_id
+                chunk["rules"] = request.rules
+            else:
+                chunk["keyspace"] = [request.mask, request.charset, request.max_length or 8]
+                chunk["start"] += job.keyspace_range[0]
+                chunk["end"] += job.keyspace_range[0]
+            chunks.append(chunk)
+    return chunks, list(word_ranges.values())
+
+def crack_work_chunk(chunk: Dict[str, Any], targets: List[str], cracked: List[str], words: Optional[bytes] = None) -> tuple[Dict[str, tuple[str, int, float]], int, int, bool]:
+    """Worker half of a distributed job: attack one chunk's targets with its candidate range
+
+    Runs on a pool thread or worker process. ``words`` is the packed word
+    range of a wordlist chunk, from db.work_words. Returns finds (plaintext,
+    position within the chunk, elapsed), candidates tried, the chunk's
+    candidate count and whether the time budget ran out. All of these count
+    candidates, rule-expanded ones in rule attacks, where a word's number of
+    candidates is only known by expanding it; the coordinator adds up the
+    counts of earlier chunks to place finds in the job's candidate stream.
+    """
+    start_time = time.time()
+    hash_type = chunk["hash_type"]
+    skip = set(cracked)
+    targets = [target for target in targets if target not in skip]
+    crypt_setting = parse_crypt(targets[0]) if targets and hash_type in CRYPT_TYPES else None
+    size = chunk["end"] - chunk["start"]
+    engine = None
+    encoded = False
+    
+    if chunk["attack_type"] == "brute_force":
+        keyspace = Keyspace.from_request(*chunk["keyspace"])
+        if targets and hash_type != "bcrypt":
+            found, tried = crack_keyspace_range(targets, hash_type, keyspace, chunk["start"], chunk["end"], {}, start_time, crypt_setting)
+            found = {
+                target: (plaintext, position - chunk["start"], elapsed)
+                for target, (plaintext, position, elapsed) in found.items()
+            }
+            return found, tried, size, False
+        candidates = (candidate.decode("utf-8", errors="replace") for candidate in keyspace.iter_range(chunk["start"], chunk["end"]))
+    else:
+        words = PackedWordlist(words)
+        if chunk.get("rules"):
+            engine = RuleEngine(chunk["rules"])
+            candidates = engine.apply(words)
+        elif hash_type == "bcrypt":
+            candidates = words
+        else:
+            candidates, encoded = words.encoded(), True
+    
+    outcomes: Dict[str, tuple[bool, Optional[str], int, float]] = {}
+    timed_out = False
+    if targets and hash_type == "bcrypt":
+        outcomes, timed_out = crack_bcrypt_group(targets, chunk["setting"], candidates, chunk.get("deadline"))
+    elif targets:
+        outcomes = crack_hash_batch(targets, hash_type, candidates, setting=crypt_setting, encoded=encoded)
+    if engine is not None:
+        # Expand the rest of the chunk's words to count its candidates
+        for _ in candidates:
+            pass
+        size = sum(stats["candidates"] for stats in engine.stats.values())
+    found = {
+        target: (plaintext, attempts, elapsed)
+        for target, (cracked_, plaintext, attempts, elapsed) in outcomes.items() if cracked_
+    }
+    tried = max((attempts for _, _, attempts, _ in outcomes.values()), default=0)
+    return found, tried, size, timed_out
+
+async def load_work_targets(job_id: str, group: int) -> List[str]:
+    """A distributed job's target group, read from db.work_targets once per process"""
+    key = (job_id, group)
+    if key not in work_targets_cache:
+        docs = await db.work_targets.find({"job_id": job_id, "group": group}).sort("part", 1).to_list(None)
+        work_targets_cache[key] = [target for doc in docs for target in doc["targets"]]
+        while len(work_targets_cache) > WORK_TARGET_GROUPS_CACHED:
+            work_targets_cache.pop(next(iter(work_targets_cache)))
+    return work_targets_cache[key]
+
+async def load_work_words(words_id: Optional[str]) -> Optional[bytes]:
+    """A chunk's packed word range, read from db.work_words once per process"""
+    if words_id is None:
+        return None
+    if words_id not in work_words_cache:
+        doc = await db.work_words.find_one({"_id": words_id})
+        if doc is None:
+            raise RuntimeError(f"Word range {words_id} is gone; its job has ended")
+        work_words_cache[words_id] = bytes(doc["words"])
+        while len(work_words_cache) > WORK_WORD_RANGES_CACHED:
+            work_words_cache.pop(next(iter(work_words_cache)))
+    return work_words_cache[words_id]
+
+async def claim_work_chunk() -> Optional[Dict[str, Any]]:
+    """Lease the next pending chunk, or one whose lease expired with attempts left, for this process"""
+    now = datetime.utcnow()
+    return await db.work_chunks.find_one_and_update(
+        {"$or": [
+            {"status": "pending"},
+            {"status": "leased", "lease_expires": {"$lt": now}, "leases": {"$lt": WORK_CHUNK_ATTEMPTS}}
+        ]},
+        {
+            "$set": {"status": "leased", "lease_owner": WORKER_ID, "lease_expires": now + timedelta(seconds=WORK_LEASE_SECONDS)},
+            "$inc": {"leases": 1}
+        },
+        sort=[("priority", -1), ("created_at", 1), ("index", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def run_work_chunk(chunk: Dict[str, Any]):
+    """Run a leased chunk, renewing its lease meanwhile, and publish its cracks and progress
+
+    A chunk whose attack raises goes back to the queue, or fails for good
+    once it has been leased WORK_CHUNK_ATTEMPTS times.
+    """
+    lease = {"_id": chunk["_id"], "status": "leased", "lease_owner": WORKER_ID}
+    targets = await load_work_targets(chunk["job_id"], chunk["group"])
+    words = await load_work_words(chunk.get("words_id"))
+    cracked = [doc["target"] for doc in await db.work_found.find(
+        {"job_id": chunk["job_id"], "group": chunk["group"]}, {"target": 1}
+    ).to_list(None)]
+    
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(WORK_LEASE_SECONDS / 3)
+            renewed = await db.work_chunks.update_one(
+                lease, {"$set": {"lease_expires": datetime.utcnow() + timedelta(seconds=WORK_LEASE_SECONDS)}}
+            )
+            if not renewed.matched_count:
+                # Taken over after expiring, or the job was cancelled; the result will be dropped
+                return
+    
+    loop = asyncio.get_event_loop()
+    if chunk["setting"] is not None and chunk["hash_type"] != "bcrypt":
+        pool = crypt_pool
+    else:
+        pool = process_pool or (bcrypt_pool if chunk["hash_type"] == "bcrypt" else thread_pool)
+    beat = asyncio.create_task(heartbeat())
+    start_time = time.perf_counter()
+    try:
+        found, tried, candidates, timed_out = await loop.run_in_executor(pool, crack_work_chunk, chunk, targets, cracked, words)
+    except Exception as e:
+        if chunk["leases"] >= WORK_CHUNK_ATTEMPTS:
+            update = {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+        else:
+            update = {"$set": {"status": "pending", "error": str(e)}}
+        await db.work_chunks.update_one(lease, update)
+        raise
+    finally:
+        beat.cancel()
+    record_attack(chunk["hash_type"], tried, time.perf_counter() - start_time)
+    
+    # Cracks are kept even if the lease was lost: they are correct either way
+    if found:
+        await db.work_found.bulk_write([
+            UpdateOne(
+                {"job_id": chunk["job_id"], "target": target},
+                {"$setOnInsert": {
+                    "group": chunk["group"], "chunk": chunk["index"], "plaintext": plaintext, "position": position,
+                    "hash_type": chunk["hash_type"], "worker": WORKER_ID
+                }},
+                upsert=True
+            )
+            for target, (plaintext, position, _) in found.items()
+        ], ordered=False)
+    await db.work_chunks.update_one(lease, {
+        "$set": {
+            "status": "done", "tried": tried, "candidates": candidates, "timed_out": timed_out,
+            "found": len(found), "finished_at": datetime.utcnow()
+        }
+    })
+
+async def run_work_queue_worker(slots: int = WORK_QUEUE_SLOTS):
+    """Lease and run work-queue chunks until cancelled, ``slots`` at a time"""
+    async def worker_slot():
+        while True:
+            try:
+                chunk = await claim_work_chunk()
+                if chunk is None:
+                    await asyncio.sleep(WORK_POLL_INTERVAL)
+                    continue
+                await run_work_chunk(chunk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error in work queue worker: {str(e)}")
+                await asyncio.sleep(WORK_POLL_INTERVAL)
+    
+    await asyncio.gather(*(worker_slot() for _ in range(slots)))
+
+async def run_distributed_job(job: Job):
+    """Coordinate a distributed job: enqueue its chunks, follow them to completion, then save the analysis"""
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        request = job.request
+        hash_types = [identify_hash_type(hash_value) for hash_value in request.hashes]
+        targets = [normalize_target(hash_value, hash_type) for hash_value, hash_type in zip(request.hashes, hash_types)]
+        fingerprint = attack_fingerprint(
+            request.attack_type, job.wordlist, None, request.rules, job.keyspace, job.keyspace_range
+        )
+        known = await lookup_potfile(targets, fingerprint)
+        
+        # Built-in dictionary attacks on unsalted types resolve here through the digest index
+        indexed = request.attack_type == "dictionary" and not job.wordlist and not request.rules
+        local: Dict[str, tuple[bool, Optional[str], int, float]] = {}
+        groups: Dict[tuple[str, Optional[str]], List[str]] = {}
+        seen = set(known)
+        for target, hash_type in zip(targets, hash_types):
+            if target in seen:
+                continue
+            seen.add(target)
+            if hash_type in HASH_ALGORITHMS:
+                if indexed:
+                    local.update(crack_hash_indexed([target], hash_type))
+                    continue
+                setting = None
+            elif hash_type in CRYPT_TYPES:
+                crypt_setting = parse_crypt(target)
+                if crypt_setting is None or not crypt_supported(crypt_setting):
+                    continue
+                setting = crypt_setting.setting
+            elif hash_type == "bcrypt":
+                setting = bcrypt_setting(target)
+                if setting is None:
+                    continue
+            else:
+                continue
+            groups.setdefault((hash_type, setting), []).append(target)
+        
+        work_targets = build_work_targets(job, groups)
+        for start in range(0, len(work_targets), RESULT_BATCH_SIZE):
+            await db.work_targets.insert_many(work_targets[start:start + RESULT_BATCH_SIZE], ordered=False)
+        chunks, word_ranges = build_work_chunks(job, groups)
+        if word_ranges:
+            # Ranges are megabytes each; the driver splits the batch to fit its messages
+            await db.work_words.insert_many(word_ranges, ordered=False)
+        for start in range(0, len(chunks), RESULT_BATCH_SIZE):
+            await db.work_chunks.insert_many(chunks[start:start + RESULT_BATCH_SIZE], ordered=False)
+        
+        tried_by_group: Dict[tuple[str, Optional[str]], int] = {}
+        timed_out_groups = set()
+        while chunks:
+            await asyncio.sleep(WORK_POLL_INTERVAL)
+            job.control.check()
+            # Chunks whose last lease ran out, with no attempts left, will not run again
+            await db.work_chunks.update_many(
+                {
+                    "job_id": job.id, "status": "leased", "lease_expires": {"$lt": datetime.utcnow()},
+                    "leases": {"$gte": WORK_CHUNK_ATTEMPTS}
+                },
+                {"$set": {"status": "failed", "error": "lease expired"}}
+            )
+            progress = await db.work_chunks.aggregate([
+                {"$match": {"job_id": job.id}},
+                {"$group": {
+                    "_id": {"hash_type": "$hash_type", "setting": "$setting"},
+                    "open": {"$sum": {"$cond": [{"$in": ["$status", ["done", "failed"]]}, 0, 1]}},
+                    "failed": {"$sum": {"$cond": [{"$eq": ["$status", "failed"]}, 1, 0]}},
+                    "timed_out": {"$max": "$timed_out"},
+                    "tried": {"$sum": "$tried"}
+                }}
+            ]).to_list(None)
+            if any(doc["failed"] for doc in progress):
+                chunk = await db.work_chunks.find_one({"job_id": job.id, "status": "failed"})
+                raise RuntimeError(f"Chunk {chunk['index']} failed after {chunk['leases']} attempts: {chunk.get('error')}")
+            tried_by_group = {(doc["_id"]["hash_type"], doc["_id"].get("setting")): doc["tried"] for doc in progress}
+            timed_out_groups = {(doc["_id"]["hash_type"], doc["_id"].get("setting")) for doc in progress if doc.get("timed_out")}
+            job.control.tried = sum(tried_by_group.values())
+            if not any(doc["open"] for doc in progress):
+                break
+        tried_by_target = {
+            target: tried_by_group.get(key, 0) for key, group in groups.items() for target in group
+        }
+        timed_out_targets = {target for key in timed_out_groups for target in groups.get(key, [])}
+        
+        # A find's position in the job's candidate stream: the candidates of
+        # its group's earlier chunks, plus its position within its own chunk
+        chunk_offsets: Dict[int, int] = {}
+        group_offsets: Dict[int, int] = {}
+        base = job.keyspace_range[0] if request.attack_type == "brute_force" else 0
+        chunk_docs = await db.work_chunks.find(
+            {"job_id": job.id}, {"index": 1, "group": 1, "candidates": 1}
+        ).sort("index", 1).to_list(None)
+        for doc in chunk_docs:
+            chunk_offsets[doc["index"]] = group_offsets.get(doc["group"], base)
+            group_offsets[doc["group"]] = chunk_offsets[doc["index"]] + doc.get("candidates", 0)
+        
+        found = {doc["target"]: doc for doc in await db.work_found.find({"job_id": job.id}).to_list(None)}
+        elapsed = time.time() - job.started_at
+        results = []
+        for hash_value, hash_type, target in zip(request.hashes, hash_types, targets):
+            if target in known:
+                results.append(cached_result(hash_value, hash_type, known[target]))
+                continue
+            if target in local:
+                cracked, plaintext, attempts, _ = local[target]
+            elif target in found:
+                cracked, plaintext = True, found[target]["plaintext"]
+                attempts = chunk_offsets.get(found[target]["chunk"], base) + found[target]["position"]
+            else:
+                cracked, plaintext, attempts = False, None, tried_by_target.get(target, 0)
+            results.append(HashResult(
+                hash_value=hash_value,
+                hash_type=hash_type,
+                cracked=cracked,
+                plaintext=plaintext,
+                strength_score=calculate_strength_score(hash_type, plaintext),
+                time_taken=elapsed,
+                attempts=attempts,
+                timed_out=not cracked and target in timed_out_targets
+            ))
+        
+        await record_potfile(results, fingerprint)
+        response = await save_analysis(results, elapsed)
+        job.analysis_id = response.id
+        job.total_cracked = response.total_cracked
+        job.status = "completed"
+    except (AttackCancelled, asyncio.CancelledError):
+        job.status = "cancelled"
+    except Exception as e:
+        logging.error(f"Error running distributed job {job.id}: {str(e)}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        job.task = None
+        if job.status != "completed":
+            try:
+                await db.work_chunks.update_many(
+                    {"job_id": job.id, "status": {"$in": ["pending", "leased"]}}, {"$set": {"status": "cancelled"}}
+                )
+            except Exception as e:
+                logging.error(f"Error withdrawing chunks of job {job.id}: {str(e)}")
+        try:
+            await db.work_targets.delete_many({"job_id": job.id})
+            await db.work_words.delete_many({"job_id": job.id})
+        except Exception as e:
+            logging.error(f"Error removing targets and words of job {job.id}: {str(e)}")
+        await save_job_status(job)
+        prune_jobs()
+
+async def save_job_status(job: Job):
+    try:
+        await db.hash_jobs.update_one({"id": job.id}, {
+            "$set": job.status_doc(),
+            # Enough to resume the job in another process
+            "$setOnInsert": {
+                "request": job.request.dict(),
+                "owner": WORKER_ID,
+                "client": job.client,
+                "checkpointed_at": datetime.utcnow()
+            }
+        }, upsert=True)
+    except Exception as e:
+        logging.error(f"Error saving job {job.id}: {str(e)}")
+
+def prune_jobs():
+    """Forget the oldest finished jobs beyond JOB_RETENTION; their status stays in Mongo"""
+    finished = [job for job in JOBS.values() if job.finished_at is not None]
+    for job in sorted(finished, key=lambda job: job.finished_at)[:max(0, len(finished) - JOB_RETENTION)]:
+        del JOBS[job.id]
+
+# API Routes
+@api_router.post("/analyze-hashes", response_model=HashAnalysisResponse)
+async def analyze_hashes(request: HashAnalysisRequest, http_request: Request):
+    """Analyze multiple password hashes"""
+    try:
+        start_time = time.time()
+        
+        # Validate input
+        keyspace, keyspace_range = validate_analysis_request(request)
+        wordlist = await request_wordlist(request)
+        
+        # Analyze all hashes, one wordlist pass per hash type
+        async with admitted(client_id(http_request), request_cost(request, keyspace_range, wordlist)):
+            results = await analyze_hash_batch(
+                request.hashes, request.attack_type, wordlist, request.lookup_table,
+                request.rules, keyspace, keyspace_range, time_budget=request.time_budget,
+                include_timings=request.include_timings
+            )
+        
+        return await save_analysis(results, time.time() - start_time)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error analyzing hashes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@api_router.post("/analyze-hashes/upload", response_model=HashAnalysisResponse)
+async def analyze_hashes_upload(request: Request, hashes: List[str] = Query(..., description="Hashes to analyze")):
+    """Dictionary attack with a wordlist streamed as the raw request body, one candidate per line"""
+    try:
+        start_time = time.time()
+        
+        if not hashes:
+            raise HTTPException(status_code=400, detail="No hashes provided")
+        
+        # Only hashes missing from the potfile are attacked; an upload cannot be
+        # fingerprinted before it is read, so its misses are not cached
+        known = await lookup_potfile(normalize_target(hash_value, identify_hash_type(hash_value)) for hash_value in hashes)
+        remaining = [hash_value for hash_value in hashes if normalize_target(hash_value, identify_hash_type(hash_value)) not in known]
+        
+        # Crack while the body is still arriving; lines are read on demand. The
+        # cost assumes about 8 bytes per word, and a body of unknown length
+        # is costed as a small-cost pass
+        outcomes = {}
+        if remaining:
+            length = int(request.headers.get("content-length") or 0)
+            cost = estimate_cost(remaining, length // 8 if length else int(ADMISSION_SMALL_COST))
+            async with admitted(client_id(request), cost):
+                loop = asyncio.get_event_loop()
+                outcomes = await loop.run_in_executor(
+                    hash_pool(), crack_hash_stream, remaining, iter_stream_lines(request.stream(), loop)
+                )
+        
+        results = []
+        for hash_value in hashes:
+            hash_type = identify_hash_type(hash_value)
+            target = normalize_target(hash_value, hash_type)
+            if target in known:
+                results.append(cached_result(hash_value, hash_type, known[target]))
+                continue
+            cracked, plaintext, attempts, time_taken = outcomes[target]
+            results.append(HashResult(
+                hash_value=hash_value,
+                hash_type=hash_type,
+                cracked=cracked,
+                plaintext=plaintext,
+                strength_score=calculate_strength_score(hash_type, plaintext),
+                time_taken=time_taken,
+                attempts=attempts
+            ))
+        
+        await record_potfile(results)
+        return await save_analysis(results, time.time() - start_time)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error analyzing uploaded wordlist: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@api_router.post("/import-hashes", response_model=HashImportResponse)
+async def import_hashes(
+    request: Request,
+    attack_type: str = Query("dictionary", description="Type of attack: dictionary, brute_force, pcfg"),
+    lookup_table: Optional[str] = Query(None, description="Name of a prebuilt on-disk lookup table"),
+    rules: Optional[List[str]] = Query(None, description="Mangling rules applied lazily to the wordlist"),
+    mask: Optional[str] = Query(None, description="Brute force mask"),
+    charset: Optional[str] = Query(None, description="Brute force charset"),
+    max_length: int = Query(8, description="Maximum length for brute force attack"),
+    time_budget: Optional[float] = Query(None, gt=0, description="Seconds allowed for bcrypt work"),
+    include_timings: bool = Query(False, description="Attach a per-stage timing breakdown to each result"),
+    wordlist_id: Optional[str] = Query(None, description="Id of a wordlist uploaded to /api/wordlists")
+):
+    """Import a hash dump streamed as the raw request body and attack each unique hash once
+
+    Accepts bare hashes, user:hash lines, /etc/shadow and pwdump lines, mixed
+    freely. Each unique hash is reported once, with every account that used
+    it. NT hashes from pwdump files are listed but not attacked, since
+    OpenSSL 3 builds of hashlib have no MD4.
+
+    Blocks of the body that keep to one format are split in bulk. Blocks
+    that mix formats line by line are parsed one line at a time, roughly
+    half as fast, so sort a mixed dump by format for the fastest import.
+    """
+    try:
+        start_time = time.time()
+        
+        loop = asyncio.get_event_loop()
+        dump = await loop.run_in_executor(
+            thread_pool, parse_hash_dump, iter_stream_blocks(request.stream(), loop)
+        )
+        if not dump.hash_values:
+            raise HTTPException(status_code=400, detail="No hashes found in the uploaded dump")
+        
+        targets = [target for target, hash_type in dump.hash_types.items() if hash_type != "NTLM"]
+        results: List[HashResult] = []
+        analysis_id = None
+        if targets:
+            analysis = HashAnalysisRequest(
+                hashes=targets, attack_type=attack_type, lookup_table=lookup_table, rules=rules,
+                mask=mask, charset=charset, max_length=max_length, time_budget=time_budget,
+                include_timings=include_timings, wordlist_id=wordlist_id
+            )
+            keyspace, keyspace_range = validate_analysis_request(analysis)
+            wordlist = await request_wordlist(analysis)
+            async with admitted(client_id(request), request_cost(analysis, keyspace_range, wordlist)):
+                results = await analyze_hash_batch(
+                    targets, attack_type, wordlist, lookup_table, rules, keyspace, keyspace_range, time_budget=time_budget,
+                    include_timings=include_timings
+                )
+            analysis_id = (await save_analysis(results, time.time() - start_time)).id
+        results.extend(
+            HashResult(hash_value=target, hash_type=hash_type, cracked=False, strength_score=0, time_taken=0.0, attempts=0)
+            for target, hash_type in dump.hash_types.items() if hash_type == "NTLM"
+        )
+        
+        # Fan each unique hash's result back out to its accounts
+        users_by_target: Dict[str, List[Optional[str]]] = {result.hash_value: [] for result in results}
+        normalized = dump.targets
+        for user, hash_value in zip(dump.users, dump.hash_values):
+            users_by_target[normalized.get(hash_value, hash_value)].append(user)
+        imported = [ImportedHashResult(**result.dict(), users=users_by_target[result.hash_value]) for result in results]
+        
+        return HashImportResponse(
+            analysis_id=analysis_id,
+            total_lines=dump.total_lines,
+            skipped_lines=dump.skipped,
+            total_accounts=len(dump.users),
+            unique_hashes=len(dump.hash_types),
+            cracked_accounts=sum(len(result.users) for result in imported if result.cracked),
+            formats=dump.formats,
+            results=imported
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error importing hashes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+@api_router.post("/analyze-hashes/stream")
+async def analyze_hashes_stream(request: HashAnalysisRequest, http_request: Request):
+    """Analyze hashes, streaming results and throughput as server-sent events
+
+    Emits a ``result`` event per hash as soon as it is cracked or exhausted,
+    a ``throughput`` event every STREAM_THROUGHPUT_INTERVAL seconds and a
+    final ``summary`` (or ``error``) event. Closing the stream cancels the work.
+    Admission happens before the stream opens, so a busy server answers 429.
+    """
+    keyspace, keyspace_range = validate_analysis_request(request)
+    wordlist = await request_wordlist(request)
+    admission = await admission_controller.acquire(client_id(http_request), request_cost(request, keyspace_range, wordlist))
+    # The body generator may never start (the client left while queued, or
+    # before the first chunk), so the release also runs as a background task
+    # once the response ends, and on any error before the response is built
+    release = functools.partial(admission_controller.release, admission)
+    try:
+        disconnected = await http_request.is_disconnected()
+    except BaseException:
+        release()
+        raise
+    if disconnected:
+        release()
+        return Response(status_code=499)
+    control = AttackControl(scheduled=admission.large, client=admission.client)
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def produce():
+        attack_control.set(control)
+        start_time = time.time()
+        try:
+            results = await analyze_hash_batch(
+                request.hashes, request.attack_type, wordlist, request.lookup_table,
+                request.rules, keyspace, keyspace_range, time_budget=request.time_budget,
+                include_timings=request.include_timings,
+                on_result=lambda index, result: queue.put_nowait(("result", {"index": index, **result.dict()}))
+            )
+            response = await save_analysis(results, time.time() - start_time)
+            queue.put_nowait(("summary", {
+                "id": response.id,
+                "total_cracked": response.total_cracked,
+                "total_time": response.total_time,
+                "summary": response.summary
+            }))
+        except Exception as e:
+            logging.error(f"Error streaming analysis: {str(e)}")
+            queue.put_nowait(("error", {"detail": f"Analysis failed: {str(e)}"}))
+    
+    async def events():
+        task = asyncio.create_task(produce())
+        start_time = time.time()
+        last_frame = start_time
+        last_tried: Dict[str, int] = {}
+        remaining = len(request.hashes)
+        try:
+            while True:
+                timeout = max(0, last_frame + STREAM_THROUGHPUT_INTERVAL - time.time())
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    now = time.time()
+                    rates = {
+                        hash_type: round((tried - last_tried.get(hash_type, 0)) / (now - last_frame), 1)
+                        for hash_type, tried in control.tried_by_type.items()
+                    }
+                    last_tried = dict(control.tried_by_type)
+                    last_frame = now
+                    event, data = "throughput", {
+                        "elapsed": round(now - start_time, 3),
+                        "candidates_per_second": rates,
+                        "candidates_tried": control.tried,
+                        "remaining_targets": remaining
+                    }
+                if event == "result":
+                    remaining -= 1
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                if event in ("summary", "error"):
+                    break
+        finally:
+            if not task.done():
+                control.cancel()
+                task.cancel()
+            release()
+    
+    try:
+        return StreamingResponse(events(), media_type="text/event-stream", background=BackgroundTask(release))
+    except BaseException:
+        release()
+        raise
+
+@api_router.post("/wordlists")
+async def upload_wordlist(request: Request, name: str = Query(..., description="Name shown when listing wordlists")):
+    """Store a wordlist streamed as the raw request body, one word per line, and return its id
+
+    The id is the SHA-256 of the packed words, so uploading the same list
+    again returns the existing id. Reference it as ``wordlist_id`` in
+    analysis requests instead of sending ``custom_wordlist`` every time.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+        wordlist = await loop.run_in_executor(
+            thread_pool, store_wordlist, iter_stream_lines(request.stream(), loop)
+        )
+        if not wordlist:
+            raise HTTPException(status_code=400, detail="No words found in the uploaded wordlist")
+        info = await register_wordlist(wordlist, name)
+        return {**info, "name": name}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error storing wordlist: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Wordlist upload failed: {str(e)}")
+
+@api_router.get("/wordlists")
+async def list_wordlists():
+    """List uploaded wordlists, newest first"""
+    try:
+        return await db.wordlists.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    except Exception as e:
+        logging.error(f"Error listing wordlists: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list wordlists: {str(e)}")
+
+@api_router.delete("/wordlists/{wordlist_id}")
+async def delete_wordlist(wordlist_id: str):
+    """Remove an uploaded wordlist; analyses already running keep their copy"""
+    if not WORDLIST_ID_PATTERN.match(wordlist_id):
+        raise HTTPException(status_code=404, detail=f"Wordlist {wordlist_id} not found")
+    try:
+        deleted = await db.wordlists.delete_one({"id": wordlist_id})
+        stored = (WORDLIST_DIR / f"{wordlist_id}.words").exists()
+        if not deleted.deleted_count and not stored:
+            raise HTTPException(status_code=404, detail=f"Wordlist {wordlist_id} not found")
+        PackedWordlist.delete(WORDLIST_DIR, wordlist_id)
+        wordlist_cache.discard(wordlist_id)
+        return {"id": wordlist_id, "deleted": True}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error deleting wordlist {wordlist_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete wordlist: {str(e)}")
+
+@api_router.post("/jobs")
+async def submit_job(request: JobRequest, http_request: Request):
+    """Queue an analysis as a background job and return its id immediately
+
+    Jobs bypass admission control; their work units share job_scheduler
+    slots fairly with other clients' jobs and large analyses.
+    """
+    keyspace, keyspace_range = validate_analysis_request(request)
+    if request.distributed and (request.attack_type not in ("dictionary", "brute_force") or request.lookup_table):
+        raise HTTPException(status_code=400, detail="Distributed jobs support dictionary and brute_force attacks without lookup tables")
+    if request.custom_wordlist:
+        # Kept in the wordlist registry, so the stored job refers to it by id
+        loop = asyncio.get_event_loop()
+        packed = await loop.run_in_executor(thread_pool, store_wordlist, request.custom_wordlist)
+        if packed:
+            await register_wordlist(packed)
+            request = request.copy(update={"custom_wordlist": None, "wordlist_id": packed.digest})
+    wordlist = await request_wordlist(request)
+    job = Job(
+        HashAnalysisRequest(**request.dict(exclude={"priority", "distributed"})), request.priority,
+        keyspace, keyspace_range, wordlist, request.distributed, client_id(http_request)
+    )
+    JOBS[job.id] = job
+    await save_job_status(job)
+    job.task = asyncio.create_task(run_distributed_job(job) if job.distributed else run_job(job))
+    return {"job_id": job.id, "status": job.status}
+
+@api_router.get("/jobs")
+async def list_jobs():
+    """List jobs held by this server process"""
+    return [job.status_doc() for job in JOBS.values()]
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a job's status, progress and ETA"""
+    job = JOBS.get(job_id)
+    if job:
+        return job.status_doc()
+    stored = await db.hash_jobs.find_one({"id": job_id}, {"_id": 0, "request": 0})
+    if not stored:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return stored
+
+@api_router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job, stopping its executor work"""
+    job = JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in ("queued", "running"):
+        job.control.cancel()
+        if job.task:
+            job.task.cancel()
+    return {"job_id": job.id, "status": "cancelling" if job.task else job.status}
+
+def encode_history_cursor(item: Dict[str, Any]) -> str:
+    return f"{item['timestamp'].isoformat()}|{item['id']}"
+
+def decode_history_cursor(cursor: str) -> Dict[str, Any]:
+    """Keyset filter for analyses strictly after ``cursor`` in (timestamp, id) descending order"""
+    try:
+        timestamp, analysis_id = cursor.split("|", 1)
+        timestamp = datetime.fromisoformat(timestamp)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "id": {"$lt": analysis_id}}
+    ]}
+
+@api_router.get("/analysis-history", response_model=List[HashAnalysisHistory])
+async def get_analysis_history(
+    response: Response,
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    include_results: bool = Query(False, description="Embed each analysis's per-hash results")
+):
+    """Get hash analysis history, newest first
+
+    Pages by (timestamp, id) keyset: pass the X-Next-Cursor response header
+    back as ``cursor`` for the next page. Results are left out unless
+    ``include_results`` is set.
+    """
+    try:
+        projection = {
+            "_id": 0, "id": 1, "timestamp": 1, "total_cracked": 1, "total_time": 1, "summary": 1,
+            "total_hashes": {"$ifNull": ["$total_hashes", {"$size": {"$ifNull": ["$results", []]}}]}
+        }
+        if include_results:
+            projection["results"] = 1
+        history = await db.hash_analysis.aggregate([
+            {"$match": decode_history_cursor(cursor) if cursor else {}},
+            {"$sort": {"timestamp": -1, "id": -1}},
+            {"$limit": limit},
+            {"$project": projection}
+        ]).to_list(limit)
+        
+        if include_results:
+            stored = [item["id"] for item in history if not item.get("results")]
+            by_analysis: Dict[str, List[Dict[str, Any]]] = {}
+            if stored:
+                docs = await db.hash_results.find(
+                    {"analysis_id": {"$in": stored}}, {"_id": 0}
+                ).sort([("analysis_id", 1), ("index", 1)]).to_list(None)
+                for doc in docs:
+                    by_analysis.setdefault(doc["analysis_id"], []).append(doc)
+            for item in history:
+                item.setdefault("results", by_analysis.get(item["id"], []))
+        
+        if len(history) == limit:
+            response.headers["X-Next-Cursor"] = encode_history_cursor(history[-1])
+        return [HashAnalysisHistory(**item) for item in history]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch history")
+
+@api_router.get("/hash-stats")
+async def get_hash_stats():
+    """Get overall hash analysis statistics"""
+    try:
+        # Maintained incrementally by save_analysis, so this is two small reads
+        totals = await db.hash_stats.find_one({"_id": STATS_ID})
+        
+        if not totals or not totals.get("total_analyses"):
+            return {
+                "total_analyses": 0,
+                "total_hashes_analyzed": 0,
                 "average_crack_rate": 0,
                 "most_common_hash_types": [],
                 "weakest_passwords": []
             }
         
         # Calculate statistics
-        total_hashes = sum(len(analysis.get("results", [])) for analysis in recent_analyses)
-        total_cracked = sum(analysis.get("total_cracked", 0) for analysis in recent_analyses)
+        total_hashes = totals.get("total_hashes", 0)
+        total_cracked = totals.get("total_cracked", 0)
         avg_crack_rate = (total_cracked / total_hashes * 100) if total_hashes > 0 else 0
         
-        # Get hash type distribution
-        hash_types = {}
-        weak_passwords = []
-        
-        for analysis in recent_analyses:
-            for result in analysis.get("results", []):
-                hash_type = result.get("hash_type", "Unknown")
-                hash_types[hash_type] = hash_types.get(hash_type, 0) + 1
-                
-                if result.get("cracked") and result.get("plaintext"):
-                    weak_passwords.append(result["plaintext"])
-        
-        most_common_types = sorted(hash_types.items(), key=lambda x: x[1], reverse=True)[:5]
-        most_common_weak = list(set(weak_passwords))[:10]
+        most_common_types = sorted(totals.get("hash_types", {}).items(), key=lambda x: x[1], reverse=True)[:5]
+        weak_passwords = await db.weak_passwords.find().sort("count", -1).limit(10).to_list(10)
+        most_common_weak = [doc["plaintext"] for doc in weak_passwords]
         
         return {
-            "total_analyses": total_analyses,
+            "total_analyses": totals["total_analyses"],
             "total_hashes_analyzed": total_hashes,
             "average_crack_rate": round(avg_crack_rate, 1),
             "most_common_hash_types": most_common_types,
@@ -325,13 +3706,67 @@ async def get_hash_stats():
         logging.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get statistics")
 
+@api_router.get("/rule-stats")
+async def get_rule_stats():
+    """Get cumulative candidates generated and cracks credited per mangling rule"""
+    return [
+        {
+            "rule": spec,
+            "candidates": counts["candidates"],
+            "hits": counts["hits"],
+            "hit_rate": round(counts["hits"] / counts["candidates"] * 100, 4) if counts["candidates"] else 0
+        }
+        for spec, counts in sorted(RULE_STATS.items(), key=lambda item: item[1]["hits"], reverse=True)
+    ]
+
 @api_router.get("/")
 async def root():
     return {"message": "CyberSec Pro - Password Hash Analysis Engine"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    update_executor_gauges()
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def time_api_requests(request: Request, call_next):
+    """Record /api request latency, labelled by route template so ids do not explode the label set
+
+    Event streams would only be timed to their first byte here, so they go
+    to STREAM_SECONDS instead, timed until the stream ends.
+    """
+    if not request.url.path.startswith("/api"):
+        return await call_next(request)
+    start_time = time.perf_counter()
+    
+    def route() -> str:
+        return next((r.path for r in app.routes if r.matches(request.scope)[0] == Match.FULL), "unmatched")
+    
+    try:
+        response = await call_next(request)
+    except BaseException:
+        REQUEST_SECONDS.observe(time.perf_counter() - start_time, method=request.method, route=route(), status=500)
+        raise
+    if not response.headers.get("content-type", "").startswith("text/event-stream"):
+        REQUEST_SECONDS.observe(time.perf_counter() - start_time, method=request.method, route=route(), status=response.status_code)
+        return response
+    
+    body = response.body_iterator
+    
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            STREAM_SECONDS.observe(time.perf_counter() - start_time, route=route())
+    
+    response.body_iterator = timed_body()
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -347,6 +3782,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def build_digest_indexes():
+    for hash_type in HASH_ALGORITHMS:
+        get_digest_index(hash_type)
+    get_breached_passwords()
+    get_pcfg_model()
+
+@app.on_event("startup")
+async def create_potfile_indexes():
+    try:
+        await db.potfile.create_index("hash", unique=True)
+        await db.hash_misses.create_index([("hash", 1), ("fingerprint", 1)], unique=True)
+    except Exception as e:
+        logging.error(f"Error creating potfile indexes: {str(e)}")
+
+@app.on_event("startup")
+async def create_history_indexes():
+    try:
+        await db.hash_analysis.create_index([("timestamp", -1), ("id", -1)])
+        await db.hash_results.create_index([("analysis_id", 1), ("index", 1)])
+        await db.hash_results.create_index("hash_value")
+        await db.hash_results.create_index([("timestamp", -1)])
+    except Exception as e:
+        logging.error(f"Error creating history indexes: {str(e)}")
+
+@app.on_event("startup")
+async def create_wordlist_indexes():
+    try:
+        await db.wordlists.create_index("id", unique=True)
+        await db.wordlists.create_index([("created_at", -1)])
+    except Exception as e:
+        logging.error(f"Error creating wordlist indexes: {str(e)}")
+
+@app.on_event("startup")
+async def start_work_queue_worker():
+    global work_queue_task
+    try:
+        await db.work_chunks.create_index([("status", 1), ("priority", -1), ("created_at", 1), ("index", 1)])
+        await db.work_chunks.create_index([("job_id", 1), ("status", 1)])
+        await db.work_found.create_index([("job_id", 1), ("target", 1)], unique=True)
+        await db.work_found.create_index([("job_id", 1), ("group", 1)])
+        await db.work_targets.create_index([("job_id", 1), ("group", 1), ("part", 1)])
+        await db.work_words.create_index("job_id")
+    except Exception as e:
+        logging.error(f"Error creating work queue indexes: {str(e)}")
+    if WORK_QUEUE_SLOTS > 0:
+        work_queue_task = asyncio.create_task(run_work_queue_worker())
+
+@app.on_event("startup")
+async def start_job_resumption():
+    global job_resume_task
+    try:
+        await db.hash_jobs.create_index([("status", 1), ("checkpointed_at", 1)])
+        await db.job_checkpoints.create_index([("job_id", 1), ("unit", 1)], unique=True)
+    except Exception as e:
+        logging.error(f"Error creating checkpoint indexes: {str(e)}")
+    job_resume_task = asyncio.create_task(resume_interrupted_jobs())
+
+@app.on_event("startup")
+async def prepare_hash_stats():
+    try:
+        await db.weak_passwords.create_index("plaintext", unique=True)
+        await db.weak_passwords.create_index([("count", -1)])
+        await backfill_hash_stats()
+    except Exception as e:
+        logging.error(f"Error preparing hash stats: {str(e)}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if work_queue_task is not None:
+        work_queue_task.cancel()
+    if job_resume_task is not None:
+        job_resume_task.cancel()
+    # Stop running jobs at a checkpoint so the next process resumes them
+    running = [job for job in JOBS.values() if job.task is not None and not job.distributed]
+    tasks = [job.task for job in running]
+    for job in running:
+        job.control.cancel(interrupted=True)
+        job.task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if pending_writes:
+        await asyncio.gather(*pending_writes, return_exceptions=True)
+    client.close()
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+    crypt_pool.shutdown(wait=False, cancel_futures=True)
+    if shard_manager is not None:
+        shard_manager.shutdown()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Unix crypt(3) formats found in /etc/shadow dumps
+
+Supports MD5-crypt (``$1$``), SHA-256-crypt (``$5$``), SHA-512-crypt
+(``$6$``) and traditional DES crypt. A hash is parsed once into a
+CryptSetting (scheme, salt, rounds); every hash with the same setting is
+produced by the same salt and rounds, so a candidate only has to be derived
+once per setting and compared against all of them.
+
+Derivation uses the system crypt(3) through the stdlib ``crypt`` module
+where it exists. It runs in C but holds the GIL for the whole derivation,
+so threads do not parallelise it; the server runs crypt work on worker
+processes. Without the module, the MD5 and SHA schemes fall back to the
+pure-Python reference algorithms below and DES hashes are reported as
+unsupported.
+"""
+
+import hashlib
+import re
+import warnings
+from typing import NamedTuple, Optional
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import crypt as _crypt
+except ImportError:
+    _crypt = None
+
+ITOA64 = "./0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+MD5_PATTERN = re.compile(r'^\$1\$([^$]{0,8})\$[./0-9A-Za-z]{22}$')
+SHA_PATTERN = re.compile(r'^\$([56])\$(?:rounds=(\d+)\$)?([^$]{0,16})\$([./0-9A-Za-z]+)$')
+DES_PATTERN = re.compile(r'^([./0-9A-Za-z]{2})[./0-9A-Za-z]{11}$')
+
+SHA_CHECKSUM_LENGTHS = {"5": 43, "6": 86}
+SHA_DEFAULT_ROUNDS = 5000
+SHA_MIN_ROUNDS, SHA_MAX_ROUNDS = 1000, 999_999_999
+
+# Byte order of the final base-64 encoding, in groups of three
+MD5_TRANSPOSE = [(0, 6, 12), (1, 7, 13), (2, 8, 14), (3, 9, 15), (4, 10, 5)]
+SHA256_TRANSPOSE = [(i, i + 10, i + 20)[3 - i % 3:] + (i, i + 10, i + 20)[:3 - i % 3] for i in range(10)]
+SHA512_TRANSPOSE = [(i, i + 21, i + 42)[i % 3:] + (i, i + 21, i + 42)[:i % 3] for i in range(21)]
+
+
+class CryptSetting(NamedTuple):
+    """Everything in a crypt hash but its checksum"""
+    scheme: str  # "1", "5", "6" or "des"
+    salt: str
+    rounds: Optional[int]
+    setting: str  # prefix passed to crypt(3), shared by hashes of one salt
+
+
+def parse_crypt(hash_value: str) -> Optional[CryptSetting]:
+    """Parse a crypt hash into its setting, or None if it is malformed"""
+    hash_value = hash_value.strip()
+
+    match = MD5_PATTERN.match(hash_value)
+    if match:
+        return CryptSetting("1", match.group(1), None, f"$1${match.group(1)}")
+
+    match = SHA_PATTERN.match(hash_value)
+    if match:
+        scheme, rounds, salt, checksum = match.groups()
+        if len(checksum) != SHA_CHECKSUM_LENGTHS[scheme]:
+            return None
+        if rounds is None:
+            return CryptSetting(scheme, salt, None, f"${scheme}${salt}")
+        return CryptSetting(scheme, salt, int(rounds), f"${scheme}$rounds={rounds}${salt}")
+
+    match = DES_PATTERN.match(hash_value)
+    if match:
+        return CryptSetting("des", match.group(1), None, match.group(1))
+
+    return None
+
+
+def supported(setting: CryptSetting) -> bool:
+    """Whether this interpreter can derive hashes for the setting"""
+    return _crypt is not None or setting.scheme != "des"
+
+
+def crypt_hash(password: str, setting: CryptSetting) -> str:
+    """Derive the full crypt string of ``password`` under ``setting``"""
+    if _crypt is not None:
+        return _crypt.crypt(password, setting.setting) or ""
+    if setting.scheme == "1":
+        return md5_crypt(password.encode(), setting.salt.encode())
+    if setting.scheme in SHA_CHECKSUM_LENGTHS:
+        return sha_crypt(password.encode(), setting)
+    raise ValueError("DES crypt requires the system crypt module")
+
+
+def _encode64(digest: bytes, transpose: list) -> str:
+    out = []
+    for group in transpose:
+        value = 0
+        for index in group:
+            value = (value << 8) | digest[index]
+        for _ in range(len(group) + 1):
+            out.append(ITOA64[value & 0x3f])
+            value >>= 6
+    return "".join(out)
+
+
+def md5_crypt(password: bytes, salt: bytes) -> str:
+    """Pure-Python MD5-crypt, as in FreeBSD and glibc"""
+    alternate = hashlib.md5(password + salt + password).digest()
+    context = password + b"$1$" + salt
+    for remaining in range(len(password), 0, -16):
+        context += alternate[:min(remaining, 16)]
+    length = len(password)
+    while length:
+        context += b"\0" if length & 1 else password[:1]
+        length >>= 1
+    digest = hashlib.md5(context).digest()
+
+    for i in range(1000):
+        block = password if i & 1 else digest
+        if i % 3:
+            block += salt
+        if i % 7:
+            block += password
+        block += digest if i & 1 else password
+        digest = hashlib.md5(block).digest()
+
+    checksum = _encode64(digest, MD5_TRANSPOSE) + _encode64(digest, [(11,)])
+    return f"$1${salt.decode()}${checksum}"
+
+
+def sha_crypt(password: bytes, setting: CryptSetting) -> str:
+    """Pure-Python SHA-256-crypt and SHA-512-crypt (Drepper's specification)"""
+    hasher = hashlib.sha256 if setting.scheme == "5" else hashlib.sha512
+    salt = setting.salt.encode()
+    rounds = setting.rounds or SHA_DEFAULT_ROUNDS
+    rounds = max(SHA_MIN_ROUNDS, min(rounds, SHA_MAX_ROUNDS))
+    size = hasher().digest_size
+
+    alternate = hasher(password + salt + password).digest()
+    context = password + salt
+    context += (alternate * (len(password) // size + 1))[:len(password)]
+    length = len(password)
+    while length:
+        context += alternate if length & 1 else password
+        length >>= 1
+    digest = hasher(context).digest()
+
+    p_bytes = (hasher(password * len(password)).digest() * (len(password) // size + 1))[:len(password)]
+    s_bytes = (hasher(salt * (16 + digest[0])).digest() * (len(salt) // size + 1))[:len(salt)]
+
+    for i in range(rounds):
+        block = p_bytes if i & 1 else digest
+        if i % 3:
+            block += s_bytes
+        if i % 7:
+            block += p_bytes
+        block += digest if i & 1 else p_bytes
+        digest = hasher(block).digest()
+
+    if setting.scheme == "5":
+        checksum = _encode64(digest, SHA256_TRANSPOSE) + _encode64(digest, [(31, 30)])
+    else:
+        checksum = _encode64(digest, SHA512_TRANSPOSE) + _encode64(digest, [(63,)])
+    prefix = f"rounds={rounds}$" if setting.rounds is not None else ""
+    return f"${setting.scheme}${prefix}{setting.salt}${checksum}"
@@ -0,0 +1,111 @@
+"""
+Packed wordlists for the server-side wordlist registry
+
+A PackedWordlist keeps every word UTF-8 encoded in one bytes buffer, each
+followed by a newline, plus an ``array('Q')`` of word start offsets. That is
+about nine bytes of overhead per word instead of a str object and a list
+slot, and attacks hash candidates straight from the buffer, so a wordlist
+is encoded once when it is uploaded rather than on every request.
+
+On disk a wordlist is ``<id>.words`` (the buffer) and ``<id>.offsets`` (the
+raw offsets array), where the id is the SHA-256 of the buffer, so uploading
+the same list twice stores it once.
+"""
+
+import hashlib
+import os
+import tempfile
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Words decoded or split per step when iterating
+CHUNK_WORDS = 65536
+
+
+class PackedWordlist(Sequence):
+    """Read-only sequence of words backed by one contiguous bytes buffer"""
+
+    def __init__(self, data: bytes, offsets: Optional[array] = None):
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+        self.data = data
+        if offsets is None:
+            offsets = array("Q", [0])
+            position = data.find(b"\n")
+            while position != -1:
+                offsets.append(position + 1)
+                position = data.find(b"\n", position + 1)
+        self.offsets = offsets
+        self._digest = None
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "PackedWordlist":
+        """Encode words once, one per line: a word holding line breaks is split at them, and empty lines are skipped"""
+        data = bytearray()
+        offsets = array("Q", [0])
+        for word in words:
+            for line in word.split("\n") if "\n" in word else (word,):
+                encoded = line.strip("\r").encode("utf-8", errors="replace")
+                if encoded:
+                    data += encoded + b"\n"
+                    offsets.append(len(data))
+        return cls(bytes(data), offsets)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the buffer: the wordlist's id in the registry"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("PackedWordlist slices must be contiguous")
+            stop = max(start, stop)
+            base = self.offsets[start]
+            offsets = array("Q", (offset - base for offset in self.offsets[start:stop + 1]))
+            return PackedWordlist(self.data[base:self.offsets[stop]], offsets)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("wordlist index out of range")
+        return self.data[self.offsets[index]:self.offsets[index + 1] - 1].decode("utf-8", errors="replace")
+
+    def encoded(self) -> Iterator[bytes]:
+        """Yield each word as bytes, split from the buffer a chunk at a time"""
+        for start in range(0, len(self), CHUNK_WORDS):
+            end = min(start + CHUNK_WORDS, len(self))
+            yield from self.data[self.offsets[start]:self.offsets[end] - 1].split(b"\n")
+
+    def __iter__(self) -> Iterator[str]:
+        for word in self.encoded():
+            yield word.decode("utf-8", errors="replace")
+
+    def save(self, directory: Path):
+        """Write ``<digest>.words`` and ``<digest>.offsets``, each renamed into place when complete"""
+        for suffix, write in ((".offsets", self.offsets.tofile), (".words", lambda f: f.write(self.data))):
+            target = directory / f"{self.digest}{suffix}"
+            with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+                write(f)
+            os.replace(f.name, target)
+
+    @classmethod
+    def load(cls, directory: Path, digest: str) -> "PackedWordlist":
+        data = (directory / f"{digest}.words").read_bytes()
+        offsets = array("Q")
+        offsets.frombytes((directory / f"{digest}.offsets").read_bytes())
+        wordlist = cls(data, offsets)
+        wordlist._digest = digest
+        return wordlist
+
+    @staticmethod
+    def delete(directory: Path, digest: str):
+        for suffix in (".words", ".offsets"):
+            (directory / f"{digest}{suffix}").unlink(missing_ok=True)
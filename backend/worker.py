@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Headless work-queue worker for distributed jobs
+
+Runs the same chunk loop as the API server's WORK_QUEUE_SLOTS worker, without
+serving HTTP, so extra machines can add cracking capacity to jobs submitted
+with ``"distributed": true``. Configure it like the server (MONGO_URL,
+DB_NAME, HASH_EXECUTOR, ...) and start as many as needed:
+
+    python worker.py --slots 4
+
+A worker that dies loses only its leased chunks, which other workers take
+over once their lease (WORK_LEASE_SECONDS) runs out.
+"""
+
+import argparse
+import asyncio
+import logging
+
+import server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lease and crack distributed job chunks from the work queue")
+    parser.add_argument("--slots", type=int, default=max(server.WORK_QUEUE_SLOTS, 1),
+                        help="Chunks run at once (default WORK_QUEUE_SLOTS)")
+    args = parser.parse_args()
+
+    logging.info(f"Work queue worker {server.WORKER_ID} starting with {args.slots} slot(s)")
+    try:
+        asyncio.run(server.run_work_queue_worker(args.slots))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.process_pool is not None:
+            server.process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for CyberSec Pro - Password Hash Analysis Engine
+Times the cracking hot paths in-process and compares them with a baseline
+
+    python backend_benchmark.py --save-baseline          # record a baseline
+    python backend_benchmark.py                          # compare against it
+    python backend_benchmark.py --only crack_batch --repeat 5
+
+Each benchmark runs ``--repeat`` times and keeps the fastest run, which is
+the least disturbed by other load on the machine. Results are written as
+JSON (``--output``); a benchmark whose throughput falls more than
+``--threshold`` below the baseline is reported as a regression and makes
+the script exit non-zero, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+# server.py connects to MongoDB lazily; none of the benchmarks touch the database
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+from pcfg import Grammar  # noqa: E402
+from unix_crypt import CryptSetting  # noqa: E402
+
+DEFAULT_OUTPUT = ROOT_DIR / "benchmark_results.json"
+DEFAULT_BASELINE = ROOT_DIR / "benchmark_baseline.json"
+
+UNSALTED_TYPES = list(server.HASH_ALGORITHMS)
+CRYPT_SETTINGS = {
+    "MD5 (Unix)": CryptSetting("1", "saltsalt", None, "$1$saltsalt"),
+    "SHA-256 (Unix)": CryptSetting("5", "saltsalt", None, "$5$saltsalt"),
+    "SHA-512 (Unix)": CryptSetting("6", "saltsalt", None, "$6$saltsalt"),
+}
+BATCH_SIZES = [1, 10, 100, 1000]
+
+
+class Benchmark:
+    """One timed operation: ``run()`` does the work and returns the units it processed"""
+
+    def __init__(self, name: str, run: Callable[[], Dict[str, int]], group: str):
+        self.name = name
+        self.run = run
+        self.group = group
+
+    def measure(self, repeat: int) -> Dict[str, float]:
+        best_time = None
+        units = {}
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            units = self.run()
+            elapsed = time.perf_counter() - start_time
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+        result = {"seconds": best_time}
+        for unit, count in units.items():
+            result[f"{unit}_per_sec"] = count / best_time if best_time > 0 else 0.0
+        return result
+
+
+def candidates(count: int) -> List[str]:
+    """Deterministic wordlist that never contains the benchmark targets"""
+    return [f"candidate{i:08d}" for i in range(count)]
+
+
+def missing_targets(hash_type: str, count: int) -> List[str]:
+    """Hashes no benchmark wordlist cracks, so every attack runs to the end"""
+    return [server.hash_password(f"not-in-wordlist-{i}", hash_type) for i in range(count)]
+
+
+def build_benchmarks(wordlist_size: int, slow_wordlist_size: int) -> List[Benchmark]:
+    benchmarks = []
+    wordlist = candidates(wordlist_size)
+    slow_wordlist = candidates(slow_wordlist_size)
+
+    # Hash identification over a mix of formats
+    samples = [server.hash_password("benchmark", hash_type) for hash_type in UNSALTED_TYPES]
+    samples += ["$2b$04$" + "a" * 53, "$6$saltsalt$" + "a" * 86, "abcdefghijklm", "not a hash"]
+    identify_inputs = samples * 2000
+
+    def identify():
+        for hash_value in identify_inputs:
+            server.identify_hash_type(hash_value)
+        return {"hashes": len(identify_inputs)}
+    benchmarks.append(Benchmark("identify_hash_type", identify, "identify"))
+
+    # Raw digest throughput per algorithm
+    for hash_type in UNSALTED_TYPES:
+        def digest(hash_type=hash_type):
+            for password in wordlist:
+                server.hash_password(password, hash_type)
+            return {"hashes": len(wordlist)}
+        benchmarks.append(Benchmark(f"hash_password[{hash_type}]", digest, "hash_password"))
+
+    # Single-target dictionary attack, worst case (target not in the wordlist)
+    for hash_type in UNSALTED_TYPES:
+        target = missing_targets(hash_type, 1)[0]
+
+        def dictionary(hash_type=hash_type, target=target):
+            _, _, attempts = server.crack_hash_dictionary(target, hash_type, wordlist)
+            return {"candidates": attempts, "hashes": 1}
+        benchmarks.append(Benchmark(f"crack_dictionary[{hash_type}]", dictionary, "crack_dictionary"))
+
+    for hash_type, setting in CRYPT_SETTINGS.items():
+        target = server.crypt_hash("not-in-wordlist", setting)
+
+        def crypt_dictionary(hash_type=hash_type, target=target):
+            _, _, attempts = server.crack_hash_dictionary(target, hash_type, slow_wordlist)
+            return {"candidates": attempts, "hashes": 1}
+        benchmarks.append(Benchmark(f"crack_dictionary[{hash_type}]", crypt_dictionary, "crack_dictionary"))
+
+    bcrypt_target = server.bcrypt.hashpw(b"not-in-wordlist", server.bcrypt.gensalt(rounds=4)).decode()
+
+    def bcrypt_dictionary():
+        _, _, attempts = server.crack_hash_dictionary(bcrypt_target, "bcrypt", slow_wordlist)
+        return {"candidates": attempts, "hashes": 1}
+    benchmarks.append(Benchmark("crack_dictionary[bcrypt cost 4]", bcrypt_dictionary, "crack_dictionary"))
+
+    # Multi-target single pass, per algorithm and batch size
+    for hash_type in UNSALTED_TYPES:
+        for batch_size in BATCH_SIZES:
+            targets = missing_targets(hash_type, batch_size)
+
+            def batch(hash_type=hash_type, targets=targets):
+                results = server.crack_hash_batch(targets, hash_type, wordlist)
+                return {"candidates": max(attempts for _, _, attempts, _ in results.values()), "hashes": len(targets)}
+            benchmarks.append(Benchmark(f"crack_batch[{hash_type} x{batch_size}]", batch, "crack_batch"))
+
+    # Rule expansion that produces EXTENDED_WORDLIST
+    def extended_wordlist():
+        expanded = list(server.RuleEngine(server.DEFAULT_RULES).apply(server.COMMON_PASSWORDS))
+        return {"candidates": len(expanded)}
+    benchmarks.append(Benchmark("extended_wordlist", extended_wordlist, "rules"))
+
+    # Probability-ordered guesses from a grammar over the built-in words with numeric suffixes
+    grammar = Grammar.train(server.EXTENDED_WORDLIST + [f"{word}{i}" for word in server.COMMON_PASSWORDS for i in range(100)])
+
+    def pcfg_guesses():
+        count = sum(1 for _ in grammar.guesses(0, wordlist_size))
+        return {"candidates": count}
+    benchmarks.append(Benchmark("pcfg_guesses", pcfg_guesses, "pcfg"))
+
+    # Strength scoring of distinct plaintexts (memo cleared) and of repeats
+    plaintexts = [f"Summer{i}!" for i in range(2000)] + server.EXTENDED_WORDLIST
+
+    def strength_uncached():
+        server.plaintext_strength.cache_clear()
+        for plaintext in plaintexts:
+            server.calculate_strength_score("SHA-256", plaintext)
+        return {"scores": len(plaintexts)}
+    benchmarks.append(Benchmark("strength_score[uncached]", strength_uncached, "strength"))
+
+    def strength_cached():
+        for plaintext in plaintexts:
+            server.calculate_strength_score("SHA-256", plaintext)
+        return {"scores": len(plaintexts)}
+    benchmarks.append(Benchmark("strength_score[cached]", strength_cached, "strength"))
+
+    return benchmarks
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def throughput(result: Dict[str, float]) -> float:
+    """Primary metric used for regression checks"""
+    for key in ("candidates_per_sec", "hashes_per_sec", "scores_per_sec"):
+        if key in result:
+            return result[key]
+    return 1 / result["seconds"]
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Print each benchmark against its baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':48} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:48} {'-':>14} {throughput(result):>14,.0f} {'new':>8}")
+            continue
+        before, after = throughput(baseline[name]), throughput(result)
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change < -threshold:
+            flag = "  ❌ REGRESSION"
+            regressions.append(name)
+        elif change > threshold:
+            flag = "  ✅ faster"
+        print(f"{name:48} {before:>14,.0f} {after:>14,.0f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hash analysis hot paths")
+    parser.add_argument("--only", nargs="+", default=[],
+                        help="Run benchmarks whose name or group contains any of these strings")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest is kept")
+    parser.add_argument("--wordlist-size", type=int, default=20000, help="Candidates per unsalted attack")
+    parser.add_argument("--slow-wordlist-size", type=int, default=50, help="Candidates per bcrypt/crypt attack")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Where to write this run's results")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Fractional throughput drop reported as a regression")
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks(args.wordlist_size, args.slow_wordlist_size)
+    if args.only:
+        benchmarks = [b for b in benchmarks if any(term in b.name or term in b.group for term in args.only)]
+
+    print("🚀 Running CyberSec Pro benchmarks")
+    print("=" * 60)
+    results = {}
+    for benchmark in benchmarks:
+        result = benchmark.measure(args.repeat)
+        results[benchmark.name] = result
+        rates = ", ".join(f"{value:,.0f} {key.replace('_per_sec', '')}/s"
+                          for key, value in result.items() if key.endswith("_per_sec"))
+        print(f"{benchmark.name:48} {result['seconds'] * 1000:9.2f} ms  {rates}")
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"repeat": args.repeat, "wordlist_size": args.wordlist_size,
+                     "slow_wordlist_size": args.slow_wordlist_size},
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("settings") != report["settings"]:
+            print("⚠️  Baseline was recorded with different settings; comparisons may not be meaningful")
+        regressions = compare(results, baseline["results"], args.threshold)
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
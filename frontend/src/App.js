@@ -280,7 +280,7 @@ letmein"
                         </div>
                         <div className="text-right">
                           <p className="text-sm">
-                            {item.total_cracked}/{item.results.length} cracked
+                            {item.total_cracked}/{item.total_hashes} cracked
                           </p>
                           <p className="text-sm text-gray-400">
                             {item.total_time.toFixed(2)}s
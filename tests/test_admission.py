@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from server import AdmissionController
+
+
+def controller(**overrides) -> AdmissionController:
+    settings = dict(slots=2, small_slots=2, queue_size=4, small_cost=1_000, client_cost=1_000_000, max_cost=10_000_000)
+    settings.update(overrides)
+    return AdmissionController(**settings)
+
+
+def test_oversized_analysis_leaves_room_for_other_clients():
+    async def scenario():
+        admission = controller()
+        huge = await admission.acquire("auditor", 3e11)
+        tiny = await admission.acquire("user", 50)
+        assert huge.charge == 1_000_000
+        assert admission.outstanding == 1_000_050
+        admission.release(tiny)
+        admission.release(huge)
+        assert admission.outstanding == 0
+        assert admission.outstanding_by_client == {}
+    asyncio.run(scenario())
+
+
+def test_client_budget_rejects_with_retry_after():
+    async def scenario():
+        admission = controller()
+        first = await admission.acquire("auditor", 3e11)
+        with pytest.raises(HTTPException) as error:
+            await admission.acquire("auditor", 500)
+        assert error.value.status_code == 429
+        assert 1 <= int(error.value.headers["Retry-After"]) <= 60
+        admission.release(first)
+        admission.release(await admission.acquire("auditor", 500))
+    asyncio.run(scenario())
+
+
+def test_release_is_idempotent():
+    async def scenario():
+        admission = controller(slots=1)
+        first = await admission.acquire("a", 5_000)
+        admission.release(first)
+        admission.release(first)
+        assert admission.large.running == 0
+        assert admission.outstanding == 0
+    asyncio.run(scenario())
+
+
+def test_queue_bound_and_fair_order():
+    async def scenario():
+        admission = controller(slots=1, queue_size=3)
+        running = await admission.acquire("a", 5_000)
+        order = []
+
+        async def wait(client):
+            granted = await admission.acquire(client, 5_000)
+            order.append(client)
+            await asyncio.sleep(0)
+            admission.release(granted)
+
+        # "a" already holds the slot, so "b" goes ahead of a's queued work
+        waiters = [asyncio.ensure_future(wait(client)) for client in ("a", "a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await admission.acquire("c", 5_000)
+        assert error.value.status_code == 429
+
+        admission.release(running)
+        await asyncio.gather(*waiters)
+        assert order == ["b", "a", "a"]
+        assert admission.large.running == 0
+    asyncio.run(scenario())
+
+
+def test_small_requests_interleave_between_clients():
+    async def scenario():
+        admission = controller(small_slots=1)
+        order = []
+
+        async def small(client):
+            granted = await admission.acquire(client, 100)
+            order.append(client)
+            await asyncio.sleep(0)
+            admission.release(granted)
+
+        # "flood" holds the slot and queues a burst; "b" and "c" arrive behind it
+        held = await admission.acquire("flood", 100)
+        tasks = [asyncio.ensure_future(small("flood")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(small(client)) for client in ("b", "c", "b")]
+        await asyncio.sleep(0)
+        admission.release(held)
+        await asyncio.gather(*tasks)
+        assert order == ["b", "c", "flood", "b", "flood", "flood", "flood"]
+        assert admission.small.running == 0
+        assert admission.outstanding_by_client == {}
+    asyncio.run(scenario())
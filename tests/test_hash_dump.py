@@ -0,0 +1,103 @@
+import hashlib
+
+import pytest
+
+from server import parse_hash_dump
+
+MD5 = hashlib.md5(b"password").hexdigest()
+SHA1 = hashlib.sha1(b"password").hexdigest()
+NT = "8846f7eaee8fb117ad06bdd830b7586c"
+SHA512_CRYPT = "$6$saltsalt$" + "a" * 86
+
+
+def parse(*lines: str):
+    return parse_hash_dump([("\n".join(lines) + "\n").encode()])
+
+
+def accounts(dump) -> list:
+    return list(zip(dump.users, dump.hash_values))
+
+
+def test_plain_hashes():
+    dump = parse(MD5, f"  {SHA1} ", "", MD5)
+    assert accounts(dump) == [(None, MD5), (None, SHA1), (None, MD5)]
+    assert dump.hash_types == {MD5: "MD5", SHA1: "SHA-1"}
+    assert (dump.formats, dump.total_lines, dump.skipped) == ({"plain": 3}, 3, 0)
+
+
+def test_user_hash_lines():
+    dump = parse(f"alice:{MD5}", f"bob:{MD5.upper()}", "carol:", f"dave:{SHA1}")
+    assert accounts(dump) == [("alice", MD5), ("bob", MD5.upper()), ("dave", SHA1)]
+    # Differently cased duplicates are one target
+    assert dump.targets == {MD5.upper(): MD5}
+    assert dump.hash_types == {MD5: "MD5", SHA1: "SHA-1"}
+    assert (dump.formats, dump.total_lines, dump.skipped) == ({"user_hash": 3}, 4, 1)
+
+
+def test_shadow_lines_skip_disabled_accounts_and_unlock_locked_ones():
+    dump = parse(
+        f"root:{SHA512_CRYPT}:19000:0:99999:7:::",
+        "daemon:*:19000:0:99999:7:::",
+        "nobody:!!:19000:0:99999:7:::",
+        "guest:x:19000:0:99999:7:::",
+        f"locked:!{SHA512_CRYPT}:19000:0:99999:7:::",
+        f"again:{SHA512_CRYPT}:19000:0:99999:7:::",
+    )
+    assert accounts(dump) == [("root", SHA512_CRYPT), ("locked", SHA512_CRYPT), ("again", SHA512_CRYPT)]
+    assert dump.hash_types == {SHA512_CRYPT: "SHA-512 (Unix)"}
+    assert (dump.formats, dump.total_lines, dump.skipped) == ({"shadow": 3}, 6, 3)
+
+
+def test_pwdump_lines_are_typed_ntlm():
+    dump = parse(
+        f"Administrator:500:aad3b435b51404eeaad3b435b51404ee:{NT}:::",
+        f"Guest:501:aad3b435b51404eeaad3b435b51404ee:{NT.upper()}:::",
+    )
+    assert accounts(dump) == [("Administrator", NT), ("Guest", NT.upper())]
+    # A 32-digit NT hash would otherwise pass for MD5
+    assert dump.hash_types == {NT: "NTLM"}
+    assert dump.formats == {"pwdump": 2}
+
+
+def test_malformed_lines():
+    dump = parse(
+        "just:three:fields",
+        f"svc:notarid:lm:{NT}:::",
+        ":",
+        "\r",
+    )
+    # Unrecognized layouts fall back to user:hash on the first two fields
+    assert accounts(dump) == [("just", "three"), ("svc", "notarid")]
+    assert dump.formats == {"user_hash": 2}
+    assert (dump.total_lines, dump.skipped) == (3, 1)
+
+
+SAMPLES = {
+    "plain": [MD5, SHA1, MD5.upper()],
+    "user_hash": [f"alice:{MD5}", "bob:", f"carol:{SHA1.upper()}"],
+    "shadow": [f"root:{SHA512_CRYPT}:19000:0:99999:7:::", "daemon:*:19000:0:99999:7:::", f"l:!{SHA512_CRYPT}:1:0:9:7:::"],
+    "pwdump": [f"Administrator:500:aad3b435b51404eeaad3b435b51404ee:{NT}:::"] * 2,
+}
+
+
+@pytest.mark.parametrize("dump_format", SAMPLES)
+def test_bulk_split_matches_line_by_line_parsing(dump_format):
+    lines = SAMPLES[dump_format]
+    bulk = parse(*lines)
+    # A line of another layout sends the block through parse_dump_line
+    other = "x:y" if dump_format != "user_hash" else MD5
+    mixed = parse(*lines, other)
+    assert bulk.formats == {dump_format: len(bulk.hash_values)}
+    assert accounts(mixed)[:-1] == accounts(bulk)
+    assert mixed.skipped == bulk.skipped
+    assert {target: mixed.hash_types[target] for target in bulk.hash_types} == bulk.hash_types
+
+
+def test_dumps_split_into_blocks_parse_like_one_block():
+    lines = [line for sample in SAMPLES.values() for line in sample]
+    text = ("\r\n".join(lines) + "\r\n").encode()
+    whole = parse_hash_dump([text])
+    raw = text.splitlines(keepends=True)
+    split = parse_hash_dump(b"".join(raw[start:start + 2]) for start in range(0, len(raw), 2))
+    assert accounts(split) == accounts(whole)
+    assert (split.hash_types, split.formats, split.skipped) == (whole.hash_types, whole.formats, whole.skipped)
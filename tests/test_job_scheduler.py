@@ -0,0 +1,56 @@
+import asyncio
+
+from server import AttackControl, JobScheduler
+
+
+def test_jobs_of_one_client_take_turns_by_slot_time():
+    async def scenario():
+        now = [0.0]
+        scheduler = JobScheduler(1, clock=lambda: now[0])
+        first = AttackControl(scheduled=True, client="auditor")
+        second = AttackControl(scheduled=True, client="auditor")
+        order = []
+
+        async def unit(name, control, seconds):
+            await scheduler.acquire(control)
+            order.append(name)
+            await asyncio.sleep(0)
+            now[0] += seconds
+            scheduler.release(control)
+
+        await scheduler.acquire(first)
+        units = [asyncio.ensure_future(unit("first", first, 2.0)) for _ in range(3)]
+        units += [asyncio.ensure_future(unit("second", second, 3.0)) for _ in range(2)]
+        await asyncio.sleep(0)
+        now[0] += 1.0
+        scheduler.release(first)
+        await asyncio.gather(*units)
+
+        # Submission order alone would run all of the first job's units before the second's
+        assert order == ["second", "first", "first", "second", "first"]
+        assert (first.slot_seconds, second.slot_seconds) == (7.0, 6.0)
+        assert scheduler.running == {}
+    asyncio.run(scenario())
+
+
+def test_priority_and_client_fairness_come_before_slot_time():
+    async def scenario():
+        scheduler = JobScheduler(1)
+        holder = AttackControl(scheduled=True, client="a")
+        await scheduler.acquire(holder)
+        fresh = AttackControl(scheduled=True, client="a")
+        urgent = AttackControl(priority=5, scheduled=True, client="a")
+        urgent.slot_seconds = 100.0
+        order = []
+
+        async def unit(name, control):
+            await scheduler.acquire(control)
+            order.append(name)
+            scheduler.release(control)
+
+        units = [asyncio.ensure_future(unit("fresh", fresh)), asyncio.ensure_future(unit("urgent", urgent))]
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*units)
+        assert order == ["urgent", "fresh"]
+    asyncio.run(scenario())
@@ -0,0 +1,32 @@
+import pytest
+
+from server import Keyspace
+
+
+def test_index_ordering_over_lengths():
+    keyspace = Keyspace.from_request(None, "abc", 3)
+    assert keyspace.sizes == [3, 9, 27]
+    assert keyspace.size == 39
+    assert keyspace.candidate(0) == b"a"
+    assert keyspace.candidate(2) == b"c"
+    assert keyspace.candidate(3) == b"aa"
+    assert keyspace.candidate(7) == b"bb"
+    assert keyspace.candidate(3 + 9 + 7) == b"acb"
+    assert keyspace.candidate(keyspace.size - 1) == b"ccc"
+    with pytest.raises(IndexError):
+        keyspace.candidate(keyspace.size)
+
+
+def test_mask_positions_are_mixed_radix_digits():
+    keyspace = Keyspace.from_request("?u?d", None, 8)
+    assert keyspace.size == 26 * 10
+    assert keyspace.candidate(0) == b"A0"
+    assert keyspace.candidate(10 * 13 + 5) == b"N5"
+    assert keyspace.candidate(keyspace.size - 1) == b"Z9"
+
+
+@pytest.mark.parametrize("start, end", [(0, 39), (2, 5), (11, 12), (10, 30), (38, 39), (5, 5)])
+def test_iter_range_matches_candidate(start, end):
+    keyspace = Keyspace.from_request(None, "abc", 3)
+    produced = [bytes(candidate) for candidate in keyspace.iter_range(start, end)]
+    assert produced == [keyspace.candidate(index) for index in range(start, end)]
@@ -0,0 +1,79 @@
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from lookup_tables import LookupTable, build_table, table_path, wordlist_path
+from server import HashAnalysisRequest, validate_analysis_request
+
+WORDS = [f"word{i:04d}" for i in range(500)]
+
+
+@pytest.fixture
+def tables(tmp_path):
+    source = wordlist_path(tmp_path, "words")
+    # Blank lines are skipped, CRLF endings are stripped and duplicates resolve to their first line
+    source.write_bytes(b"\r\n".join(word.encode() for word in WORDS) + b"\r\n\nword0007\n")
+    yield tmp_path, source
+
+
+def open_table(directory, source, algorithm: str, **build) -> LookupTable:
+    output = table_path(directory, "words", algorithm)
+    assert build_table(source, algorithm, output, **build) == len(WORDS) + 1
+    return LookupTable(output, source)
+
+
+@pytest.mark.parametrize("chunk_lines", [1_000_000, 64, 1])
+def test_build_then_lookup(tables, chunk_lines):
+    # Small chunks spill many sorted runs to disk and merge them
+    directory, source = tables
+    table = open_table(directory, source, "md5", chunk_lines=chunk_lines)
+    try:
+        assert table.count == len(WORDS) + 1
+        for word in WORDS[::37] + ["word0007"]:
+            plaintext, probes = table.lookup(hashlib.md5(word.encode()).digest())
+            assert plaintext == word
+            assert 1 <= probes <= table.count.bit_length()
+        assert table.lookup(hashlib.md5(b"missing").digest())[0] is None
+        assert table.lookup(b"\xff" * 16)[0] is None
+    finally:
+        table.close()
+
+
+def test_external_sort_matches_in_memory_sort(tables):
+    directory, source = tables
+    in_memory = open_table(directory, source, "sha1")
+    in_memory.close()
+    expected = table_path(directory, "words", "sha1").read_bytes()
+    spilled = open_table(directory, source, "sha1", chunk_lines=7)
+    spilled.close()
+    assert table_path(directory, "words", "sha1").read_bytes() == expected
+
+
+def test_lookup_table_rejects_other_files(tables):
+    directory, source = tables
+    other = directory / "other.md5.tbl"
+    other.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        LookupTable(other, source)
+
+
+def test_requests_a_table_cannot_serve_are_rejected(tables, monkeypatch):
+    directory, source = tables
+    open_table(directory, source, "md5").close()
+    monkeypatch.setattr(server, "LOOKUP_TABLE_DIR", directory)
+    md5 = hashlib.md5(b"word0001").hexdigest()
+    sha1 = hashlib.sha1(b"word0001").hexdigest()
+
+    assert validate_analysis_request(HashAnalysisRequest(hashes=[md5], lookup_table="words")) == (None, None)
+    for request in (
+        HashAnalysisRequest(hashes=[md5], lookup_table="words", rules=["upper"]),
+        HashAnalysisRequest(hashes=[md5], lookup_table="words", custom_wordlist=["word0001"]),
+        HashAnalysisRequest(hashes=[md5], lookup_table="words", attack_type="brute_force", charset="ab"),
+        HashAnalysisRequest(hashes=[md5, sha1], lookup_table="words"),
+        HashAnalysisRequest(hashes=[md5, "$1$salt$qjXMvbEw8oaL.CzflDtaK/"], lookup_table="words"),
+    ):
+        with pytest.raises(HTTPException) as error:
+            validate_analysis_request(request)
+        assert error.value.status_code == 400
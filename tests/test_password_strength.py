@@ -0,0 +1,35 @@
+import pytest
+
+from password_strength import BloomFilter, build_filter
+
+
+@pytest.fixture
+def breached(tmp_path):
+    words = [f"breached{i}" for i in range(2000)]
+    source = tmp_path / "breached.txt"
+    source.write_text("\n".join(words) + "\r\n\n")
+    output = tmp_path / "breached.bloom"
+    assert build_filter(source, output, fp_rate=0.01) == len(words)
+    bloom = BloomFilter(output)
+    yield bloom, words
+    bloom.close()
+
+
+def test_bloom_filter_has_no_false_negatives(breached):
+    bloom, words = breached
+    assert all(word in bloom for word in words)
+    assert len(bloom) == pytest.approx(len(words), rel=0.1)
+
+
+def test_bloom_filter_false_positive_rate_is_near_its_target(breached):
+    bloom, _ = breached
+    trials = 20_000
+    false_positives = sum(f"unseen{i}" in bloom for i in range(trials))
+    assert false_positives / trials < 0.02
+
+
+def test_bloom_filter_rejects_other_files(tmp_path):
+    path = tmp_path / "not.bloom"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        BloomFilter(path)
@@ -0,0 +1,35 @@
+import math
+
+from pcfg import Grammar, segment
+
+CORPUS = [
+    "monkey12", "monkey12", "dragon12", "monkey99", "shadow1", "dragon!",
+    "love", "love", "love", "12345", "pass!!", "abc123", "zzzz",
+]
+
+
+def probability(grammar: Grammar, guess: str) -> float:
+    runs = segment(guess)
+    structures = grammar.structures
+    chance = structures["".join(key for key, _ in runs)] / sum(structures.values())
+    for key, text in runs:
+        counts = grammar.terminals[key]
+        chance *= counts[text] / sum(counts.values())
+    return chance
+
+
+def test_guesses_are_unique_and_in_non_increasing_probability():
+    grammar = Grammar.train(CORPUS)
+    guesses = list(grammar.guesses())
+    assert len(guesses) == len(set(guesses)) == len(grammar)
+    chances = [probability(grammar, guess) for guess in guesses]
+    assert all(chance > 0 for chance in chances)
+    assert all(later <= earlier or math.isclose(later, earlier) for earlier, later in zip(chances, chances[1:]))
+    assert guesses[0] == "love"
+
+
+def test_guess_ranges_slice_the_same_order():
+    grammar = Grammar.train(CORPUS)
+    guesses = list(grammar.guesses())
+    assert list(grammar.guesses(3, 9)) == guesses[3:9]
+    assert list(grammar.guesses(len(guesses) - 2)) == guesses[-2:]
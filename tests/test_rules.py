@@ -0,0 +1,65 @@
+import pytest
+
+import server
+from server import RuleEngine, parse_rule, record_rule_stats
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("none", ["sEcret"]),
+    ("upper", ["SECRET"]),
+    ("lower", ["secret"]),
+    ("capitalize", ["Secret"]),
+    ("reverse", ["tercEs"]),
+    ("leet", ["$Ecr37"]),
+    ("append:!!", ["sEcret!!"]),
+    ("append:a:b", ["sEcreta:b"]),
+    ("prepend:123", ["123sEcret"]),
+    ("years:1999-2001", ["sEcret1999", "sEcret2000", "sEcret2001"]),
+    ("years:5-3", []),
+    ("lower+append:1", ["secret1"]),
+    ("years:1-2+upper", ["SECRET1", "SECRET2"]),
+    ("capitalize+reverse+append:!", ["terceS!"]),
+])
+def test_rule_variants(spec, expected):
+    assert list(parse_rule(spec)("sEcret")) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "bogus", "Upper", "append:", "prepend", "years:2020", "years:a-b", "years:12345-1", "upper+nope", "none+"])
+def test_bad_rules_are_rejected(spec):
+    with pytest.raises(ValueError, match="Unknown rule"):
+        parse_rule(spec)
+
+
+def test_engine_dedupes_variants_of_each_word():
+    engine = RuleEngine(["none", "lower", "append:1"])
+    assert list(engine.apply(["abc", "ABC"])) == ["abc", "abc1", "ABC", "abc", "ABC1"]
+    assert engine.stats == {
+        "none": {"candidates": 2, "hits": 0},
+        "lower": {"candidates": 1, "hits": 0},
+        "append:1": {"candidates": 2, "hits": 0},
+    }
+
+
+def test_hits_are_credited_to_the_rule_of_the_latest_candidate():
+    engine = RuleEngine(["none", "upper"])
+    candidates = engine.apply(["pass"])
+    assert next(candidates) == "pass"
+    engine.record_hit("pass")
+    assert next(candidates) == "PASS"
+    # A crack of an earlier candidate cannot be attributed any more
+    engine.record_hit("pass")
+    engine.record_hit("PASS")
+    assert engine.stats == {"none": {"candidates": 1, "hits": 1}, "upper": {"candidates": 1, "hits": 1}}
+
+
+def test_rule_stats_accumulate_across_engines(monkeypatch):
+    monkeypatch.setattr(server, "RULE_STATS", {"upper": {"candidates": 10, "hits": 2}})
+    first, second = RuleEngine(["upper", "reverse"]), RuleEngine(["upper"])
+    list(first.apply(["ab", "cd"]))
+    list(second.apply(["ef"]))
+    second.record_hit("EF")
+    record_rule_stats([first, second])
+    assert server.RULE_STATS == {
+        "upper": {"candidates": 13, "hits": 3},
+        "reverse": {"candidates": 2, "hits": 0},
+    }
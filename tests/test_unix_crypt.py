@@ -0,0 +1,39 @@
+import pytest
+
+from unix_crypt import CryptSetting, md5_crypt, parse_crypt, sha_crypt
+
+# Test vectors from Drepper's SHA-crypt specification
+SHA_VECTORS = [
+    ("Hello world!", "$5$saltstring$5B8vYYiY.CVt1RlTTf8KbXBH3hsxY/GNooZaBBGWEc5"),
+    ("Hello world!", "$5$rounds=10000$saltstringsaltst$3xv.VbSHBb41AL9AvLeujZkZRBAwqFMz2.opqey6IcA"),
+    ("Hello world!", "$6$saltstring$svn8UoSVapNtMuq1ukKS4tPQd8iKwSMHWjl/O817G3uBnIFNjnQJuesI68u4OTLiBFdcbYEdFCoEOfaS35inz1"),
+    (
+        "Hello world!",
+        "$6$rounds=10000$saltstringsaltst$OW1/O6BYHV6BcXZu8QVeXbDWra3Oeqh0sbHbbMCVNSnCM/UrjmM0Dp8vOuZeHBy/YTBmSK6H9qs/y3RnOaw5v.",
+    ),
+    (
+        "a very much longer text to encrypt.  This one even stretches over morethan one line.",
+        "$6$rounds=1400$anotherlongsalts$POfYwTEok97VWcjxIiSOjiykti.o/pQs.wPvMxQ6Fm7I6IoYN3CmLs66x9t0oSwbtEW7o7UmJEiDwGqd8p4ur1",
+    ),
+]
+
+
+@pytest.mark.parametrize("password, salt, expected", [
+    ("password", "saltsalt", "$1$saltsalt$qjXMvbEw8oaL.CzflDtaK/"),
+    ("", "", "$1$$qRPK7m23GJusamGpoGLby/"),
+])
+def test_md5_crypt_known_answers(password, salt, expected):
+    assert md5_crypt(password.encode(), salt.encode()) == expected
+    assert parse_crypt(expected).salt == salt
+
+
+@pytest.mark.parametrize("password, expected", SHA_VECTORS)
+def test_sha_crypt_known_answers(password, expected):
+    assert sha_crypt(password.encode(), parse_crypt(expected)) == expected
+
+
+def test_sha_crypt_clamps_rounds_to_the_minimum():
+    setting = CryptSetting("5", "roundstoolow", 10, "$5$rounds=10$roundstoolow")
+    assert sha_crypt(b"the minimum number is still observed", setting) == (
+        "$5$rounds=1000$roundstoolow$yfvwcWrQ8l/K0DAWyuPMDNHpIVlTQebY9l/gL972bIC"
+    )
@@ -0,0 +1,51 @@
+import pytest
+
+import wordlists
+from wordlists import PackedWordlist
+
+WORDS = ["password", "letmein", "pässwört", "123456", "dragon"]
+
+
+def test_round_trip_through_disk(tmp_path):
+    packed = PackedWordlist.from_words(WORDS)
+    packed.save(tmp_path)
+    loaded = PackedWordlist.load(tmp_path, packed.digest)
+    assert list(loaded) == WORDS
+    assert [loaded[index] for index in range(len(WORDS))] == WORDS
+    assert list(loaded.encoded()) == [word.encode() for word in WORDS]
+    assert (loaded.data, loaded.digest) == (packed.data, packed.digest)
+    # The id is the content, so the same words pack to the same id
+    assert PackedWordlist(packed.data).digest == packed.digest
+    PackedWordlist.delete(tmp_path, packed.digest)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_slices_are_packed_wordlists():
+    packed = PackedWordlist.from_words(WORDS)
+    assert packed[-1] == "dragon"
+    for start, stop in [(0, 5), (1, 3), (2, 2), (4, 10), (-2, None), (3, 1)]:
+        part = packed[start:stop]
+        assert isinstance(part, PackedWordlist)
+        assert list(part) == WORDS[start:stop]
+        assert len(part) == len(WORDS[start:stop])
+    assert list(packed[1:4][1:]) == WORDS[2:4]
+    with pytest.raises(ValueError):
+        packed[::2]
+    with pytest.raises(IndexError):
+        packed[len(WORDS)]
+
+
+def test_line_breaks_inside_words_split_them():
+    packed = PackedWordlist.from_words(["one\ntwo", "three\r\n", "\n", "", "four\r\n\r\nfive"])
+    assert list(packed) == ["one", "two", "three", "four", "five"]
+    assert len(packed) == 5
+    assert packed[1] == "two"
+    assert packed.data == b"one\ntwo\nthree\nfour\nfive\n"
+
+
+def test_encoded_crosses_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(wordlists, "CHUNK_WORDS", 2)
+    words = [f"w{i}" for i in range(7)]
+    packed = PackedWordlist.from_words(words)
+    assert list(packed.encoded()) == [word.encode() for word in words]
+    assert list(packed[3:6]) == words[3:6]
@@ -0,0 +1,62 @@
+import hashlib
+
+from server import HashAnalysisRequest, Job, PackedWordlist, RuleEngine, build_work_chunks, crack_work_chunk
+
+WORDS = [f"w{i:03d}" for i in range(20)]
+RULES = ["none", "lower", "upper", "years:1-2"]
+
+
+def md5(plaintext: str) -> str:
+    return hashlib.md5(plaintext.encode()).hexdigest()
+
+
+def rule_chunk(start: int, end: int) -> dict:
+    return {
+        "hash_type": "MD5",
+        "setting": None,
+        "attack_type": "dictionary",
+        "start": start,
+        "end": end,
+        "rules": RULES,
+    }
+
+
+def rule_words(start: int, end: int) -> bytes:
+    return PackedWordlist.from_words(WORDS[start:end]).data
+
+
+def test_rule_chunk_positions_and_counts_are_in_candidates():
+    candidates = list(RuleEngine(RULES).apply(WORDS))
+    target = md5("W015")
+    first_found, _, first_size, _ = crack_work_chunk(rule_chunk(0, 10), [target], [], rule_words(0, 10))
+    found, tried, size, timed_out = crack_work_chunk(rule_chunk(10, 20), [target], [], rule_words(10, 20))
+
+    assert first_found == {}
+    assert first_size + size == len(candidates)
+    plaintext, position, _ = found[target]
+    assert plaintext == "W015"
+    assert candidates[first_size + position - 1] == "W015"
+    assert tried >= position
+    assert not timed_out
+
+
+def test_rule_chunk_counts_candidates_when_all_targets_are_cracked():
+    target = md5("w001")
+    found, tried, size, _ = crack_work_chunk(rule_chunk(0, 10), [target], [target], rule_words(0, 10))
+    assert (found, tried) == ({}, 0)
+    assert size == len(list(RuleEngine(RULES).apply(WORDS[:10])))
+
+
+def test_salt_groups_share_each_word_range():
+    request = HashAnalysisRequest(hashes=["x"], custom_wordlist=WORDS)
+    job = Job(request, 0, None, None, WORDS, distributed=True)
+    groups = {("SHA-512 (Unix)", f"$6$salt{i}"): [f"$6$salt{i}$hash"] for i in range(5)}
+    chunks, word_ranges = build_work_chunks(job, groups)
+
+    assert len(chunks) == 5 * len(word_ranges)
+    assert all("words" not in chunk for chunk in chunks)
+    by_id = {word_range["_id"]: word_range for word_range in word_ranges}
+    for chunk in chunks:
+        word_range = by_id[chunk["words_id"]]
+        assert (word_range["start"], word_range["end"]) == (chunk["start"], chunk["end"])
+    assert [word for word_range in word_ranges for word in PackedWordlist(bytes(word_range["words"]))] == WORDS